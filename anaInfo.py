@@ -15,6 +15,19 @@ ana_config = {
         "trim":"anaUltraScurve.py"
         }
 
+#: key values match ana_config
+#: for each analysis, the analyses of the same chamber whose output it
+#: needs, e.g. the threshold analyses use the SCurveFitData.root of the
+#: trim analysis with --chConfigKnown
+ana_dependencies = {
+        "latency":[],
+        "scurve":[],
+        "thresholdch":["trim"],
+        "thresholdvftrk":["trim"],
+        "thresholdvftrig":["trim"],
+        "trim":[]
+        }
+
 #: key values match ana_config (mostly...)
 #: stores a tuple where:
 #:   [0] -> path of root file inside scandate/
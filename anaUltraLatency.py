@@ -8,14 +8,15 @@ anaUltraLatency
 .. moduleauthor:: Brian Dorney <brian.l.dorney@cern.ch>
 """
 
-if __name__ == '__main__':
-    import numpy as np
-    import os
-    from array import array
+def makeLatencyAnaParser():
+    """
+    Returns the OptionParser of anaUltraLatency.py, its parse_args() gives
+    the options expected by runLatencyAnalysis()
+    """
 
-    from gempython.gemplotting.utils.anaoptions import parser
-    from gempython.gemplotting.utils.anautilities import make3x8Canvas
-    from gempython.utils.nesteddict import nesteddict as ndict
+    from gempython.gemplotting.utils.anaoptions import makeParser
+
+    parser = makeParser()
 
     parser.add_option("-f", "--fit", action="store_true", dest="performFit",
                       help="Fit the latency distributions", metavar="performFit")
@@ -24,10 +25,38 @@ if __name__ == '__main__':
     parser.add_option("--latSigMaskRange", type="string", dest="latSigMaskRange", default=None,
                       help="Comma separated pair of values defining the region to be masked when trying to fit the noise, e.g. lat #notepsilon [40,44] is noise (lat < 40 || lat > 44)",
                       metavar="latSigMaskRange")
+    parser.add_option("--sidecar", action="store_true", dest="sidecar",
+                      help="Also write a columnar sidecar of the latFitTree next to the output file, see utils/sidecar.py", metavar="sidecar")
 
     parser.set_defaults(outfilename="latencyAna.root")
 
-    (options, args) = parser.parse_args()
+    return parser
+
+def runLatencyAnalysis(options, telemetry=None):
+    """
+    Analyzes the latency scan in options.filename as anaUltraLatency.py
+    does from the command line, the output is written to the directory
+    options.filename[:-5]
+
+    options   - optparse.Values, e.g. from makeLatencyAnaParser().parse_args()
+    telemetry - optional AnaTelemetry on which the analysis stages are
+                recorded, see anatelemetry
+
+    Returns os.EX_OK, exits with a non-zero status if the input is invalid
+    """
+
+    import numpy as np
+    import os
+    from array import array
+
+    from gempython.gemplotting.utils.anatelemetry import AnaTelemetry
+    from gempython.gemplotting.utils.anautilities import make3x8Canvas
+    from gempython.utils.nesteddict import nesteddict as ndict
+
+    if telemetry is None:
+        telemetry = AnaTelemetry()
+    telemetry.startStage("read")
+
     filename = options.filename[:-5]
     os.system("mkdir " + filename)
 
@@ -50,6 +79,7 @@ if __name__ == '__main__':
 
     #Filling Histograms
     print 'Filling Histograms'
+    telemetry.startStage("fill")
     latMin = 1000
     latMax = -1
     nTrig = -1
@@ -142,6 +172,8 @@ if __name__ == '__main__':
         myT.Branch( 'SigOverBkgErr', SigOverBkgErr, 'SigOverBkgErr/F')
 
     # Make output plots
+    if options.performFit:
+        telemetry.startStage("fit")
     from math import sqrt
     dict_grNHitsVFAT = ndict()
     dict_fitNHitsVFAT_Sig = ndict()
@@ -238,6 +270,7 @@ if __name__ == '__main__':
         pass
 
     # Store - Summary
+    telemetry.startStage("render")
     if options.performFit:
         canv_Summary = make3x8Canvas('canv_Summary', dict_grNHitsVFAT, 'APE1', dict_fitNHitsVFAT_Noise, '')
         canv_Summary.SaveAs(filename+'/Summary.png')
@@ -315,6 +348,7 @@ if __name__ == '__main__':
     canv_MaxHitsPerLatByVFAT.SaveAs(filename+'/MaxHitsPerLatByVFAT.png')
 
     # Store - TObjects
+    telemetry.startStage("write")
     outF.cd()
     hHitsVsLat_AllVFATs.Write()
     grNMaxLatBinByVFAT.SetName("grNMaxLatBinByVFAT")
@@ -328,3 +362,16 @@ if __name__ == '__main__':
         grVFATNSignalNoBkg.Write()
     myT.Write()
     outF.Close()
+
+    if options.sidecar:
+        from gempython.gemplotting.utils.sidecar import writeSidecar
+        writeSidecar(filename+"/"+options.outfilename, 'latFitTree')
+
+    telemetry.stopStage()
+
+    return os.EX_OK
+
+if __name__ == '__main__':
+    parser = makeLatencyAnaParser()
+    (options, args) = parser.parse_args()
+    exit(runLatencyAnalysis(options))
@@ -5,10 +5,13 @@ anaUltraScurve
 ==============
 """
 
-def fill2DScurveSummaryPlots(scurveTree, vfatHistos, vfatChanLUT, vfatHistosPanPin2=None, lutType="vfatCH", chanMasks=None, calDAC2Q_m=None, calDAC2Q_b=None):
+def fill2DScurveSummaryPlots(scurveData, vfatHistos, vfatChanLUT, vfatHistosPanPin2=None, lutType="vfatCH", chanMasks=None, calDAC2Q_m=None, calDAC2Q_b=None):
     """
-    Fills 2D Scurve summary plots from scurveTree TTree
+    Fills 2D Scurve summary plots from the columns of an scurveTree
 
+    scurveData        - numpy structured array of the scurveTree, e.g. from getScanDataArrays(),
+                        must contain vfatN, vfatCH, vcal and Nhits, if isCurrentPulse and calSF
+                        are present the charge of current pulses is computed from them
     vfatHistos        - container of histograms for each vfat where len(vfatHistos) = Total number of VFATs
                         The n^th element is a 2D histogram of Hits vs. (Strip || Chan || PanPin)
     vfatChanLUT       - Nested dictionary specifying the VFAT channel to strip and PanPin mapping;
@@ -23,9 +26,9 @@ def fill2DScurveSummaryPlots(scurveTree, vfatHistos, vfatChanLUT, vfatHistosPanP
                         if argument is None a value of 1.0 is used for all VFATs
     calDAC2Q_b        - as calDAC2Q_m but for intercept b, but a value of 0 is used if argument is None
     """
+    import numpy as np
+    import root_numpy as rp
     from gempython.gemplotting.utils.anaInfo import dict_calSF, mappingNames
-    from gempython.gemplotting.utils.anautilities import first_index_gt
-    from math import sqrt
 
     # Check if lutType is expected
     if lutType not in mappingNames:
@@ -40,58 +43,144 @@ def fill2DScurveSummaryPlots(scurveTree, vfatHistos, vfatChanLUT, vfatHistosPanP
     # Set calDAC2Q intercept to zero if not provided
     if calDAC2Q_b is None:
         calDAC2Q_b = np.zeros(24)
-   
-    # Get list of bin edges in Y
+
+    # Select the unmasked entries
+    vfatN = scurveData['vfatN'].astype(int)
+    vfatCH = scurveData['vfatCH'].astype(int)
+    isSelected = np.ones(len(vfatN), dtype=bool)
+    if chanMasks is not None:
+        isSelected = np.logical_not(np.array(chanMasks, dtype=bool)[vfatN,vfatCH])
+    vfatN = vfatN[isSelected]
+    vfatCH = vfatCH[isSelected]
+    vcal = scurveData['vcal'][isSelected].astype(float)
+    nHits = scurveData['Nhits'][isSelected]
+
+    # Get the channel, strip, or Pan Pin
+    lutArray = np.array([ vfatChanLUT[vfat][lutType] for vfat in range(0,24) ], dtype=int)
+    stripPinOrChan = lutArray[vfatN,vfatCH]
+
+    # Determine charge
+    calDAC2Q_m = np.asarray(calDAC2Q_m, dtype=float)
+    calDAC2Q_b = np.asarray(calDAC2Q_b, dtype=float)
+    charge = calDAC2Q_m[vfatN]*vcal+calDAC2Q_b[vfatN]
+    if "isCurrentPulse" in scurveData.dtype.names: #Potentially v3 electronics
+        #Q = CAL_DUR * CAL_DAC * 10nA * CAL_FS
+        isCurrentPulse = scurveData['isCurrentPulse'][isSelected].astype(bool)
+        calSFValues = np.array([ dict_calSF[key] for key in sorted(dict_calSF.keys()) ])
+        calSF = scurveData['calSF'][isSelected].astype(int)
+        charge[isCurrentPulse] = (1./ 40079000) * vcal[isCurrentPulse] * (10 * 1e-9) * calSFValues[calSF[isCurrentPulse]] * 1e15
+        pass
+
+    # Determine the bins of each entry, as TH2::SetBinContent() out of range bins go to under/overflow
     # Must be done for each VFAT since the conversion from DAC units to fC may be unique to the VFAT
-    listOfBinEdgesY = {}
+    chargeBin = np.zeros(len(vfatN), dtype=int)
     for vfat in vfatHistos:
-        listOfBinEdgesY[vfat] = [ vfatHistos[vfat].GetYaxis().GetBinLowEdge(binY) 
-                for binY in range(1,vfatHistos[vfat].GetNbinsY()+2) ] #Include overflow
+        binEdgesY = np.array([ vfatHistos[vfat].GetYaxis().GetBinLowEdge(binY) 
+                for binY in range(1,vfatHistos[vfat].GetNbinsY()+2) ]) #Include overflow
+        isThisVFAT = (vfatN == vfat)
+        chargeBin[isThisVFAT] = np.searchsorted(binEdgesY, charge[isThisVFAT], side='right')-1
         pass
 
-    # check current pulse?
-    checkCurrentPulse = False
-    listOfBranchNames = [branch.GetName() for branch in inF.scurveTree.GetListOfBranches() ]
-    if "isCurrentPulse" in listOfBranchNames:
-        checkCurrentPulse = True
+    isPanPinSplit = (lutType is mappingNames[1] and vfatHistosPanPin2 is not None)
+    if isPanPinSplit:
+        isPanPin2 = (stripPinOrChan >= 64)
+        xBin = np.where(isPanPin2, 127-(stripPinOrChan+1), 63-(stripPinOrChan+1))
+    else:
+        isPanPin2 = np.zeros(len(vfatN), dtype=bool)
+        xBin = stripPinOrChan+1
         pass
 
-    # Fill Histograms
-    for event in scurveTree:
-        if chanMasks is not None:
-            if chanMasks[event.vfatN][event.vfatCH]:
-                continue
-
-        # Get the channel, strip, or Pan Pin
-        stripPinOrChan = vfatChanLUT[event.vfatN][lutType][event.vfatCH]
-        
-        # Determine charge
-        charge = calDAC2Q_m[event.vfatN]*event.vcal+calDAC2Q_b[event.vfatN]
-        if checkCurrentPulse: #Potentially v3 electronics
-            if event.isCurrentPulse:
-                #Q = CAL_DUR * CAL_DAC * 10nA * CAL_FS
-                charge = (1./ 40079000) * event.vcal * (10 * 1e-9) * dict_calSF[event.calSF] * 1e15
-        
-        # Determine the binY that corresponds to this charge value
-        chargeBin = first_index_gt(listOfBinEdgesY[event.vfatN], charge)-1
-
-        # Fill Summary Histogram 
-        if lutType is mappingNames[1] and vfatHistosPanPin2 is not None:
-            if (stripPinOrChan < 64):
-                vfatHistos[event.vfatN].SetBinContent(63-(stripPinOrChan+1),chargeBin,event.Nhits)
-                vfatHistos[event.vfatN].SetBinError(63-(stripPinOrChan+1),chargeBin,sqrt(event.Nhits))
-                pass
+    # Fill Summary Histogram 
+    # Entries are scattered into a dense copy of each histogram which is then copied back in one step
+    for vfat in np.unique(vfatN):
+        isThisVFAT = (vfatN == vfat)
+        listOfFills = [ (vfatHistos[vfat], np.logical_and(isThisVFAT, np.logical_not(isPanPin2))) ]
+        if isPanPinSplit:
+            listOfFills.append( (vfatHistosPanPin2[vfat], np.logical_and(isThisVFAT, isPanPin2)) )
+        for histo, isThisHisto in listOfFills:
+            contents = rp.hist2array(histo, include_overflow=True)
+            xBinThisHisto = np.clip(xBin[isThisHisto], 0, histo.GetNbinsX()+1)
+            yBinThisHisto = np.clip(chargeBin[isThisHisto], 0, histo.GetNbinsY()+1)
+            contents[xBinThisHisto,yBinThisHisto] = nHits[isThisHisto]
+            nEntries = histo.GetEntries() + np.count_nonzero(isThisHisto)
+            if isPanPinSplit:
+                rp.array2hist(contents, histo, errors=np.sqrt(np.abs(contents)))
             else:
-                vfatHistosPanPin2[event.vfatN].SetBinContent(127-(stripPinOrChan+1),chargeBin,event.Nhits)
-                vfatHistosPanPin2[event.vfatN].SetBinError(127-(stripPinOrChan+1),chargeBin,sqrt(event.Nhits))
-                pass
-            pass
-        else:
-            vfatHistos[event.vfatN].SetBinContent(stripPinOrChan+1,chargeBin,event.Nhits)
+                rp.array2hist(contents, histo)
+            histo.SetEntries(nEntries)
             pass
+        pass
 
     return
 
+def makeScurveAnaParser():
+    """
+    Returns the OptionParser of anaUltraScurve.py, its parse_args() gives
+    the options expected by runScurveAnalysis()
+    """
+
+    from optparse import OptionGroup
+    from gempython.gemplotting.utils.anaoptions import makeParser
+
+    parser = makeParser()
+    parser.add_option("-b", "--drawbad", action="store_true", dest="drawbad",
+                      help="Draw fit overlays for Chi2 > 10000", metavar="drawbad")
+    parser.add_option("--calFile", type="string", dest="calFile", default=None,
+                      help="File specifying CAL_DAC/VCAL to fC equations per VFAT",
+                      metavar="calFile")
+    parser.add_option("--extChanMapping", type="string", dest="extChanMapping", default=None,
+                      help="Physical filename of a custom, non-default, channel mapping (optional)", metavar="extChanMapping")
+    parser.add_option("-f", "--fit", action="store_true", dest="performFit",
+                      help="Fit scurves and save fit information to output TFile", metavar="performFit")
+    parser.add_option("--fitCacheDir", type="string", dest="fitCacheDir", default=None,
+                      help="Directory of a cache of fit results, if the same scurves were already fit with the same settings the cached result is used instead of fitting (optional)",
+                      metavar="fitCacheDir")
+    parser.add_option("--fitCacheSizeMB", type="float", dest="fitCacheSizeMB", default=500,
+                      help="Size limit of fitCacheDir in MB, least recently used entries are removed beyond it", metavar="fitCacheSizeMB")
+    parser.add_option("--fitBackend", type="string", dest="fitBackend", default="minuit",
+                      help="Backend used for fitting scurves, from list {'minuit','numpy'}; 'numpy' fits all channels simultaneously", metavar="fitBackend")
+    parser.add_option("--nFitWorkers", type="int", dest="nFitWorkers", default=1,
+                      help="Number of processes used when fitting with the 'minuit' backend, VFATs are distributed between them", metavar="nFitWorkers")
+    parser.add_option("--isVFAT3", action="store_true", dest="isVFAT3", default=False,
+                      help="Provide this argument if input data was acquired from vfat3", metavar="isVFAT3")
+    parser.add_option("--noRender", action="store_true", dest="noRender",
+                      help="Do not make any TCanvas or *.png file, the output TTree and text files are unchanged", metavar="noRender")
+    parser.add_option("--summaryOnly", action="store_true", dest="summaryOnly",
+                      help="Only make the chamber level summary *.png files, the TCanvas objects of all scurves and fits of each VFAT are not made", metavar="summaryOnly")
+    parser.add_option("--remask", action="store_true", dest="remask",
+                      help="Only recompute the mask and maskReason of an existing output file of this script with the current channel mask options, the scurves are not refit",
+                      metavar="remask")
+    parser.add_option("--sidecar", action="store_true", dest="sidecar",
+                      help="Also write a columnar sidecar of the scurveFitTree next to the output file, see utils/sidecar.py", metavar="sidecar")
+    parser.add_option("--fitObjects", action="store_true", dest="fitObjects",
+                      help="Also store the scurve histogram and fit function of each channel as TObjects in a scurveFitObjTree friend of the scurveFitTree, by default only the compact scurve_hits and fit_params branches are written", metavar="fitObjects")
+    parser.add_option("--IsTrimmed", action="store_true", dest="IsTrimmed",
+                      help="If the data is from a trimmed scan, plot the value it tried aligning to", metavar="IsTrimmed")
+    parser.add_option("--zscore", type="float", dest="zscore", default=3.5,
+                      help="Z-Score for Outlier Identification in MAD Algo", metavar="zscore")
+
+    chanMaskGroup = OptionGroup(
+            parser,
+            "Options for channel mask decisions"
+            "Parameters which specify how Dead, Noisy, and High Pedestal Channels are charaterized")
+    chanMaskGroup.add_option("--maxEffPedPercent", type="float", dest="maxEffPedPercent", default=0.05,
+                      help="Percentage, Threshold for setting the HighEffPed mask reason, if channel (effPed > maxEffPedPercent * nevts) then HighEffPed is set",
+                      metavar="maxEffPedPercent")
+    chanMaskGroup.add_option("--highNoiseCut", type="float", dest="highNoiseCut", default=1.0,
+                      help="Threshold for setting the HighNoise maskReason, if channel (scurve_sigma > highNoiseCut) then HighNoise is set",
+                      metavar="highNoiseCut")
+    chanMaskGroup.add_option("--deadChanCutLow", type="float", dest="deadChanCutLow", default=4.14E-02,
+                      help="If channel (deadChanCutLow < scurve_sigma < deadChanCutHigh) then DeadChannel is set",
+                      metavar="deadChanCutLow")
+    chanMaskGroup.add_option("--deadChanCutHigh", type="float", dest="deadChanCutHigh", default=1.09E-01,
+                      help="If channel (deadChanCutHigh < scurve_sigma < deadChanCutHigh) then DeadChannel is set",
+                      metavar="deadChanCutHigh")
+    parser.add_option_group(chanMaskGroup)
+
+    parser.set_defaults(outfilename="SCurveFitData.root")
+
+    return parser
+
 def plotAllSCurvesOnCanvas(vfatHistos, vfatHistosPanPin2=None, obsName="scurves"):
     """
     Plots all scurves for a given vfat on a TCanvas for all vfats
@@ -114,8 +203,6 @@ def plotAllSCurvesOnCanvas(vfatHistos, vfatHistosPanPin2=None, obsName="scurves"
             h_scurve.SetLineColor(r.kBlue+2)
             h_scurve.SetLineWidth(2)
             h_scurve.SetFillStyle(0)
-
-            g_scurve = r.TGraph(h_scurve)
             if binX == 1:
                 h_scurve.Draw()
             else:
@@ -130,67 +217,150 @@ def plotAllSCurvesOnCanvas(vfatHistos, vfatHistosPanPin2=None, obsName="scurves"
                 h_scurve.SetLineWidth(2)
                 h_scurve.SetFillStyle(0)
                 h_scurve.Draw("same")
-
-                g_scurve = r.TGraph(h_scurve)
             canv_dict[vfat].Update()
 
     return canv_dict
 
-if __name__ == '__main__':
+def remaskScurveFitData(scanFileName, fitFileName, chConfigFileName, **cutArgs):
+    """
+    Recomputes the mask and maskReason branches of the scurveFitTree in
+    fitFileName, and rewrites chConfigFileName, from the stored fit results
+    using new cut values.  The scurves are not refit.
+
+    scanFileName     - input file of anaUltraScurve.py, the number of pulses is taken from its scurveTree
+    fitFileName      - output file of anaUltraScurve.py containing the scurveFitTree, updated in place
+    chConfigFileName - channel config file to (re)write
+    cutArgs          - cut values, see anamasks.computeChannelMasks()
+    """
+
     import os
     import numpy as np
+    import root_numpy as rp
     import ROOT as r
-    
+
     from array import array
-    from gempython.gemplotting.utils.anautilities import getEmptyPerVFATList, getMapping, isOutlierMADOneSided, parseCalFile, saveSummary, saveSummaryByiEta
-    from gempython.gemplotting.utils.anaInfo import mappingNames, MaskReason
-    from gempython.gemplotting.fitting.fitScanData import ScanDataFitter
+    from gempython.gemplotting.utils.anaInfo import MaskReason
+    from gempython.gemplotting.utils.anamasks import computeChannelMasks
+    from gempython.gemplotting.utils.sidecar import getSidecarDir, writeSidecar
+
+    # Get the number of pulses for each channel
+    scanData = rp.root2array(scanFileName, treename='scurveTree', branches=['vfatN','vfatCH','Nev'])
+    nev = np.nan * np.ones((24,128))
+    nev[scanData['vfatN'],scanData['vfatCH']] = scanData['Nev']
+
+    # Get the fit results
+    fitData = rp.root2array(fitFileName, treename='scurveFitTree',
+            branches=['vfatN','vfatCH','vfatID','trimDAC','threshold','noise','ped_eff','maskReason'])
+    vfatN = fitData['vfatN']
+    vfatCH = fitData['vfatCH']
+    threshold = np.zeros((24,128))
+    threshold[vfatN,vfatCH] = fitData['threshold']
+    noise = np.zeros((24,128))
+    noise[vfatN,vfatCH] = fitData['noise']
+    effPed = -1. * np.ones((24,128))
+    effPed[vfatN,vfatCH] = fitData['ped_eff']
+    fitValid = np.zeros((24,128), dtype=bool)
+    fitValid[vfatN,vfatCH] = np.bitwise_and(fitData['maskReason'], MaskReason.FitFailed) == 0
+    trimDAC = np.zeros((24,128), dtype=int)
+    trimDAC[vfatN,vfatCH] = fitData['trimDAC']
+    dict_vfatID = dict((vfat, 0) for vfat in range(0,24))
+    for vfat, vfatID in zip(vfatN, fitData['vfatID']):
+        dict_vfatID[vfat] = vfatID
+
+    # Determine the new masks
+    masks, maskReasons = computeChannelMasks(threshold, noise, effPed, fitValid, nev, **cutArgs)
+
+    # Write the new channel config
+    writeChConfig(chConfigFileName, dict_vfatID, trimDAC, masks, maskReasons)
+
+    # Copy the tree without the mask branches then add the new ones
+    fitFile = r.TFile(fitFileName, 'update')
+    fitFile.cd()
+    oldTree = fitFile.Get('scurveFitTree')
+    oldTree.SetBranchStatus('mask', 0)
+    oldTree.SetBranchStatus('maskReason', 0)
+    newTree = oldTree.CloneTree(0)
+    if fitFile.Get('scurveFitObjTree') and not newTree.GetFriend('scurveFitObjTree'):
+        newTree.AddFriend(fitFile.Get('scurveFitObjTree'))
+    mask = array( 'i', [ 0 ] )
+    newTree.Branch( 'mask', mask, 'mask/I' )
+    maskReason = array( 'i', [ 0 ] )
+    newTree.Branch( 'maskReason', maskReason, 'maskReason/I' )
+    for entry in range(0,oldTree.GetEntries()):
+        oldTree.GetEntry(entry)
+        mask[0] = masks[vfatN[entry]][vfatCH[entry]]
+        maskReason[0] = maskReasons[vfatN[entry]][vfatCH[entry]]
+        newTree.Fill()
+        pass
+    newTree.Write('', r.TObject.kOverwrite)
+    fitFile.Close()
+
+    # An existing sidecar no longer matches the file, remake it
+    if os.path.isdir(getSidecarDir(fitFileName, 'scurveFitTree')):
+        writeSidecar(fitFileName, 'scurveFitTree')
+
+    return
+
+def runScurveAnalysis(options, telemetry=None):
+    """
+    Analyzes the scurve scan in options.filename as anaUltraScurve.py does
+    from the command line, the output is written to the directory
+    options.filename[:-5]
+
+    options   - optparse.Values, e.g. from makeScurveAnaParser().parse_args()
+    telemetry - optional AnaTelemetry on which the analysis stages are
+                recorded, see anatelemetry
+
+    Returns os.EX_OK, exits with a non-zero status if the input is invalid
+    """
+
+    import os
+    import numpy as np
+    import root_numpy as rp
+    import ROOT as r
+    
+    from gempython.gemplotting.utils.anatelemetry import AnaTelemetry
+    from gempython.gemplotting.utils.anautilities import getMapping, getScanDataArrays, parseCalFile, SummaryRenderQueue
+    from gempython.gemplotting.utils import anamasks
+    from gempython.gemplotting.utils.anaInfo import mappingNames
+    from gempython.gemplotting.fitting.fitScanData import getScurveFitRange, ScanDataFitter
     from gempython.utils.nesteddict import nesteddict as ndict
     from gempython.utils.wrappers import envCheck
     from gempython.gemplotting.mapping.chamberInfo import chamber_iEta2VFATPos, chamber_vfatPos2iEta
 
-    from gempython.gemplotting.utils.anaoptions import parser
-    parser.add_option("-b", "--drawbad", action="store_true", dest="drawbad",
-                      help="Draw fit overlays for Chi2 > 10000", metavar="drawbad")
-    parser.add_option("--calFile", type="string", dest="calFile", default=None,
-                      help="File specifying CAL_DAC/VCAL to fC equations per VFAT",
-                      metavar="calFile")
-    parser.add_option("--extChanMapping", type="string", dest="extChanMapping", default=None,
-                      help="Physical filename of a custom, non-default, channel mapping (optional)", metavar="extChanMapping")
-    parser.add_option("-f", "--fit", action="store_true", dest="performFit",
-                      help="Fit scurves and save fit information to output TFile", metavar="performFit")
-    parser.add_option("--isVFAT3", action="store_true", dest="isVFAT3", default=False,
-                      help="Provide this argument if input data was acquired from vfat3", metavar="isVFAT3")
-    parser.add_option("--IsTrimmed", action="store_true", dest="IsTrimmed",
-                      help="If the data is from a trimmed scan, plot the value it tried aligning to", metavar="IsTrimmed")
-    parser.add_option("--zscore", type="float", dest="zscore", default=3.5,
-                      help="Z-Score for Outlier Identification in MAD Algo", metavar="zscore")
-
-    from optparse import OptionGroup
-    chanMaskGroup = OptionGroup(
-            parser,
-            "Options for channel mask decisions"
-            "Parameters which specify how Dead, Noisy, and High Pedestal Channels are charaterized")
-    chanMaskGroup.add_option("--maxEffPedPercent", type="float", dest="maxEffPedPercent", default=0.05,
-                      help="Percentage, Threshold for setting the HighEffPed mask reason, if channel (effPed > maxEffPedPercent * nevts) then HighEffPed is set",
-                      metavar="maxEffPedPercent")
-    chanMaskGroup.add_option("--highNoiseCut", type="float", dest="highNoiseCut", default=1.0,
-                      help="Threshold for setting the HighNoise maskReason, if channel (scurve_sigma > highNoiseCut) then HighNoise is set",
-                      metavar="highNoiseCut")
-    chanMaskGroup.add_option("--deadChanCutLow", type="float", dest="deadChanCutLow", default=4.14E-02,
-                      help="If channel (deadChanCutLow < scurve_sigma < deadChanCutHigh) then DeadChannel is set",
-                      metavar="deadChanCutLow")
-    chanMaskGroup.add_option("--deadChanCutHigh", type="float", dest="deadChanCutHigh", default=1.09E-01,
-                      help="If channel (deadChanCutHigh < scurve_sigma < deadChanCutHigh) then DeadChannel is set",
-                      metavar="deadChanCutHigh")
-    parser.add_option_group(chanMaskGroup)
-
-    parser.set_defaults(outfilename="SCurveFitData.root")
-    (options, args) = parser.parse_args()
+    if options.fitBackend not in ["minuit","numpy"]:
+        print("Fit backend '%s' not understood, please select from {'minuit','numpy'}"%options.fitBackend)
+        exit(os.EX_USAGE)
+    if options.nFitWorkers < 1:
+        print("Number of fit workers must be at least 1, not %i"%options.nFitWorkers)
+        exit(os.EX_USAGE)
     
     print("Analyzing: '%s'"%options.filename)
     filename = options.filename[:-5]
+
+    dict_cutArgs = {
+            "ztrim":options.ztrim,
+            "zscore":options.zscore,
+            "highNoiseCut":options.highNoiseCut,
+            "deadChanCutLow":options.deadChanCutLow,
+            "deadChanCutHigh":options.deadChanCutHigh,
+            "maxEffPedPercent":options.maxEffPedPercent
+            }
+
+    if options.remask:
+        fitFileName = filename+'/'+options.outfilename
+        if not os.path.isfile(fitFileName):
+            print("Output file '%s' of a previous analysis not found, it is required by --remask"%fitFileName)
+            exit(os.EX_NOINPUT)
+        print("Recomputing channel masks of %s"%fitFileName)
+        remaskScurveFitData(options.filename, fitFileName, filename+'/chConfig.txt', **dict_cutArgs)
+        print("Updated %s and %s"%(fitFileName, filename+'/chConfig.txt'))
+        return os.EX_OK
     os.system("mkdir " + filename)
+
+    if telemetry is None:
+        telemetry = AnaTelemetry()
+    telemetry.startStage("read")
     
     outfilename = options.outfilename
     GEBtype = options.GEBtype
@@ -199,6 +369,8 @@ if __name__ == '__main__':
     outF = r.TFile(filename+'/'+outfilename, 'recreate')
     if options.performFit:
         myT = r.TTree('scurveFitTree','Tree Holding FitData')
+        if options.fitObjects:
+            myObjT = r.TTree('scurveFitObjTree','Tree Holding the scurve histogram and fit of each entry of scurveFitTree')
 
     tuple_calInfo = parseCalFile(options.calFile)
     calDAC2Q_Slope = tuple_calInfo[0]
@@ -209,9 +381,9 @@ if __name__ == '__main__':
     vSummaryPlotsPanPin2 = ndict()
     vSummaryPlotsNoMaskedChan = ndict()
     vSummaryPlotsNoMaskedChanPanPin2 = ndict()
-    vthr_list = getEmptyPerVFATList() 
-    trim_list = getEmptyPerVFATList() 
-    trimrange_list = getEmptyPerVFATList()
+    vthr_list = np.zeros((24,128), dtype=int)
+    trim_list = np.zeros((24,128), dtype=int)
+    trimrange_list = np.zeros((24,128), dtype=int)
     
     # Set default histogram behavior
     r.TH1.SetDefaultSumw2(False)
@@ -269,11 +441,6 @@ if __name__ == '__main__':
                     yMax_Charge)
             vSummaryPlotsNoMaskedChanPanPin2[vfat].GetYaxis().SetTitleOffset(1.5)
             pass
-        for chan in range (0,128):
-            vthr_list[vfat].append(0)
-            trim_list[vfat].append(0)
-            trimrange_list[vfat].append(0)
-            pass
         pass
     
     # Determine chan, strip or panpin indep var
@@ -295,8 +462,13 @@ if __name__ == '__main__':
     if GEBtype == 'short':
         dict_vfatChanLUT = getMapping(MAPPING_PATH+'/shortChannelMap.txt')
    
-    # Open the input ROOT File
-    inF = r.TFile(filename+'.root')
+    # Read the input ROOT File once, all later steps use these columns
+    scurveData = getScanDataArrays(
+            filename+'.root',
+            ['vfatN','vfatCH','vcal','Nhits','Nev','trimDAC','trimRange','vthr','vth1','vth2','vfatID','isCurrentPulse','calSF'])
+    listOfBranches = scurveData.dtype.names
+    dataVFATN = scurveData['vfatN']
+    dataVFATCH = scurveData['vfatCH']
 
     # Create the fitter
     if options.performFit:
@@ -308,38 +480,42 @@ if __name__ == '__main__':
         pass
 
     # Get some of the operational settings of the ASIC
-    # Refactor this using root_numpy???
-    dict_vfatID = dict((vfat, 0) for vfat in range(0,24))
-    listOfBranches = inF.scurveTree.GetListOfBranches()
+    if "vthr" in listOfBranches: #v3 electronics behavior
+        vthr_list[dataVFATN,dataVFATCH] = scurveData['vthr']
+    else: #v2b electronics behavior
+        vthr_list[dataVFATN,dataVFATCH] = np.abs(scurveData['vth2'].astype(int) - scurveData['vth1'])
+        pass
+    trim_list[dataVFATN,dataVFATCH] = scurveData['trimDAC']
+    trimrange_list[dataVFATN,dataVFATCH] = scurveData['trimRange']
+        
+    # store event count
     nPulses = -1
-    for event in inF.scurveTree:
-        if "vthr" in listOfBranches: #v3 electronics behavior
-            vthr_list[event.vfatN][event.vfatCH] = event.vthr
-        else: #v2b electronics behavior
-            vthr_list[event.vfatN][event.vfatCH] = abs(event.vth2 - event.vth1)
+    if len(scurveData) > 0:
+        nPulses = int(scurveData['Nev'][0])
+
+    # Store vfatID, first non-zero value of each vfat
+    dict_vfatID = dict((vfat, 0) for vfat in range(0,24))
+    if 'vfatID' in listOfBranches:
+        for vfat in range(0,24):
+            listOfIDs = scurveData['vfatID'][np.logical_and(dataVFATN == vfat, scurveData['vfatID'] > 0)]
+            if len(listOfIDs) > 0:
+                dict_vfatID[vfat] = listOfIDs[0]
             pass
-        trim_list[event.vfatN][event.vfatCH] = event.trimDAC
-        trimrange_list[event.vfatN][event.vfatCH] = event.trimRange
-        
-        # store event count
-        if nPulses < 0:
-            nPulses = event.Nev
-
-        # Store vfatID
-        if not (dict_vfatID[event.vfatN] > 0):
-            if 'vfatID' in listOfBranches:
-                dict_vfatID[event.vfatN] = event.vfatID
-            else:
-                dict_vfatID[event.vfatN] = 0
-        
-        # Load the event into the fitter
-        if options.performFit:
-            fitter.feed(event)
+        pass
+
+    # Load the data into the fitter
+    telemetry.startStage("fill")
+    if options.performFit:
+        if options.isVFAT3 and 'isCurrentPulse' in listOfBranches:
+            fitter.feedArray(dataVFATN, dataVFATCH, scurveData['vcal'], scurveData['Nhits'], scurveData['Nev'],
+                    scurveData['isCurrentPulse'], scurveData['calSF'])
+        else:
+            fitter.feedArray(dataVFATN, dataVFATCH, scurveData['vcal'], scurveData['Nhits'], scurveData['Nev'])
 
     # Loop over input data and fill histograms
     print("Filling Histograms")
     fill2DScurveSummaryPlots(
-            scurveTree=inF.scurveTree, 
+            scurveData=scurveData, 
             vfatHistos=vSummaryPlots, 
             vfatChanLUT=dict_vfatChanLUT, 
             vfatHistosPanPin2=vSummaryPlotsPanPin2, 
@@ -350,10 +526,32 @@ if __name__ == '__main__':
     
     if options.performFit:
         # Fit Scurves        
+        telemetry.startStage("fit")
         print("Fitting Histograms")
         fitSummary = open(filename+'/fitSummary.txt','w')
         fitSummary.write('vfatN/I:vfatID/I:vfatCH/I:fitP0/F:fitP1/F:fitP2/F:fitP3/F\n')
-        scanFitResults = fitter.fit(debug=options.debug)
+        foundInCache = False
+        if options.fitCacheDir is not None:
+            from gempython.gemplotting.fitting.fitResultCache import FitResultCache
+            fitCache = FitResultCache(options.fitCacheDir, options.fitCacheSizeMB)
+            fitCacheKey = fitCache.makeKey(fitter, fitBackend=options.fitBackend)
+            foundInCache = fitCache.load(fitter, fitCacheKey)
+            pass
+
+        if foundInCache:
+            print("Using cached fit results %s"%(fitCache.entryPath(fitCacheKey)))
+            scanFitResults = fitter.scanFitResults
+        elif options.fitBackend == "numpy":
+            scanFitResults = fitter.fitBatch(debug=options.debug)
+        else:
+            scanFitResults = fitter.fit(debug=options.debug, nWorkers=options.nFitWorkers)
+            fitStats = fitter.getFitStatistics()
+            print("Performed %i fits for %i channels (at most %i for one channel)"%(fitStats["nFits"],fitStats["nChannels"],fitStats["maxFits"]))
+            print("%i channels converged, %i of them on the first fit"%(fitStats["nConverged"],fitStats["nFirstTry"]))
+            pass
+
+        if options.fitCacheDir is not None and not foundInCache:
+            fitCache.store(fitter, fitCacheKey)
         for vfat in range(0,24):
             for chan in range(0,128):
                 fitSummary.write(
@@ -361,77 +559,34 @@ if __name__ == '__main__':
                             vfat,
                             dict_vfatID[vfat],
                             chan,
-                            fitter.scanFuncs[vfat][chan].GetParameter(0),
-                            fitter.scanFuncs[vfat][chan].GetParameter(1),
-                            fitter.scanFuncs[vfat][chan].GetParameter(2),
-                            fitter.scanFuncs[vfat][chan].GetParameter(3)
+                            fitter.fitParams[vfat,chan,0],
+                            fitter.fitParams[vfat,chan,1],
+                            fitter.fitParams[vfat,chan,2],
+                            fitter.fitParams[vfat,chan,3]
                             )
                         )
         fitSummary.close()
     
         # Determine hot channels
+        telemetry.startStage("mask")
         print("Determining hot channels")
         print("")
-        masks = []
-        maskReasons = []
-        effectivePedestals = [ np.zeros(128) for vfat in range(0,24) ]
-        print "| vfatN | Dead Chan | Hot Chan | Failed Fits | High Noise | High Eff Ped |"
-        print "| :---: | :-------: | :------: | :---------: | :--------: | :----------: |"
-        for vfat in range(0,24):
-            trimValue = np.zeros(128)
-            channelNoise = np.zeros(128)
-            fitFailed = np.zeros(128, dtype=bool)
-            for chan in range(0, 128):
-                # Compute values for cuts
-                channelNoise[chan] = scanFitResults[1][vfat][chan]
-                effectivePedestals[vfat][chan] = fitter.scanFuncs[vfat][chan].Eval(0.0)
-                
-                # Compute the value to apply MAD on for each channel
-                trimValue[chan] = scanFitResults[0][vfat][chan] - options.ztrim * scanFitResults[1][vfat][chan]
-                pass
-            fitFailed = np.logical_not(fitter.fitValid[vfat])
-            
-            # Determine outliers
-            hot = isOutlierMADOneSided(trimValue, thresh=options.zscore,
-                                       rejectHighTail=False)
-            
-            # Create reason array
-            reason = np.zeros(128, dtype=int) # Not masked
-            reason[hot] |= MaskReason.HotChannel
-            reason[fitFailed] |= MaskReason.FitFailed
-            nDeadChan = 0
-            for chan in range(0,len(channelNoise)):
-                if (options.deadChanCutLow < channelNoise[chan] and channelNoise[chan] < options.deadChanCutHigh):
-                    reason[chan] |= MaskReason.DeadChannel
-                    nDeadChan+=1
-                    pass
-                pass
-            reason[channelNoise > options.highNoiseCut ] |= MaskReason.HighNoise
-            nHighEffPed = 0
-            for chan in range(0, len(effectivePedestals)):
-                if chan not in fitter.Nev[vfat].keys():
-                    continue
-                if (effectivePedestals[vfat][chan] > (options.maxEffPedPercent * fitter.Nev[vfat][chan]) ):
-                    reason[chan] |= MaskReason.HighEffPed
-                    nHighEffPed+=1
-                    pass
-                pass
-            maskReasons.append(reason)
-            #masks.append(reason != MaskReason.NotMasked)
-            masks.append((reason != MaskReason.NotMasked) * (reason != MaskReason.DeadChannel))
-            print '| %i | %i | %i | %i | %i | %i |'%(
-                    vfat,
-                    nDeadChan,
-                    np.count_nonzero(hot),
-                    np.count_nonzero(fitFailed),
-                    np.count_nonzero(channelNoise > options.highNoiseCut),
-                    nHighEffPed)
+        effectivePedestals = anamasks.effectivePedestals(fitter.fitParams)
+        nevPerChan = np.array([ [ fitter.Nev[vfat][chan] if chan in fitter.Nev[vfat].keys() else np.nan for chan in range(0,128) ] for vfat in range(0,24) ], dtype=float)
+        masks, maskReasons = anamasks.computeChannelMasks(
+                fitter.fitParams[...,0],
+                fitter.fitParams[...,1],
+                effectivePedestals,
+                fitter.fitValid,
+                nevPerChan,
+                **dict_cutArgs)
     
     # Make Distributions w/o Hot Channels
+    telemetry.startStage("fill")
     if options.performFit:
         print("Removing Hot Channels from Output Histograms")
         fill2DScurveSummaryPlots(
-                scurveTree=inF.scurveTree, 
+                scurveData=scurveData, 
                 vfatHistos=vSummaryPlotsNoMaskedChan, 
                 vfatChanLUT=dict_vfatChanLUT, 
                 vfatHistosPanPin2=vSummaryPlotsNoMaskedChanPanPin2, 
@@ -441,53 +596,90 @@ if __name__ == '__main__':
                 calDAC2Q_b=calDAC2Q_Intercept)
     
     # Set the branches of the TTree and store the results
+    telemetry.startStage("write")
     if options.performFit:
         # Due to weird ROOT black magic this cannot be done here
         #myT = r.TTree('scurveFitTree','Tree Holding FitData')
 
-        chi2 = array( 'f', [ 0 ] )
-        myT.Branch( 'chi2', chi2, 'chi2/F')
-        mask = array( 'i', [ 0 ] )
-        myT.Branch( 'mask', mask, 'mask/I' )
-        maskReason = array( 'i', [ 0 ] )
-        myT.Branch( 'maskReason', maskReason, 'maskReason/I' )
-        ndf = array( 'i', [ 0 ] )
-        myT.Branch( 'ndf', ndf, 'ndf/I')
-        Nhigh = array( 'i', [ 0 ] )
-        myT.Branch( 'Nhigh', Nhigh, 'Nhigh/I')
-        noise = array( 'f', [ 0 ] )
-        myT.Branch( 'noise', noise, 'noise/F')
-        panPin = array( 'i', [ 0 ] )
-        myT.Branch( 'panPin', panPin, 'panPin/I' )
-        pedestal = array( 'f', [ 0 ] )
-        myT.Branch( 'pedestal', pedestal, 'pedestal/F')
-        ped_eff = array( 'f', [ 0 ] )
-        myT.Branch( 'ped_eff', ped_eff, 'ped_eff/F')
-        ROBstr = array( 'i', [ 0 ] )
-        myT.Branch( 'ROBstr', ROBstr, 'ROBstr/I' )
-        trimDAC = array( 'i', [ 0 ] )
-        myT.Branch( 'trimDAC', trimDAC, 'trimDAC/I' )
-        threshold = array( 'f', [ 0 ] )
-        myT.Branch( 'threshold', threshold, 'threshold/F')
-        trimRange = array( 'i', [ 0 ] )
-        myT.Branch( 'trimRange', trimRange, 'trimRange/I' )
-        vfatCH = array( 'i', [ 0 ] )
-        myT.Branch( 'vfatCH', vfatCH, 'vfatCH/I' )
-        vfatID = array( 'i', [-1] )
-        myT.Branch( 'vfatID', vfatID, 'vfatID/I' ) #Hex Chip ID of VFAT
-        vfatN = array( 'i', [ 0 ] )
-        myT.Branch( 'vfatN', vfatN, 'vfatN/I' )
-        vthr = array( 'i', [ 0 ] )
-        myT.Branch( 'vthr', vthr, 'vthr/I' )
-        scurve_h = r.TH1F()
-        myT.Branch( 'scurve_h', scurve_h)
-        scurve_fit = r.TF1()
-        myT.Branch( 'scurve_fit', scurve_fit)
-        ztrim = array( 'f', [ 0 ] )
-        ztrim[0] = options.ztrim
-        myT.Branch( 'ztrim', ztrim, 'ztrim/F')
+        print("Storing Fit Results")
+        fitResults = np.array([ [ scanFitResults[idx][vfat] for vfat in range(0,24) ] for idx in range(0,6) ])
+        fitData = np.zeros(
+                3072,
+                dtype=[
+                    ('chi2', 'f4'),
+                    ('mask', 'i4'),
+                    ('maskReason', 'i4'),
+                    ('ndf', 'i4'),
+                    ('Nhigh', 'i4'),
+                    ('noise', 'f4'),
+                    ('panPin', 'i4'),
+                    ('pedestal', 'f4'),
+                    ('ped_eff', 'f4'),
+                    ('ROBstr', 'i4'),
+                    ('trimDAC', 'i4'),
+                    ('threshold', 'f4'),
+                    ('trimRange', 'i4'),
+                    ('vfatCH', 'i4'),
+                    ('vfatID', 'i4'), #Hex Chip ID of VFAT
+                    ('vfatN', 'i4'),
+                    ('vthr', 'i4'),
+                    ('ztrim', 'f4'),
+                    ('scurve_hits', 'u4', (fitter.nChargeBins,)),
+                    ('scurve_xMin', 'f4'),
+                    ('scurve_xMax', 'f4'),
+                    ('fit_params', 'f8', (4,)),
+                    ('fit_xMin', 'f4'),
+                    ('fit_xMax', 'f4')
+                    ]
+                )
+        # Entries are ordered by vfat then by vfat channel
+        fitData['chi2'] = fitResults[3].ravel()
+        fitData['mask'] = np.asarray(masks).ravel()
+        fitData['maskReason'] = np.asarray(maskReasons).ravel()
+        fitData['ndf'] = fitResults[5].ravel()
+        fitData['Nhigh'] = fitResults[4].ravel()
+        fitData['noise'] = fitResults[1].ravel()
+        fitData['panPin'] = np.array([ dict_vfatChanLUT[vfat]["PanPin"] for vfat in range(0,24) ]).ravel()
+        fitData['pedestal'] = fitResults[2].ravel()
+        fitData['ped_eff'] = np.asarray(effectivePedestals).ravel()
+        fitData['ROBstr'] = np.array([ dict_vfatChanLUT[vfat]["Strip"] for vfat in range(0,24) ]).ravel()
+        fitData['trimDAC'] = trim_list.ravel()
+        fitData['threshold'] = fitResults[0].ravel()
+        fitData['trimRange'] = trimrange_list.ravel()
+        fitData['vfatCH'] = np.tile(np.arange(128), 24)
+        fitData['vfatID'] = np.repeat([ dict_vfatID[vfat] for vfat in range(0,24) ], 128)
+        fitData['vfatN'] = np.repeat(np.arange(24), 128)
+        fitData['vthr'] = vthr_list.ravel()
+        fitData['ztrim'] = options.ztrim
+
+        # Compact form of the scurve and its fit, see rebuildScurveObjects()
+        fitData['scurve_hits'] = np.rint(fitter.scanHits[:,:,1:-1]).reshape(3072, fitter.nChargeBins)
+        fitData['scurve_xMin'] = np.repeat([ fitter.chargeBinning[vfat][1] for vfat in range(0,24) ], 128)
+        fitData['scurve_xMax'] = np.repeat([ fitter.chargeBinning[vfat][2] for vfat in range(0,24) ], 128)
+        fitData['fit_params'] = fitter.fitParams.reshape(3072, 4)
+        fitRanges = np.array([ getScurveFitRange(calDAC2Q_Slope[vfat], calDAC2Q_Intercept[vfat], options.isVFAT3) for vfat in range(0,24) ])
+        fitData['fit_xMin'] = np.repeat(fitRanges[:,0], 128)
+        fitData['fit_xMax'] = np.repeat(fitRanges[:,1], 128)
+        rp.array2tree(fitData, tree=myT)
+
+        # Per channel TObjects go in a friend tree with the same entry ordering
+        if options.fitObjects:
+            scurve_h = r.TH1D()
+            myObjT.Branch( 'scurve_h', scurve_h)
+            scurve_fit = r.TF1()
+            myObjT.Branch( 'scurve_fit', scurve_fit)
+            for vfat in range(0,24):
+                for chan in range (0, 128):
+                    fitter.scanHistos[vfat][chan].Copy(scurve_h)
+                    fitter.getFunc(vfat,chan).Copy(scurve_fit)
+                    myObjT.Fill()
+                    pass
+                pass
+            myT.AddFriend(myObjT)
+            pass
     
         print("Storing Output Data")
+        telemetry.startStage("fill")
         encSummaryPlots = {}
         encSummaryPlotsByiEta = {}
         fitSummaryPlots = {}
@@ -528,42 +720,17 @@ if __name__ == '__main__':
                 allEffPedByiEta[ieta][(iphi-1)*chan + chan] = effectivePedestals[vfat][chan]
                 allThreshByiEta[ieta][(iphi-1)*chan + chan] = scanFitResults[0][vfat][chan]
 
-                # Set arrays linked to TBranches
-                chi2[0] = scanFitResults[3][vfat][chan]
-                mask[0] = masks[vfat][chan]
-                maskReason[0] = maskReasons[vfat][chan]
-                ndf[0] = int(scanFitResults[5][vfat][chan])
-                Nhigh[0] = int(scanFitResults[4][vfat][chan])
-                noise[0] = scanFitResults[1][vfat][chan]
-                panPin[0] = dict_vfatChanLUT[vfat]["PanPin"][chan] 
-                ped_eff[0] = effectivePedestals[vfat][chan]
-                pedestal[0] = scanFitResults[2][vfat][chan]
-                ROBstr[0] = dict_vfatChanLUT[vfat]["Strip"][chan]
-                threshold[0] = scanFitResults[0][vfat][chan]
-                trimDAC[0] = trim_list[vfat][chan]
-                trimRange[0] = trimrange_list[vfat][chan] 
-                vfatCH[0] = chan
-                vfatID[0] = dict_vfatID[vfat]
-                vfatN[0] = vfat
-                vthr[0] = vthr_list[vfat][chan]
-                
-                # Set TObjects linked to TBranches
-                holder_curve = fitter.scanHistos[vfat][chan]
-                holder_curve.Copy(scurve_h)
-                scurve_fit = fitter.getFunc(vfat,chan).Clone('scurveFit_vfat%i_chan%i'%(vfat,chan))
-                
                 # Filling the arrays for plotting later
-                if options.drawbad:
-                    if (chi2[0] > 1000.0 or chi2[0] < 1.0):
+                if options.drawbad and not options.noRender:
+                    if (scanFitResults[3][vfat][chan] > 1000.0 or scanFitResults[3][vfat][chan] < 1.0):
                         canvas = r.TCanvas('canvas', 'canvas', 500, 500)
                         r.gStyle.SetOptStat(1111111)
-                        scurve_h.Draw()
-                        scurve_fit.Draw('SAME')
+                        fitter.scanHistos[vfat][chan].Draw()
+                        fitter.getFunc(vfat,chan).Draw('SAME')
                         canvas.Update()
-                        canvas.SaveAs('Fit_Overlay_vfat%i_vfatCH%i.png'%(VFAT, chan))
+                        canvas.SaveAs('Fit_Overlay_vfat%i_vfatCH%i.png'%(vfat, chan))
                         pass
                     pass
-                myT.Fill()
                 pass
 
             # Make fit Summary plot
@@ -770,57 +937,57 @@ if __name__ == '__main__':
             pass
         pass
     
-    # Save the summary plots and channel config file
-    if options.PanPin:
-        saveSummary(vSummaryPlots, vSummaryPlotsPanPin2, '%s/Summary.png'%filename, trimVcal) 
-    else: 
-        saveSummary(vSummaryPlots, None, '%s/Summary.png'%filename, trimVcal)
-
-    if options.performFit:
+    # Save the summary plots
+    telemetry.startStage("render")
+    if not options.noRender:
+        renderQueue = SummaryRenderQueue()
         if options.PanPin:
-            saveSummary(vSummaryPlotsNoMaskedChan, vSummaryPlotsNoMaskedChanPanPin2, '%s/PrunedSummary.png'%filename, trimVcal)
-        else:
-            saveSummary(vSummaryPlotsNoMaskedChan, None, '%s/PrunedSummary.png'%filename, trimVcal)
-        saveSummary(fitSummaryPlots, None, '%s/fitSummary.png'%filename, None, drawOpt="APE1")
-        saveSummary(threshSummaryPlots, None, '%s/ScurveMeanSummary.png'%filename, None, drawOpt="AP")
-        saveSummary(effPedSummaryPlots, None, '%s/ScurveEffPedSummary.png'%filename, None, drawOpt="E1")
-        saveSummary(encSummaryPlots, None, '%s/ScurveSigmaSummary.png'%filename, None, drawOpt="AP")
-
-        saveSummaryByiEta(threshSummaryPlotsByiEta, '%s/ScurveMeanSummaryByiEta.png'%filename, None, drawOpt="AP")
-        saveSummaryByiEta(effPedSummaryPlotsByiEta, '%s/ScurveEffPedSummaryByiEta.png'%filename, None, drawOpt="E1")
-        saveSummaryByiEta(encSummaryPlotsByiEta, '%s/ScurveSigmaSummaryByiEta.png'%filename, None, drawOpt="AP")
-
-        confF = open(filename+'/chConfig.txt','w')
-        confF.write('vfatN/I:vfatID/I:vfatCH/I:trimDAC/I:mask/I:maskReason/I\n')
-        for vfat in range(0,24):
-            for chan in range (0, 128):
-                confF.write('%i\t%i\t%i\t%i\t%i\t%i\n'%(
-                    vfat,
-                    dict_vfatID[vfat],
-                    chan,
-                    trim_list[vfat][chan],
-                    masks[vfat][chan],
-                    maskReasons[vfat][chan]))
-                pass
+            renderQueue.saveSummary(vSummaryPlots, vSummaryPlotsPanPin2, '%s/Summary.png'%filename, trimVcal) 
+        else: 
+            renderQueue.saveSummary(vSummaryPlots, None, '%s/Summary.png'%filename, trimVcal)
+
+        if options.performFit:
+            if options.PanPin:
+                renderQueue.saveSummary(vSummaryPlotsNoMaskedChan, vSummaryPlotsNoMaskedChanPanPin2, '%s/PrunedSummary.png'%filename, trimVcal)
+            else:
+                renderQueue.saveSummary(vSummaryPlotsNoMaskedChan, None, '%s/PrunedSummary.png'%filename, trimVcal)
+            renderQueue.saveSummary(fitSummaryPlots, None, '%s/fitSummary.png'%filename, None, drawOpt="APE1")
+            renderQueue.saveSummary(threshSummaryPlots, None, '%s/ScurveMeanSummary.png'%filename, None, drawOpt="AP")
+            renderQueue.saveSummary(effPedSummaryPlots, None, '%s/ScurveEffPedSummary.png'%filename, None, drawOpt="E1")
+            renderQueue.saveSummary(encSummaryPlots, None, '%s/ScurveSigmaSummary.png'%filename, None, drawOpt="AP")
+
+            renderQueue.saveSummaryByiEta(threshSummaryPlotsByiEta, '%s/ScurveMeanSummaryByiEta.png'%filename, None, drawOpt="AP")
+            renderQueue.saveSummaryByiEta(effPedSummaryPlotsByiEta, '%s/ScurveEffPedSummaryByiEta.png'%filename, None, drawOpt="E1")
+            renderQueue.saveSummaryByiEta(encSummaryPlotsByiEta, '%s/ScurveSigmaSummaryByiEta.png'%filename, None, drawOpt="AP")
             pass
-        confF.close()
+        renderQueue.render()
+        pass
+
+    # Save the channel config file
+    telemetry.startStage("write")
+    if options.performFit:
+        writeChConfig(filename+'/chConfig.txt', dict_vfatID, trim_list, masks, maskReasons)
         pass
 
     # Make 1D Plot for each VFAT showing all scurves
+    telemetry.startStage("render")
     # Don't use the ones stored in fitter since this may not exist (e.g. options.performFit = false)
+    makeChannelCanvases = not (options.noRender or options.summaryOnly)
+    canvOfScurveHistos = {}
     canvOfScurveHistosNoMaskedChan = {}
-    if options.PanPin:
-        canvOfScurveHistos = plotAllSCurvesOnCanvas(vSummaryPlots,vSummaryPlotsPanPin2,"scurves")
-    else:
-        canvOfScurveHistos = plotAllSCurvesOnCanvas(vSummaryPlots,None,"scurves")
+    canvOfScurveFits = {}
+    if makeChannelCanvases:
+        if options.PanPin:
+            canvOfScurveHistos = plotAllSCurvesOnCanvas(vSummaryPlots,vSummaryPlotsPanPin2,"scurves")
+        else:
+            canvOfScurveHistos = plotAllSCurvesOnCanvas(vSummaryPlots,None,"scurves")
 
-    if options.performFit:
+    if makeChannelCanvases and options.performFit:
         if options.PanPin:
             canvOfScurveHistosNoMaskedChan = plotAllSCurvesOnCanvas(vSummaryPlotsNoMaskedChan,vSummaryPlotsNoMaskedChanPanPin2,"scurvesNoMaskedChan")
         else:
             canvOfScurveHistosNoMaskedChan = plotAllSCurvesOnCanvas(vSummaryPlotsNoMaskedChan,None,"scurvesNoMaskedChan")
         
-        canvOfScurveFits = {}
         for vfat in range(0,24):
             canvOfScurveFits[vfat] = r.TCanvas("canv_scurveFits_vfat%i"%vfat,"Scurve Fits from VFAT%i"%vfat,600,600)
             canvOfScurveFits[vfat].cd()
@@ -835,8 +1002,11 @@ if __name__ == '__main__':
             canvOfScurveFits[vfat].Update()
 
     # Save TObjects
+    telemetry.startStage("write")
     outF.cd()
     if options.performFit:
+        if options.fitObjects:
+            myObjT.Write()
         myT.Write()
     for vfat in range(0,24):
         dirVFAT = outF.mkdir("VFAT%i"%vfat)
@@ -844,7 +1014,8 @@ if __name__ == '__main__':
         vSummaryPlots[vfat].Write()
         if options.PanPin:
             vSummaryPlotsPanPin2[vfat].Write()
-        canvOfScurveHistos[vfat].Write()
+        if makeChannelCanvases:
+            canvOfScurveHistos[vfat].Write()
         if options.performFit:
             vSummaryPlotsNoMaskedChan[vfat].Write()
             if options.PanPin:
@@ -853,8 +1024,9 @@ if __name__ == '__main__':
             threshSummaryPlots[vfat].Write()
             effPedSummaryPlots[vfat].Write()
             encSummaryPlots[vfat].Write()
-            canvOfScurveHistosNoMaskedChan[vfat].Write()
-            canvOfScurveFits[vfat].Write()
+            if makeChannelCanvases:
+                canvOfScurveHistosNoMaskedChan[vfat].Write()
+                canvOfScurveFits[vfat].Write()
             pass
     if options.performFit:
         dirSummary = outF.mkdir("Summary")
@@ -877,3 +1049,44 @@ if __name__ == '__main__':
 
     # Close output root file
     outF.Close()
+
+    if options.sidecar and options.performFit:
+        from gempython.gemplotting.utils.sidecar import writeSidecar
+        writeSidecar(filename+'/'+outfilename, 'scurveFitTree', fitData)
+
+    telemetry.stopStage()
+
+    return os.EX_OK
+
+def writeChConfig(chConfigFileName, dict_vfatID, trimDAC, masks, maskReasons):
+    """
+    Writes the channel config file produced by anaUltraScurve.py
+
+    chConfigFileName - name of the output file
+    dict_vfatID      - dictionary of vfatID, keys are vfat positions
+    trimDAC          - trimDAC values, indexed as [vfat][chan]
+    masks            - mask values, indexed as [vfat][chan]
+    maskReasons      - maskReason values, indexed as [vfat][chan]
+    """
+
+    confF = open(chConfigFileName,'w')
+    confF.write('vfatN/I:vfatID/I:vfatCH/I:trimDAC/I:mask/I:maskReason/I\n')
+    for vfat in range(0,24):
+        for chan in range (0, 128):
+            confF.write('%i\t%i\t%i\t%i\t%i\t%i\n'%(
+                vfat,
+                dict_vfatID[vfat],
+                chan,
+                trimDAC[vfat][chan],
+                masks[vfat][chan],
+                maskReasons[vfat][chan]))
+            pass
+        pass
+    confF.close()
+
+    return
+
+if __name__ == '__main__':
+    parser = makeScurveAnaParser()
+    (options, args) = parser.parse_args()
+    exit(runScurveAnalysis(options))
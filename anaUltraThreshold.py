@@ -5,17 +5,15 @@ anaUltraThreshold
 =================
 """
 
-if __name__ == '__main__':
-    import os
-    import sys
-    from optparse import OptionParser
-    from array import array
+def makeThresholdAnaParser():
+    """
+    Returns the OptionParser of anaUltraThreshold.py, its parse_args() gives
+    the options expected by runThresholdAnalysis()
+    """
 
-    from gempython.gemplotting.mapping.channelMaps import *
-    from gempython.gemplotting.mapping.PanChannelMaps import *
-    from gempython.utils.nesteddict import nesteddict as ndict
+    from gempython.gemplotting.utils.anaoptions import makeParser
 
-    from gempython.gemplotting.utils.anaoptions import parser
+    parser = makeParser()
 
     parser.add_option("--fileScurveFitTree", type="string", dest="fileScurveFitTree", default="SCurveFitData.root",
                       help="TFile containing scurveFitTree", metavar="fileScurveFitTree")
@@ -23,10 +21,36 @@ if __name__ == '__main__':
                       help="Z-Score for Outlier Identification in MAD Algo", metavar="zscore")
     parser.add_option("--pervfat", action="store_true", dest="pervfat",
                       help="Analysis for a per-VFAT scan (default is per-channel)", metavar="pervfat")
+    parser.add_option("--sidecar", action="store_true", dest="sidecar",
+                      help="Also write a columnar sidecar of the thrAnaTree next to the output file, see utils/sidecar.py", metavar="sidecar")
 
     parser.set_defaults(outfilename="ThresholdPlots.root")
 
-    (options, args) = parser.parse_args()
+    return parser
+
+def runThresholdAnalysis(options, telemetry=None):
+    """
+    Analyzes the threshold scan in options.filename as anaUltraThreshold.py
+    does from the command line, the output is written to the directory
+    options.filename[:-5]
+
+    options   - optparse.Values, e.g. from makeThresholdAnaParser().parse_args()
+    telemetry - optional AnaTelemetry on which the analysis stages are
+                recorded, see anatelemetry
+
+    Returns os.EX_OK
+    """
+
+    import os
+    from array import array
+
+    from gempython.gemplotting.utils.anatelemetry import AnaTelemetry
+    from gempython.utils.nesteddict import nesteddict as ndict
+
+    if telemetry is None:
+        telemetry = AnaTelemetry()
+    telemetry.startStage("read")
+
     filename = options.filename[:-5]
     os.system("mkdir " + filename)
 
@@ -104,6 +128,7 @@ if __name__ == '__main__':
         pass
 
     print 'Filling Histograms'
+    telemetry.startStage("fill")
     trimRange = dict((vfat,0) for vfat in range(0,24))
     dict_vfatID = dict((vfat, 0) for vfat in range(0,24))
     listOfBranches = inF.thrTree.GetListOfBranches()
@@ -130,19 +155,23 @@ if __name__ == '__main__':
         pass
 
     #Determine Hot Channels
+    telemetry.startStage("mask")
     print 'Determining hot channels'
-    from gempython.gemplotting.utils.anautilities import *
+    from gempython.gemplotting.utils.anautilities import initVFATArray, make3x8Canvas, SummaryRenderQueue
+    from gempython.gemplotting.utils.anamasks import findHotChannels
+    from gempython.gemplotting.utils.sidecar import loadArray
     import numpy as np
     import root_numpy as rp #note need root_numpy-4.7.2 (may need to run 'pip install root_numpy --upgrade')
     dict_hMaxVT1 = {}
     dict_hMaxVT1_NoOutlier = {}
+    allChanMaxVT1 = np.zeros((24,2,vSum[0].GetNbinsX()))
     for vfat in range(0,24):
         dict_hMaxVT1[vfat]          = r.TH1F('vfat%iChanMaxVT1'%vfat,"vfat%i"%vfat,256,-0.5,255.5)
         dict_hMaxVT1_NoOutlier[vfat]= r.TH1F('vfat%iChanMaxVT1_NoOutlier'%vfat,"vfat%i - No Outliers"%vfat,256,-0.5,255.5)
         dict_hMaxVT1_NoOutlier[vfat].SetLineColor(r.kRed)
 
         #For each channel determine the maximum thresholds
-        chanMaxVT1 = np.zeros((2,vSum[vfat].GetNbinsX()))
+        chanMaxVT1 = allChanMaxVT1[vfat]
         for chan in range(0,vSum[vfat].GetNbinsX()):
             chanProj = vSum[vfat].ProjectionY("projY",chan,chan,"")
             for thresh in range(chanProj.GetMaximumBin(),VT1_MAX+1):
@@ -153,9 +182,13 @@ if __name__ == '__main__':
                     break
                 pass
             pass
+        pass
 
-        #Determine Outliers (e.g. "hot" channels)
-        chanOutliers = isOutlierMADOneSided(chanMaxVT1[1,:], thresh=options.zscore)
+    #Determine Outliers (e.g. "hot" channels) for all VFATs at once
+    allChanOutliers = findHotChannels(allChanMaxVT1[:,1,:], zscore=options.zscore)
+    for vfat in range(0,24):
+        chanMaxVT1 = allChanMaxVT1[vfat]
+        chanOutliers = allChanOutliers[vfat]
         for chan in range(0,len(chanOutliers)):
             hot_channels[vfat][chan] = chanOutliers[chan]
 
@@ -192,7 +225,7 @@ if __name__ == '__main__':
         list_bNames.append("trimDAC")
 
         try:
-            array_VFATSCurveData = rp.root2array(options.fileScurveFitTree,treename="scurveFitTree",branches=list_bNames)
+            array_VFATSCurveData = loadArray(options.fileScurveFitTree,"scurveFitTree",list_bNames)
             dict_vfatTrimMaskData = dict((idx,initVFATArray(array_VFATSCurveData.dtype)) for idx in np.unique(array_VFATSCurveData[list_bNames[0]]))
             for dataPt in array_VFATSCurveData:
                 dict_vfatTrimMaskData[dataPt['vfatN']][dataPt[list_bNames[1]]]['mask'] =  dataPt['mask']
@@ -206,14 +239,18 @@ if __name__ == '__main__':
         pass
 
     #Save Output
+    telemetry.startStage("render")
     outF.cd()
-    saveSummary(dictSummary=vSum, name='%s/ThreshSummary.png'%filename, drawOpt="colz")
+    renderQueue = SummaryRenderQueue()
+    # vSum is pruned below, draw a copy
+    vSumUnpruned = dict((vfat, vSum[vfat].Clone("%s_unpruned"%vSum[vfat].GetName())) for vfat in range(0,24))
+    renderQueue.saveSummary(dictSummary=vSumUnpruned, name='%s/ThreshSummary.png'%filename, drawOpt="colz")
 
     vSumProj = {}
     for vfat in range(0,24):
         vSumProj[vfat] = vSum[vfat].ProjectionY()
         pass
-    saveSummary(dictSummary=vSumProj, name='%s/VFATSummary.png'%filename, drawOpt="")
+    renderQueue.saveSummary(dictSummary=vSumProj, name='%s/VFATSummary.png'%filename, drawOpt="")
 
     #Save VT1Max Distributions Before/After Outlier Rejection
     canv_vt1Max = make3x8Canvas(
@@ -247,18 +284,22 @@ if __name__ == '__main__':
         pass
 
     #Save output with new hot channels subtracted off
-    saveSummary(dictSummary=vSum, name='%s/ThreshPrunedSummary.png'%filename, drawOpt="colz")
+    renderQueue.saveSummary(dictSummary=vSum, name='%s/ThreshPrunedSummary.png'%filename, drawOpt="colz")
 
     vSumProjPruned = {}
     for vfat in range(0,24):
         vSumProjPruned[vfat] = vSum[vfat].ProjectionY("h_VT1_VFAT%i"%vfat)
         vSumProjPruned[vfat].Write()
         pass
-    saveSummary(dictSummary=vSumProjPruned, name='%s/VFATPrunedSummary.png'%filename, drawOpt="")
+    renderQueue.saveSummary(dictSummary=vSumProjPruned, name='%s/VFATPrunedSummary.png'%filename, drawOpt="")
+
+    # Render before vSumProj is overwritten by the ProjectionY() calls below
+    renderQueue.render()
 
     #Now determine what VT1 to use for configuration.  The first threshold bin with no entries for now.
     #Make a text file readable by TTree::ReadFile
     print 'Determining the VT1 values for each VFAT'
+    telemetry.startStage("write")
     vt1 = dict((vfat,0) for vfat in range(0,24))
     for vfat in range(0,24):
         proj = vSum[vfat].ProjectionY()
@@ -289,6 +330,10 @@ if __name__ == '__main__':
     myT.Write()
     outF.Close()
 
+    if options.sidecar:
+        from gempython.gemplotting.utils.sidecar import writeSidecar
+        writeSidecar(filename+'/'+outfilename, 'thrAnaTree')
+
     #Update channel registers configuration file
     if options.chConfigKnown:
         confF = open(filename+'/chConfig_MasksUpdated.txt','w')
@@ -312,4 +357,12 @@ if __name__ == '__main__':
         confF.close()
         pass
 
+    telemetry.stopStage()
     print 'Analysis Completed Successfully'
+
+    return os.EX_OK
+
+if __name__ == '__main__':
+    parser = makeThresholdAnaParser()
+    (options, args) = parser.parse_args()
+    exit(runThresholdAnalysis(options))
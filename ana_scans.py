@@ -8,20 +8,306 @@ ana\_scans
 .. moduleauthor:: Brian Dorney <brian.l.dorney@cern.ch>
 """
 
-def launchAna(args):
-  return launchAnaArgs(*args)
+from contextlib import contextmanager
+
+#: Queue on which the pool workers report (key, attempt, pid) when they
+#: start a task, set by scheduleAnaTasks() before the workers are forked
+startedQueue = None
+
+def getAnalysis(anaType):
+  """
+  Returns a tuple (makeParser, runAnalysis) for the analysis script used
+  for anaType, see ana_config.  runAnalysis(makeParser().parse_args(args)[0])
+  is equivalent to running the script with the command line args.
+  """
+
+  from gempython.gemplotting.utils.anaInfo import ana_config
+
+  if ana_config[anaType] == "anaUltraLatency.py":
+    from anaUltraLatency import makeLatencyAnaParser, runLatencyAnalysis
+    return (makeLatencyAnaParser, runLatencyAnalysis)
+  elif ana_config[anaType] == "anaUltraScurve.py":
+    from anaUltraScurve import makeScurveAnaParser, runScurveAnalysis
+    return (makeScurveAnaParser, runScurveAnalysis)
+  elif ana_config[anaType] == "anaUltraThreshold.py":
+    from anaUltraThreshold import makeThresholdAnaParser, runThresholdAnalysis
+    return (makeThresholdAnaParser, runThresholdAnalysis)
+  else:
+    raise KeyError("No analysis function known for %s"%(ana_config[anaType]))
+
+def initAnaWorker():
+  """
+  Imports ROOT and the analysis modules.  Called before the pool workers
+  are forked so that they inherit them and each analysis does not pay for
+  the imports.
+  """
+
+  import ROOT as r
+  r.gROOT.SetBatch(True)
+
+  from gempython.gemplotting.utils.anaInfo import ana_config
+  for anaType in ana_config.keys():
+    getAnalysis(anaType)
+    pass
+
+  return
+
+@contextmanager
+def redirectOutput(logFile):
+  """
+  Sends everything written to stdout and stderr while in the with block,
+  including the output of ROOT and other C++ code, to logFile
+  """
+
+  import os
+  import sys
+
+  sys.stdout.flush()
+  sys.stderr.flush()
+  savedStdout = os.dup(1)
+  savedStderr = os.dup(2)
+  os.dup2(logFile.fileno(), 1)
+  os.dup2(logFile.fileno(), 2)
+  try:
+    yield
+  finally:
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(savedStdout, 1)
+    os.dup2(savedStderr, 2)
+    os.close(savedStdout)
+    os.close(savedStderr)
+
+def isProcessAlive(pid):
+  """
+  Returns True if the process pid exists, it may be a zombie
+  """
+
+  import errno
+  import os
+
+  try:
+    os.kill(pid, 0)
+  except OSError as e:
+    return e.errno != errno.ESRCH
+  return True
+
+def launchAnaTask(task):
+  """
+  Runs launchAnaArgs for one chamber and never raises, so that a failure
+  of one chamber does not stop the analysis of the others.  Only
+  KeyboardInterrupt is passed on.
+
+  task - tuple (key, attempt, args), args being the arguments of
+         launchAnaArgs and attempt the number of times key was started
+
+  Returns a tuple (key, returncode, telemetry), telemetry being the
+  report of the AnaTelemetry of the analysis
+  """
+
+  import os
+  import traceback
+
+  from gempython.gemplotting.utils.anatelemetry import AnaTelemetry
+
+  key, attempt, args = task
+  if startedQueue is not None:
+    # Lets the scheduler notice if this process dies during the task
+    startedQueue.put((key, attempt, os.getpid()))
+
+  telemetry = AnaTelemetry()
+  try:
+    returncode = launchAnaArgs(*args, telemetry=telemetry)
+  except KeyboardInterrupt:
+    raise
+  except SystemExit as e:
+    returncode = e.code
+  except BaseException as e:
+    traceback.print_exc()
+    returncode = -1
+  return (key, returncode, telemetry.report())
+
+def scheduleAnaTasks(dictOfTasks, dictOfDeps=None, nWorkers=1, maxRetries=0, nonRetriableCodes=()):
+  """
+  Runs the analysis tasks of dictOfTasks on nWorkers processes.  A task is
+  started as soon as all the tasks it depends on have succeeded, there is
+  no barrier between the analysis types.  A task whose dependency failed
+  is not run.
+
+  dictOfTasks       - dict of task key to the arguments of launchAnaArgs
+  dictOfDeps        - dict of task key to the list of the keys of the
+                      tasks which must succeed before it is started
+  nWorkers          - number of worker processes, each running a single
+                      task; with nWorkers = 1 the tasks run in the calling
+                      process
+  maxRetries        - number of times a failed task is started again
+  nonRetriableCodes - return codes for which a task is not started again
+
+  Returns a tuple of dicts keyed by task key:
+
+      [0] -> return code of the last attempt, None if the task was not run
+      [1] -> number of attempts
+      [2] -> telemetry report of the last attempt, see anatelemetry
+  """
+
+  import signal
+  import time
+  from multiprocessing import Pool
+  from multiprocessing.queues import SimpleQueue
+
+  global startedQueue
+
+  if dictOfDeps is None:
+    dictOfDeps = {}
+
+  def describeTask(key):
+    return "%s analysis of %s"%(dictOfTasks[key][0], dictOfTasks[key][1])
+
+  initAnaWorker()
+  if nWorkers == 1:
+    pool = None
+  else:
+    startedQueue = SimpleQueue()
+    # Each worker runs a single task so that every chamber starts from a
+    # clean ROOT state and memory is returned after each analysis
+    # from: https://stackoverflow.com/questions/11312525/catch-ctrlc-sigint-and-exit-multiprocesses-gracefully-in-python
+    original_sigint_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pool = Pool(nWorkers, maxtasksperchild=1)
+    signal.signal(signal.SIGINT, original_sigint_handler)
+    pass
+
+  # Tasks finished in the calling process, as (key, returncode, telemetry)
+  listOfFinished = []
+  # AsyncResult and worker pid of the tasks given to the pool
+  dictOfRunning = {}
+  dictOfPids = {}
+  listOfLost = []
+  def submitTask(key):
+    dictOfAttempts[key] += 1
+    task = (key, dictOfAttempts[key], dictOfTasks[key])
+    if pool is None:
+      listOfFinished.append(launchAnaTask(task))
+    else:
+      dictOfRunning[key] = pool.apply_async(launchAnaTask, (task,))
+    return
+
+  def waitForTask():
+    """
+    Returns (key, returncode, telemetry) of the next finished task.  A
+    task whose worker died without returning is reported as failed.
+    """
+
+    if pool is None:
+      return listOfFinished.pop(0)
+
+    while True:
+      while not startedQueue.empty():
+        key, attempt, pid = startedQueue.get()
+        if attempt == dictOfAttempts[key]:
+          dictOfPids[key] = pid
+        pass
+
+      for key in sorted(dictOfRunning.keys()):
+        result = dictOfRunning[key]
+        pid = dictOfPids.get(key)
+        if not result.ready() and pid is not None and not isProcessAlive(pid):
+          # The result is sent before the worker exits, give it time to arrive
+          result.wait(5)
+          if not result.ready():
+            print "Worker process %i died while running the %s"%(pid, describeTask(key))
+            del dictOfRunning[key]
+            del dictOfPids[key]
+            listOfLost.append(key)
+            return (key, -1, None)
+        if result.ready():
+          del dictOfRunning[key]
+          dictOfPids.pop(key, None)
+          try:
+            return result.get()
+          except Exception as e:
+            print "Unable to get the result of the %s: %s"%(describeTask(key), e)
+            return (key, -1, None)
+        pass
+
+      time.sleep(0.2)
+
+  dictOfResults = {}
+  dictOfAttempts = dict((key, 0) for key in dictOfTasks.keys())
+  dictOfTelemetry = {}
+  waitingKeys = sorted(dictOfTasks.keys())
+  nRunning = 0
+  try:
+    while True:
+      # Start, or skip, the waiting tasks whose dependencies are finished
+      foundReady = True
+      while foundReady:
+        foundReady = False
+        for key in list(waitingKeys):
+          listOfDeps = dictOfDeps.get(key, [])
+          if any(dep in dictOfResults and dictOfResults[dep] != 0 for dep in listOfDeps):
+            print "Skipping %s, a step it depends on failed"%(describeTask(key))
+            waitingKeys.remove(key)
+            dictOfResults[key] = None
+            foundReady = True
+          elif all(dictOfResults.get(dep) == 0 for dep in listOfDeps):
+            waitingKeys.remove(key)
+            submitTask(key)
+            nRunning += 1
+            pass
+          pass
+        pass
+
+      if nRunning == 0:
+        for key in waitingKeys:
+          print "Skipping %s, its dependencies can never be satisfied"%(describeTask(key))
+          dictOfResults[key] = None
+          pass
+        break
+
+      key, returncode, dictOfTelemetry[key] = waitForTask()
+      nRunning -= 1
+      if returncode == 0:
+        print "Finished %s"%(describeTask(key))
+        dictOfResults[key] = returncode
+      elif returncode not in nonRetriableCodes and dictOfAttempts[key] <= maxRetries:
+        print "%s failed with code %s, retrying"%(describeTask(key), returncode)
+        submitTask(key)
+        nRunning += 1
+      else:
+        print "%s failed with code %s"%(describeTask(key), returncode)
+        dictOfResults[key] = returncode
+        pass
+      pass
+  except KeyboardInterrupt:
+    print("Caught KeyboardInterrupt, terminating workers")
+    if pool is not None:
+      pool.terminate()
+    raise
+
+  if pool is not None:
+    if len(listOfLost) > 0:
+      # The pool waits forever for the results of lost tasks on join()
+      pool.terminate()
+    else:
+      pool.close()
+    pool.join()
+    startedQueue = None
+
+  return (dictOfResults, dictOfAttempts, dictOfTelemetry)
 
 def launchAnaArgs(anaType, cName, cType, scandate,
                   scandatetrim=None, ztrim=4.0, chConfigKnown=False,
                   channels=False, panasonic=False,
-                  latFit=False, latSigRange=None, latSigMaskRange=None):
+                  latFit=False, latSigRange=None, latSigMaskRange=None,
+                  force=False, telemetry=None):
+  import json
   import os
-  import subprocess
-  from subprocess import CalledProcessError
+  import shutil
+  import traceback
 
   from gempython.gemplotting.utils.anaInfo import ana_config
+  from gempython.gemplotting.utils.anamanifest import isUpToDate, makeManifest, writeManifest
   from gempython.gemplotting.utils.anautilities import getDirByAnaType
-  from gempython.utils.wrappers import runCommand
 
   #dataPath  = os.getenv('DATA_PATH')
   dirPath   = getDirByAnaType(anaType, cName, ztrim)
@@ -30,9 +316,9 @@ def launchAnaArgs(anaType, cName, cType, scandate,
   print "Analysis Requested: %s"%(anaType)
 
   #Build Commands
-  cmd = [ana_config[anaType]]
+  cmd = []
   postCmds = []
-  postCmds.append(["mkdir","-p","%s"%(elogPath)])
+  inputFiles = []
   if anaType == "latency":
     dirPath = "%s/%s/"%(dirPath,scandate)
     filename = dirPath + "LatencyScanData.root"
@@ -48,15 +334,15 @@ def launchAnaArgs(anaType, cName, cType, scandate,
         cmd.append("--latSigMaskRange=%s"%(latSigMaskRange))
         cmd.append("--latSigRange=%s"%(latSigRange))
 
-    postCmds.append(["cp","%s/LatencyScanData/Summary.png"%(dirPath),
-                 "%s/LatencySumary_%s.png"%(elogPath,cName)])
-    postCmds.append(["cp","%s/LatencyScanData/MaxHitsPerLatByVFAT.png"%(dirPath),
-                 "%s/MaxHitsPerLatByVFAT_%s.png"%(elogPath,cName)])
+    postCmds.append(("%s/LatencyScanData/Summary.png"%(dirPath),
+                 "%s/LatencySumary_%s.png"%(elogPath,cName)))
+    postCmds.append(("%s/LatencyScanData/MaxHitsPerLatByVFAT.png"%(dirPath),
+                 "%s/MaxHitsPerLatByVFAT_%s.png"%(elogPath,cName)))
     if latFit:
-        postCmds.append(["cp","%s/LatencyScanData/SignalOverBkg.png"%(dirPath),
-                 "%s/SignalOverBkg_%s.png"%(elogPath,cName)])
-        postCmds.append(["cp","%s/LatencyScanData/SignalNoBkg.png"%(dirPath),
-                 "%s/SignalNoBkg_%s.png"%(elogPath,cName)])
+        postCmds.append(("%s/LatencyScanData/SignalOverBkg.png"%(dirPath),
+                 "%s/SignalOverBkg_%s.png"%(elogPath,cName)))
+        postCmds.append(("%s/LatencyScanData/SignalNoBkg.png"%(dirPath),
+                 "%s/SignalNoBkg_%s.png"%(elogPath,cName)))
 
     pass
   elif anaType == "scurve":
@@ -77,10 +363,10 @@ def launchAnaArgs(anaType, cName, cType, scandate,
         cmd.append("--panasonic")
         pass
 
-    postCmds.append(["cp","%s/SCurveData/Summary.png"%(dirPath),
-                 "%s/SCurveSummary_%s_ztrim%2.2f.png"%(elogPath,cName,ztrim)])
-    postCmds.append(["cp","%s/SCurveData/chConfig.txt"%(dirPath),
-                 "%s/chConfig_%s_ztrim%2.2f.txt"%(elogPath,cName,ztrim)])
+    postCmds.append(("%s/SCurveData/Summary.png"%(dirPath),
+                 "%s/SCurveSummary_%s_ztrim%2.2f.png"%(elogPath,cName,ztrim)))
+    postCmds.append(("%s/SCurveData/chConfig.txt"%(dirPath),
+                 "%s/chConfig_%s_ztrim%2.2f.txt"%(elogPath,cName,ztrim)))
     pass
   elif "threshold" in anaType:
     dirPath = "%s/%s/"%(dirPath,scandate)
@@ -104,17 +390,18 @@ def launchAnaArgs(anaType, cName, cType, scandate,
         return os.EX_NOINPUT
 
       cmd.append("--fileScurveFitTree=%s"%(filename_Trim))
+      inputFiles.append(filename_Trim)
       pass
 
-    postCmds.append(["cp","%s/ThresholdScanData/ThreshSummary.png"%(dirPath),
-                   "%s/ThreshSummary_%s.png"%(elogPath,cName)])
-    postCmds.append(["cp","%s/ThresholdScanData/ThreshPrunedSummary.png"%(dirPath),
-                   "%s/ThreshPrunedSummary_%s.png"%(elogPath,cName)])
-    postCmds.append(["cp","%s/ThresholdScanData/vfatConfig.txt"%(dirPath),
-                   "%s/vfatConfig_%s.txt"%(elogPath,cName)])
+    postCmds.append(("%s/ThresholdScanData/ThreshSummary.png"%(dirPath),
+                   "%s/ThreshSummary_%s.png"%(elogPath,cName)))
+    postCmds.append(("%s/ThresholdScanData/ThreshPrunedSummary.png"%(dirPath),
+                   "%s/ThreshPrunedSummary_%s.png"%(elogPath,cName)))
+    postCmds.append(("%s/ThresholdScanData/vfatConfig.txt"%(dirPath),
+                   "%s/vfatConfig_%s.txt"%(elogPath,cName)))
     if chConfigKnown:
-      postCmds.append(["cp","%s/ThresholdScanData/chConfig_MasksUpdated.txt"%(dirPath),
-                     "%s/chConfig_MasksUpdated_%s.txt"%(elogPath,cName)])
+      postCmds.append(("%s/ThresholdScanData/chConfig_MasksUpdated.txt"%(dirPath),
+                     "%s/chConfig_MasksUpdated_%s.txt"%(elogPath,cName)))
       pass
     pass
   elif anaType == "trim":
@@ -135,46 +422,82 @@ def launchAnaArgs(anaType, cName, cType, scandate,
         cmd.append("--panasonic")
         pass
 
-    postCmds.append(["cp","%s/SCurveData_Trimmed/Summary.png"%(dirPath),
-                 "%s/SCurveSummaryTrimmed_%s_ztrim%2.2f.png"%(elogPath,cName,ztrim)])
-    postCmds.append(["cp","%s/SCurveData_Trimmed/chConfig.txt"%(dirPath),
-                 "%s/chConfigTrimmed_%s_ztrim%2.2f.txt"%(elogPath,cName,ztrim)])
+    postCmds.append(("%s/SCurveData_Trimmed/Summary.png"%(dirPath),
+                 "%s/SCurveSummaryTrimmed_%s_ztrim%2.2f.png"%(elogPath,cName,ztrim)))
+    postCmds.append(("%s/SCurveData_Trimmed/chConfig.txt"%(dirPath),
+                 "%s/chConfigTrimmed_%s_ztrim%2.2f.txt"%(elogPath,cName,ztrim)))
     pass
 
-  #Execute Commands
+  #Check if the outputs are up to date
+  makeAnaParser, runAnalysis = getAnalysis(anaType)
   try:
-    log = file("%s/anaLog.log"%(dirPath),"w")
+    (anaOptions, anaArgs) = makeAnaParser().parse_args(cmd)
+  except SystemExit as e:
+    print "Error: invalid arguments %s for %s"%(cmd, ana_config[anaType])
+    return os.EX_USAGE
+  outputDir = filename[:-5]
+  inputFiles.insert(0, filename)
+  outputFiles = [ source for source, destination in postCmds ]
+  outputFiles.append("%s/%s"%(outputDir, anaOptions.outfilename))
+  upToDate, reason = isUpToDate(outputDir, ana_config[anaType], cmd, inputFiles, outputFiles)
 
-    returncode = runCommand(cmd,log)
+  #Execute Commands
+  if upToDate and not force:
+    print "Skipping %s analysis of %s, outputs in %s are up to date"%(anaType, cName, outputDir)
+  else:
+    if force:
+      print "Forcing %s analysis of %s"%(anaType, cName)
+    else:
+      print "Running %s analysis of %s: %s"%(anaType, cName, reason)
+    manifest = makeManifest(ana_config[anaType], cmd, inputFiles, outputFiles)
+    log = open("%s/anaLog.log"%(dirPath),"w")
+    with redirectOutput(log):
+      try:
+        returncode = runAnalysis(anaOptions, telemetry)
+      except SystemExit as e:
+        returncode = e.code
+      except Exception as e:
+        traceback.print_exc()
+        returncode = -1
+    log.close()
+    if returncode is None:
+      returncode = 0
+    if telemetry is not None:
+      with open("%s/anaTelemetry.json"%(dirPath),"w") as telemetryFile:
+        json.dump(telemetry.report(), telemetryFile, indent=1, sort_keys=True)
     if returncode != 0:
-      print "Error: command exited with non-zero code %d" % returncode
+      print "Error: %s exited with non-zero code %s, see %s/anaLog.log" % (ana_config[anaType], returncode, dirPath)
       return returncode
-    for item in postCmds:
-      returncode = runCommand(item)
-      if returncode != 0:
-        print "Error: command exited with non-zero code %d" % returncode
-        return returncode
-      pass
-  except CalledProcessError as e:
-    print "Caught exception",e
-    return -1
+    writeManifest(outputDir, manifest)
+    pass
+
+  if not os.path.isdir(elogPath):
+    os.makedirs(elogPath)
+  for source, destination in postCmds:
+    try:
+      shutil.copy(source, destination)
+    except IOError as e:
+      print "Error: unable to copy %s to %s: %s" % (source, destination, e)
+      return os.EX_IOERR
     pass
   return 0
 
 if __name__ == '__main__':
-  import sys,os,signal
-  import subprocess
-  import itertools
-  from multiprocessing import Pool, freeze_support
+  import json
+  import sys,os
+  import time
+  from multiprocessing import cpu_count, freeze_support
 
   from gempython.gemplotting.mapping.chamberInfo import chamber_config, GEBtype
-  from gempython.gemplotting.utils.anaInfo import ana_config
+  from gempython.gemplotting.utils.anaInfo import ana_config, ana_dependencies
   from gempython.utils.wrappers import envCheck
 
   from gempython.gemplotting.utils.anaoptions import parser
 
   parser.add_option("--anaType", type="string", dest="anaType",
                     help="Analysis type to be executed, from list: "+str(ana_config.keys()), metavar="anaType")
+  parser.add_option("--force", action="store_true", dest="force",
+                    help="Run the analyses even if their outputs are up to date, see anamanifest", metavar="force")
   parser.add_option("--latFit", action="store_true", dest="performLatFit",
                     help="Fit the latency distributions", metavar="performLatFit")
   parser.add_option("--latSigRange", type="string", dest="latSigRange", default=None,
@@ -182,98 +505,181 @@ if __name__ == '__main__':
   parser.add_option("--latSigMaskRange", type="string", dest="latSigMaskRange", default=None,
                     help="Comma separated pair of values defining the region to be masked when trying to fit the noise, e.g. lat #notepsilon [40,44] is noise (lat < 40 || lat > 44)",
                     metavar="latSigMaskRange")
+  parser.add_option("--maxRetries", type="int", dest="maxRetries", default=1,
+                    help="Number of times a failed analysis is retried", metavar="maxRetries")
+  parser.add_option("--nWorkers", type="int", dest="nWorkers", default=None,
+                    help="Number of chambers analyzed in parallel, default is the number of CPUs", metavar="nWorkers")
+  parser.add_option("--pipeline", type="string", dest="pipeline", default=None,
+                    help="Comma separated list of analysis types to be executed for each chamber instead of --anaType, e.g. trim,thresholdch. "
+                    "An analysis starts as soon as the analyses of the same chamber it depends on are done (threshold analyses use the trim results "
+                    "with --chConfigKnown). The trim step analyzes --scandatetrim (--scandate if not given), the others --scandate", metavar="pipeline")
   parser.add_option("--series", action="store_true", dest="series",
-                    help="Run tests in series (default is false)", metavar="series")
+                    help="Run tests in series, same as --nWorkers=1 (default is false)", metavar="series")
 
   (options, args) = parser.parse_args()
 
   envCheck('DATA_PATH')
   envCheck('ELOG_PATH')
 
-  if options.anaType not in ana_config.keys():
-    print "Invalid analysis specificed, please select only from the list:"
-    print ana_config.keys()
+  if options.pipeline is not None:
+    if options.anaType is not None:
+      print "Only one of --anaType and --pipeline can be given"
+      exit(os.EX_USAGE)
+    listOfAnaTypes = options.pipeline.split(",")
+  else:
+    listOfAnaTypes = [options.anaType]
+
+  for anaType in listOfAnaTypes:
+    if anaType not in ana_config.keys():
+      print "Invalid analysis specificed, please select only from the list:"
+      print ana_config.keys()
+      exit(os.EX_USAGE)
+    pass
+
+  if options.nWorkers is not None and options.nWorkers < 1:
+    print "Invalid number of workers %i, must be at least 1"%(options.nWorkers)
     exit(os.EX_USAGE)
 
-  if options.debug:
-    print list(itertools.izip([options.anaType for x in range(len(chamber_config))],
-                         chamber_config.values(),
-                         [GEBtype[x]        for x in chamber_config.keys()],
-                         [options.scandate  for x in range(len(chamber_config))],
-                         [options.scandatetrim  for x in range(len(chamber_config))],
-                         [options.ztrim   for x in range(len(chamber_config))],
-                         [options.chConfigKnown   for x in range(len(chamber_config))],
-                         [options.channels   for x in range(len(chamber_config))],
-                         [options.PanPin   for x in range(len(chamber_config))],
-                         [options.performLatFit for x in range(len(chamber_config))],
-                         [options.latSigRange for x in range(len(chamber_config))],
-                         [options.latSigMaskRange for x in range(len(chamber_config))]
-                         )
-              )
+  if options.maxRetries < 0:
+    print "Invalid number of retries %i, must be positive"%(options.maxRetries)
+    exit(os.EX_USAGE)
+
+  # In a pipeline the trim step analyzes the trim scan, --scandate if
+  # --scandatetrim is not given, and its dependents use that same scan
+  scandatetrim = options.scandatetrim
+  if options.pipeline is not None and "trim" in listOfAnaTypes and scandatetrim is None:
+    scandatetrim = options.scandate
+
+  # Analyses to run, keyed by (link, anaType)
+  dictOfTasks = {}
+  dictOfDeps = {}
+  for anaType in listOfAnaTypes:
+    # Steps of the pipeline this analysis uses the output of
+    listOfDeps = [ dep for dep in ana_dependencies[anaType] if dep in listOfAnaTypes ]
+
+    scandate = options.scandate
+    if anaType == "trim" and options.pipeline is not None:
+      scandate = scandatetrim
 
-  if options.series:
-    print "Running jobs in serial mode"
     for link in chamber_config.keys():
-      chamber = chamber_config[link]
-      GEB = GEBtype[link]
-      launchAnaArgs(options.anaType,
-                chamber,
-                GEB,
-                options.scandate,
-                options.scandatetrim,
-                options.ztrim,
-                options.chConfigKnown,
-                options.channels,
-                options.PanPin,
-                options.performLatFit,
-                options.latSigRange,
-                options.latSigMaskRange
-               )
+      dictOfTasks[(link, anaType)] = (anaType,
+                                      chamber_config[link],
+                                      GEBtype[link],
+                                      scandate,
+                                      scandatetrim,
+                                      options.ztrim,
+                                      options.chConfigKnown or "trim" in listOfDeps,
+                                      options.channels,
+                                      options.PanPin,
+                                      options.performLatFit,
+                                      options.latSigRange,
+                                      options.latSigMaskRange,
+                                      options.force)
+      dictOfDeps[(link, anaType)] = [ (link, dep) for dep in listOfDeps ]
       pass
     pass
+
+  if options.debug:
+    for key in sorted(dictOfTasks.keys()):
+      print key, dictOfTasks[key], "depends on", dictOfDeps[key]
+      pass
+
+  if options.series:
+    options.nWorkers = 1
+  elif options.nWorkers is None:
+    options.nWorkers = cpu_count()
+  options.nWorkers = max(1, min(options.nWorkers, len(dictOfTasks)))
+
+  if options.nWorkers == 1:
+    print "Running jobs in serial mode"
   else:
-    print "Running jobs in parallel mode (using Pool(12))"
+    print "Running jobs in parallel mode (using Pool(%i))"%(options.nWorkers)
     freeze_support()
-    # from: https://stackoverflow.com/questions/11312525/catch-ctrlc-sigint-and-exit-multiprocesses-gracefully-in-python
-    original_sigint_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
-    pool = Pool(12)
-    signal.signal(signal.SIGINT, original_sigint_handler)
-    try:
-      res = pool.map_async(launchAna,
-                           itertools.izip([options.anaType for x in range(len(chamber_config))],
-                                          chamber_config.values(),
-                                          [GEBtype[x]        for x in chamber_config.keys()],
-                                          [options.scandate  for x in range(len(chamber_config))],
-                                          [options.scandatetrim  for x in range(len(chamber_config))],
-                                          [options.ztrim   for x in range(len(chamber_config))],
-                                          [options.chConfigKnown   for x in range(len(chamber_config))],
-                                          [options.channels   for x in range(len(chamber_config))],
-                                          [options.PanPin   for x in range(len(chamber_config))],
-                                          [options.performLatFit for x in range(len(chamber_config))],
-                                          [options.latSigRange for x in range(len(chamber_config))],
-                                          [options.latSigMaskRange for x in range(len(chamber_config))]
-                                          )
-                           )
-      # timeout must be properly set, otherwise tasks will crash
-      print res.get(999999999)
-      print("Normal termination")
-      pool.close()
-      pool.join()
-      print "Results:", res.get()
-      for returncode in res.get():
-        if returncode != 0:
-          sys.exit(returncode)
-        pass
-    except KeyboardInterrupt:
-      print("Caught KeyboardInterrupt, terminating workers")
-      pool.terminate()
-      sys.exit(-1)
-    except Exception as e:
-      print("Caught Exception %s, terminating workers"%(str(e)))
-      pool.terminate()
-      sys.exit(-1)
-    except: # catch *all* exceptions
-      e = sys.exc_info()[0]
-      print("Caught non-Python Exception %s"%(e))
-      pool.terminate()
-      sys.exit(-1)
+
+  try:
+    runStartTime = time.time()
+    dictOfResults, dictOfAttempts, dictOfTelemetry = scheduleAnaTasks(dictOfTasks, dictOfDeps,
+                                                     nWorkers=options.nWorkers,
+                                                     maxRetries=options.maxRetries,
+                                                     # Exit codes for which trying again will not help
+                                                     nonRetriableCodes=[os.EX_NOINPUT, os.EX_USAGE])
+  except KeyboardInterrupt:
+    sys.exit(-1)
+
+  # Summarize
+  from tabulate import tabulate
+
+  statusTable = []
+  nFailed = 0
+  for link, anaType in sorted(dictOfTasks.keys(), key=lambda key: (key[0], listOfAnaTypes.index(key[1]))):
+    returncode = dictOfResults[(link, anaType)]
+    if returncode is None:
+      status = "SKIPPED"
+    elif returncode == 0:
+      status = "OK"
+    else:
+      status = "FAILED"
+    if returncode != 0:
+      nFailed += 1
+    statusTable.append([link,
+                        chamber_config[link],
+                        anaType,
+                        status,
+                        returncode,
+                        dictOfAttempts[(link, anaType)]])
+    pass
+  print ""
+  print(tabulate(statusTable,
+                 headers = ['Link', 'Chamber', 'Analysis', 'Status', 'Return code', 'Attempts'],
+                 tablefmt = 'pipe',
+                 numalign = 'center'))
+  print ""
+  print "%i of %i analyses succeeded"%(len(statusTable) - nFailed, len(statusTable))
+
+  # Telemetry of the run, next to the elog plots
+  elogPath = "%s/%s"%(os.getenv('ELOG_PATH'),options.scandate)
+  if not os.path.isdir(elogPath):
+    os.makedirs(elogPath)
+  listOfStages = []
+  runTelemetry = {
+          "anaTypes":listOfAnaTypes,
+          "scandate":options.scandate,
+          "nWorkers":options.nWorkers,
+          "wallTime":time.time() - runStartTime,
+          "analyses":[]
+          }
+  telemetryTable = []
+  for link, anaType in sorted(dictOfTasks.keys(), key=lambda key: (key[0], listOfAnaTypes.index(key[1]))):
+    report = dictOfTelemetry.get((link, anaType))
+    if report is None:
+      continue
+    report = dict(report, link=link, chamber=chamber_config[link], anaType=anaType, returncode=dictOfResults[(link, anaType)])
+    runTelemetry["analyses"].append(report)
+    stageWallTime = dict((stage["name"], stage["wallTime"]) for stage in report["stages"])
+    for name in [ stage["name"] for stage in report["stages"] ]:
+      if name not in listOfStages:
+        listOfStages.append(name)
+      pass
+    telemetryTable.append(([link, chamber_config[link], anaType, report["wallTime"], report["cpuTime"], report["peakRSS"], report["peakRSSScope"]], stageWallTime))
+    pass
+  telemetryTable = [ row + [ stageWallTime.get(name, "-") for name in listOfStages ] for row, stageWallTime in telemetryTable ]
+  telemetryText = tabulate(telemetryTable,
+                           headers = ['Link', 'Chamber', 'Analysis', 'Wall (s)', 'CPU (s)', 'Peak RSS (MB)', 'Peak RSS of'] + [ '%s (s)'%(name) for name in listOfStages ],
+                           tablefmt = 'pipe',
+                           floatfmt = '.1f',
+                           numalign = 'center')
+  print ""
+  print telemetryText
+  print ""
+  print "Total wall time %.1f s"%(runTelemetry["wallTime"])
+  if any(report["peakRSSScope"] == "process" for report in runTelemetry["analyses"]):
+    print "Peak RSS of 'process' is the peak of the whole process, it could not be reset for each analysis on this kernel"
+  telemetryFileName = "%s/anaScansTelemetry_%s.json"%(elogPath, "_".join(listOfAnaTypes))
+  with open(telemetryFileName, "w") as telemetryFile:
+    json.dump(runTelemetry, telemetryFile, indent=1, sort_keys=True)
+  with open(telemetryFileName.replace(".json",".txt"), "w") as telemetryFile:
+    telemetryFile.write(telemetryText + "\n")
+  print "Telemetry written to %s"%(telemetryFileName)
+
+  # Exit code is the number of failed or skipped analyses
+  sys.exit(min(nFailed, 255))
@@ -5,24 +5,36 @@
 
 from optparse import OptionParser
 
-parser = OptionParser()
-parser.add_option("-c","--channels", action="store_true", dest="channels",
-                  help="Make plots vs channels instead of strips", metavar="channels")
-parser.add_option("--chConfigKnown", action="store_true", dest="chConfigKnown",
-                   help="Channel config already known", metavar="chConfigKnown")
-parser.add_option("-d", "--debug", action="store_true", dest="debug",
-                  help="print extra debugging information", metavar="debug")
-parser.add_option("-i", "--infilename", type="string", dest="filename",
-                  help="Specify Input Filename", metavar="filename")
-parser.add_option("-p","--panasonic", action="store_true", dest="PanPin",
-                  help="Make plots vs Panasonic pins instead of strips", metavar="PanPin")
-parser.add_option("-o", "--outfilename", type="string", dest="outfilename",
-                  help="Specify Output Filename", metavar="outfilename")
-parser.add_option("--scandate", type="string", dest="scandate", default="current",
-                  help="Specify specific date to analyze", metavar="scandate")
-parser.add_option("--scandatetrim", type="string", dest="scandatetrim", default=None,
-                  help="Specify the scan date of the trim run that corresponds to the chConfig.txt used in scandate", metavar="scandatetrim")
-parser.add_option("-t", "--type", type="string", dest="GEBtype", default="long",
-                  help="Specify GEB (long/short)", metavar="GEBtype")
-parser.add_option("--ztrim", type="float", dest="ztrim", default=4.0,
-                  help="Specify the p value of the trim", metavar="ztrim")
+def makeParser():
+    """
+    Returns a new OptionParser holding the options common to all analysis
+    tools, each tool adds its own options to it.  A new parser is needed
+    when several tools are run in the same process, see ana_scans.py
+    """
+
+    parser = OptionParser()
+    parser.add_option("-c","--channels", action="store_true", dest="channels",
+                      help="Make plots vs channels instead of strips", metavar="channels")
+    parser.add_option("--chConfigKnown", action="store_true", dest="chConfigKnown",
+                       help="Channel config already known", metavar="chConfigKnown")
+    parser.add_option("-d", "--debug", action="store_true", dest="debug",
+                      help="print extra debugging information", metavar="debug")
+    parser.add_option("-i", "--infilename", type="string", dest="filename",
+                      help="Specify Input Filename", metavar="filename")
+    parser.add_option("-p","--panasonic", action="store_true", dest="PanPin",
+                      help="Make plots vs Panasonic pins instead of strips", metavar="PanPin")
+    parser.add_option("-o", "--outfilename", type="string", dest="outfilename",
+                      help="Specify Output Filename", metavar="outfilename")
+    parser.add_option("--scandate", type="string", dest="scandate", default="current",
+                      help="Specify specific date to analyze", metavar="scandate")
+    parser.add_option("--scandatetrim", type="string", dest="scandatetrim", default=None,
+                      help="Specify the scan date of the trim run that corresponds to the chConfig.txt used in scandate", metavar="scandatetrim")
+    parser.add_option("-t", "--type", type="string", dest="GEBtype", default="long",
+                      help="Specify GEB (long/short)", metavar="GEBtype")
+    parser.add_option("--ztrim", type="float", dest="ztrim", default=4.0,
+                      help="Specify the p value of the trim", metavar="ztrim")
+
+    return parser
+
+#: Parser used by the analysis tools when run from the command line
+parser = makeParser()
@@ -163,6 +163,27 @@ def getMapping(mappingFileName):
 
     return ret_mapDict
 
+def getScanDataArrays(fileName, listOfBranches, treeName="scurveTree"):
+    """
+    Reads the branches in listOfBranches of treeName in one pass and returns
+    them as a numpy structured array, i.e. one column per branch.  Branches
+    which are not present in the tree are skipped, callers can check for
+    them with "branchName in data.dtype.names".  Only the requested branches
+    are read so memory use is bounded by the size of these columns.
+
+    fileName       - physical filename of the TFile holding the TTree
+    listOfBranches - list of branch names to read
+    treeName       - name of the TTree
+    """
+
+    import root_numpy as rp
+
+    listOfExistingBranches = rp.list_branches(fileName, treename=treeName)
+    return rp.root2array(
+            fileName,
+            treename=treeName,
+            branches=[ branch for branch in listOfBranches if branch in listOfExistingBranches ])
+
 def getStringNoSpecials(inputStr):
     """
     returns a string without special characters
@@ -210,15 +231,15 @@ def isOutlierIQR(arrayData):
     return (arrayData < (q1 - 1.5 * IQR)) | (arrayData > (q3 + 1.5 * IQR))
 
 #Use inter-quartile range (IQR) to reject outliers, but consider only high or low tail
+#The test is performed independently along axis, e.g. axis=1 for a (vfat,chan) array.
 #Returns a boolean array with True if points are outliers and False otherwise.
-def isOutlierIQROneSided(arrayData, rejectHighTail=True):
+def isOutlierIQROneSided(arrayData, rejectHighTail=True, axis=0):
     import numpy as np
     
-    dMin    = np.min(arrayData,     axis=0)
-    dMax    = np.max(arrayData,     axis=0)
-    median  = np.median(arrayData,  axis=0)
-
-    q1,q3   = np.percentile(arrayData, [25,75], axis=0)
+    # keepdims would need numpy 1.9
+    q1,q3   = np.percentile(arrayData, [25,75], axis=axis)
+    q1      = np.expand_dims(q1, axis)
+    q3      = np.expand_dims(q3, axis)
     IQR     = q3 - q1
 
     if rejectHighTail:
@@ -243,23 +264,30 @@ def isOutlierMAD(arrayData, thresh=3.5):
         return modified_z_score > thresh
 
 #Use MAD to reject outliers, but consider only high or low tail
+#The test is performed independently along axis, e.g. axis=1 for a (vfat,chan) array,
+#falling back on the IQR wherever the MAD is 0.
 #Returns a boolean array with True if points are outliers and False otherwise.
-def isOutlierMADOneSided(arrayData, thresh=3.5, rejectHighTail=True):
+def isOutlierMADOneSided(arrayData, thresh=3.5, rejectHighTail=True, axis=0):
     import numpy as np
     
-    median = np.median(arrayData, axis=0)
+    arrayData = np.asarray(arrayData, dtype=float)
+    # keepdims would need numpy 1.9
+    median = np.expand_dims(np.median(arrayData, axis=axis), axis)
     diff = arrayData - median
-    med_abs_deviation = np.median(np.abs(diff))
+    med_abs_deviation = np.expand_dims(np.median(np.abs(diff), axis=axis), axis)
 
-    if med_abs_deviation == 0:
-        return isOutlierIQROneSided(arrayData, rejectHighTail)
+    madIsZero = (med_abs_deviation == 0)
+    modified_z_score = 0.6745 * diff / np.where(madIsZero, 1., med_abs_deviation)
+
+    if rejectHighTail:
+        isOutlier = modified_z_score > thresh
     else:
-        modified_z_score = 0.6745 * diff / med_abs_deviation
+        isOutlier = modified_z_score < -1.0 * thresh
 
-        if rejectHighTail:
-            return modified_z_score > thresh
-        else:
-            return modified_z_score < -1.0 * thresh
+    if np.any(madIsZero):
+        isOutlier = np.where(madIsZero, isOutlierIQROneSided(arrayData, rejectHighTail, axis), isOutlier)
+
+    return isOutlier
 
 def make2x4Canvas(name, initialContent = None, initialDrawOpt = '', secondaryContent = None, secondaryDrawOpt = '', canv=None):
     """
@@ -636,3 +664,96 @@ def saveSummaryByiEta(dictSummary, name='Summary', trimPt=None, drawOpt="colz"):
     canv.SaveAs(name)
 
     return
+
+class SummaryRenderQueue(object):
+    """
+    Collects the summary images requested with saveSummary() and
+    saveSummaryByiEta() during an analysis and renders them all at once
+    with render().  The images are drawn concurrently in a pool of forked,
+    batch mode, ROOT processes.  The TObjects to draw are inherited by the
+    worker processes when they are forked so nothing is serialized.
+
+    The TObjects must not be modified between the request and the call
+    to render(), e.g. Clone() them if they are modified afterwards.
+    """
+
+    def __init__(self, nWorkers=None):
+        """
+        nWorkers - maximum number of worker processes, if None the number
+                   of CPUs is used.  With nWorkers = 1 images are rendered
+                   in the calling process.
+        """
+
+        if nWorkers is None:
+            from multiprocessing import cpu_count
+            nWorkers = cpu_count()
+
+        self.nWorkers = nWorkers
+        self.listOfRequests = []
+
+        return
+
+    def render(self):
+        """
+        Renders all requested images and returns once they are written
+        """
+
+        global _summaryRenderRequests
+
+        from multiprocessing import current_process
+
+        nWorkers = min(self.nWorkers, len(self.listOfRequests))
+        if current_process().daemon:
+            nWorkers = 1 # e.g. inside a pool worker of ana_scans.py, which cannot have children
+        if nWorkers <= 1:
+            for func, args, kwargs in self.listOfRequests:
+                func(*args, **kwargs)
+                pass
+        else:
+            from multiprocessing import Pool
+
+            # Workers find their request by index in the copy of this list made at fork time
+            _summaryRenderRequests = self.listOfRequests
+            pool = Pool(nWorkers)
+            try:
+                pool.map(_renderSummaryRequest, range(0,len(self.listOfRequests)), chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+                _summaryRenderRequests = []
+            pass
+
+        self.listOfRequests = []
+
+        return
+
+    def saveSummary(self, *args, **kwargs):
+        """
+        Queues a call to saveSummary(), takes the same arguments
+        """
+
+        self.listOfRequests.append((saveSummary, args, kwargs))
+        return
+
+    def saveSummaryByiEta(self, *args, **kwargs):
+        """
+        Queues a call to saveSummaryByiEta(), takes the same arguments
+        """
+
+        self.listOfRequests.append((saveSummaryByiEta, args, kwargs))
+        return
+
+_summaryRenderRequests = []
+
+def _renderSummaryRequest(idx):
+    """
+    Renders the idx^th request of a SummaryRenderQueue in a worker process
+    """
+
+    import ROOT as r
+    r.gROOT.SetBatch(True)
+
+    func, args, kwargs = _summaryRenderRequests[idx]
+    func(*args, **kwargs)
+
+    return
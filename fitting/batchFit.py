@@ -0,0 +1,199 @@
+"""
+``batchFit`` --- Vectorized S-curve fits
+----------------------------------------
+
+Fits the modified error function used by :any:`fitScanData.ScanDataFitter`
+to many S-curves at once.  All channels are stacked into ``(channels x bins)``
+arrays and minimized together with batched Levenberg-Marquardt iterations.
+
+The model is the same as the ``TF1`` used by ``ScanDataFitter``::
+
+    f(x) = p3 * erf( (max(p2,x) - p0) / (sqrt(2) * p1) ) + p3
+"""
+
+import numpy as np
+
+try:
+    from scipy.special import erf
+except ImportError:
+    def erf(x):
+        """
+        Vectorized error function, Abramowitz & Stegun 7.1.26, absolute
+        error below 1.5e-7.  Only used if scipy is not available.
+        """
+        x = np.asarray(x, dtype=float)
+        sign = np.sign(x)
+        ax = np.abs(x)
+        t = 1. / (1. + 0.3275911 * ax)
+        poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+        return sign * (1. - poly * np.exp(-ax * ax))
+
+#: Number of parameters of the scurve model
+NPARAMS = 4
+
+def scurveModel(x, params):
+    """
+    Evaluates the scurve model for each row of params
+
+    x      - array of shape (nBins,) or (nChannels, nBins)
+    params - array of shape (nChannels, 4) ordered as (p0, p1, p2, p3)
+
+    Returns an array of shape (nChannels, nBins)
+    """
+    params = np.asarray(params, dtype=float)
+    p0 = params[:,0,np.newaxis]
+    p1 = params[:,1,np.newaxis]
+    p2 = params[:,2,np.newaxis]
+    p3 = params[:,3,np.newaxis]
+
+    z = (np.maximum(p2, x) - p0) / (np.sqrt(2.) * p1)
+    return p3 * erf(z) + p3
+
+def scurveJacobian(x, params):
+    """
+    Derivatives of scurveModel() w.r.t. each parameter
+
+    Returns an array of shape (nChannels, nBins, 4)
+    """
+    params = np.asarray(params, dtype=float)
+    p0 = params[:,0,np.newaxis]
+    p1 = params[:,1,np.newaxis]
+    p2 = params[:,2,np.newaxis]
+    p3 = params[:,3,np.newaxis]
+
+    xEff = np.maximum(p2, x)
+    z = (xEff - p0) / (np.sqrt(2.) * p1)
+    gauss = p3 * 2. / np.sqrt(np.pi) * np.exp(-z * z)
+
+    jac = np.empty(z.shape + (NPARAMS,))
+    jac[...,0] = -gauss / (np.sqrt(2.) * p1)
+    jac[...,1] = -gauss * z / p1
+    jac[...,2] = np.where(x < p2, gauss / (np.sqrt(2.) * p1), 0.)
+    jac[...,3] = erf(z) + 1.
+    return jac
+
+def _chi2(x, y, weights, params):
+    res = (y - scurveModel(x, params)) * weights
+    return np.sum(res * res, axis=1)
+
+def _firstCrossing(x, frac, level):
+    """
+    Returns the x value of the first bin where frac >= level for each row,
+    rows that never reach level return the last x value
+    """
+    above = frac >= level
+    idx = np.argmax(above, axis=1)
+    idx[~np.any(above, axis=1)] = frac.shape[1] - 1
+    return x[np.arange(len(idx)),idx]
+
+def estimateScurveParams(x, y, nev):
+    """
+    Estimates initial parameters for the scurve model directly from the
+    histogram contents.  The 50% crossing gives p0, half the distance between
+    the 16% and 84% crossings gives p1, p2 is set to 0 and p3 is half of the
+    measured plateau.
+
+    x   - array of shape (nBins,) or (nChannels, nBins) with the bin centers
+    y   - array of shape (nChannels, nBins) with the bin contents
+    nev - array of shape (nChannels,) with the number of injected pulses,
+          used to bound the plateau estimate
+
+    Returns an array of shape (nChannels, 4)
+    """
+    y = np.asarray(y, dtype=float)
+    nev = np.asarray(nev, dtype=float)
+    x = np.asarray(x, dtype=float) + np.zeros(y.shape)
+
+    # Plateau, average of the bins within 10% of the maximum
+    yMax = np.max(y, axis=1)
+    nearMax = y >= 0.9 * yMax[:,np.newaxis]
+    plateau = np.sum(np.where(nearMax, y, 0.), axis=1) / np.maximum(np.sum(nearMax, axis=1), 1)
+    plateau = np.where(plateau > 0, plateau, np.maximum(nev, 1.))
+
+    frac = y / plateau[:,np.newaxis]
+    x16 = _firstCrossing(x, frac, 0.16)
+    x50 = _firstCrossing(x, frac, 0.50)
+    x84 = _firstCrossing(x, frac, 0.84)
+
+    binWidth = np.abs(x[:,1] - x[:,0])
+    sigma = np.maximum(0.5 * np.abs(x84 - x16), binWidth)
+
+    params = np.zeros((y.shape[0], NPARAMS))
+    params[:,0] = x50
+    params[:,1] = sigma
+    params[:,2] = 0.
+    params[:,3] = 0.5 * plateau
+    return params
+
+def fitScurvesBatch(x, y, yerr, init, lowLimits, highLimits, maxIter=100, tolerance=1e-6):
+    """
+    Fits the scurve model to each row of y with a batched, bounded,
+    Levenberg-Marquardt minimization of the chi2.  As for a ``TH1::Fit``
+    bins with zero error do not contribute to the chi2.
+
+    x          - array of shape (nBins,) or (nChannels, nBins) with the bin centers
+    y          - array of shape (nChannels, nBins) with the bin contents
+    yerr       - as y but for the bin errors
+    init       - array of shape (nChannels, 4) with the initial parameters
+    lowLimits  - as init but for the lower parameter limits
+    highLimits - as init but for the upper parameter limits
+    maxIter    - maximum number of iterations
+    tolerance  - fit is converged once the relative chi2 improvement is below this
+
+    Returns a tuple of numpy arrays:
+
+        [0] -> parameters, shape (nChannels, 4)
+        [1] -> chi2, shape (nChannels,)
+        [2] -> ndf, shape (nChannels,)
+        [3] -> fit valid, shape (nChannels,)
+    """
+    y = np.asarray(y, dtype=float)
+    yerr = np.asarray(yerr, dtype=float)
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = np.tile(x, (y.shape[0],1))
+    lowLimits, highLimits = np.minimum(lowLimits, highLimits), np.maximum(lowLimits, highLimits)
+
+    weights = np.where(yerr > 0, 1. / np.where(yerr > 0, yerr, 1.), 0.)
+    ndf = np.sum(yerr > 0, axis=1) - NPARAMS
+
+    params = np.clip(np.asarray(init, dtype=float), lowLimits, highLimits)
+    chi2 = _chi2(x, y, weights, params)
+    damping = 1e-3 * np.ones(y.shape[0])
+    converged = np.zeros(y.shape[0], dtype=bool)
+    diagIdx = np.arange(NPARAMS)
+
+    for iteration in range(maxIter):
+        active = np.nonzero(~converged)[0]
+        if len(active) == 0:
+            break
+
+        xA = x[active]
+        pA = params[active]
+        wA = weights[active]
+
+        jac = scurveJacobian(xA, pA) * wA[:,:,np.newaxis]
+        res = (y[active] - scurveModel(xA, pA)) * wA
+        jtj = np.einsum('nbi,nbj->nij', jac, jac)
+        jtr = np.einsum('nbi,nb->ni', jac, res)
+
+        # Marquardt scaling of the diagonal
+        lhs = jtj.copy()
+        lhs[:,diagIdx,diagIdx] += damping[active,np.newaxis] * (jtj[:,diagIdx,diagIdx] + 1e-12)
+        delta = np.linalg.solve(lhs, jtr[...,np.newaxis])[...,0]
+
+        trial = np.clip(pA + delta, lowLimits[active], highLimits[active])
+        trialChi2 = _chi2(xA, y[active], wA, trial)
+
+        improved = np.isfinite(trialChi2) & (trialChi2 <= chi2[active])
+        relChange = (chi2[active] - trialChi2) / np.maximum(chi2[active], 1e-30)
+
+        params[active[improved]] = trial[improved]
+        chi2[active[improved]] = trialChi2[improved]
+        damping[active] = np.where(improved, damping[active] / 10., damping[active] * 10.)
+
+        converged[active] = (improved & (relChange < tolerance)) | (damping[active] > 1e10)
+        pass
+
+    valid = np.isfinite(chi2) & (chi2 > 0) & (ndf > 0) & (params[:,1] > 0)
+    return (params, chi2, ndf, valid)
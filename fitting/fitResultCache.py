@@ -0,0 +1,146 @@
+"""
+``fitResultCache`` --- On disk cache of S-curve fit results
+-----------------------------------------------------------
+
+Stores the fit results of a :any:`fitScanData.ScanDataFitter` in a local
+directory so that repeated analyses of the same scan, e.g. while tuning
+the channel mask cuts of ``anaUltraScurve.py``, do not repeat the fit.
+
+Each entry is a ``.npz`` file named after a sha1 of the fitter input
+(scurves, number of pulses, dead channels, charge calibration) and of the
+fit settings.  Once the cache is larger than its size limit the least
+recently used entries are removed.
+"""
+
+import hashlib
+import numpy as np
+import os
+import zipfile
+
+#: Increment when the fit procedure changes so old entries are not used
+CACHE_VERSION = 1
+
+class FitResultCache(object):
+    def __init__(self, cacheDir, maxSizeMB=500):
+        """
+        cacheDir  - directory holding the cache entries, created if needed
+        maxSizeMB - size limit of cacheDir in MB
+        """
+
+        self.cacheDir = cacheDir
+        self.maxSize = maxSizeMB * 1024 * 1024
+
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+        return
+
+    def entryPath(self, key):
+        return os.path.join(self.cacheDir, "%s.npz"%(key))
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is below
+        its size limit
+        """
+
+        listEntries = []
+        for entryName in os.listdir(self.cacheDir):
+            if not entryName.endswith(".npz"):
+                continue
+            entryStat = os.stat(os.path.join(self.cacheDir, entryName))
+            listEntries.append((entryStat.st_mtime, entryStat.st_size, entryName))
+            pass
+
+        totalSize = sum(entry[1] for entry in listEntries)
+        for mtime, size, entryName in sorted(listEntries):
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(os.path.join(self.cacheDir, entryName))
+            except OSError:
+                continue # e.g. already removed by another process
+            totalSize -= size
+            pass
+
+        return
+
+    def load(self, fitter, key):
+        """
+        Loads the entry for key into fitter with ScanDataFitter.setFitResults(),
+        returns True if the entry was found and False otherwise
+
+        fitter - instance of ScanDataFitter
+        key    - string returned by makeKey()
+        """
+
+        entryPath = self.entryPath(key)
+        if not os.path.isfile(entryPath):
+            return False
+
+        try:
+            entry = np.load(entryPath)
+            try:
+                # Entries of an older layout lack arrays or have other shapes
+                fitResults = {}
+                for name, array in fitter.getFitResults().items():
+                    fitResults[name] = entry[name]
+                    if fitResults[name].shape != array.shape:
+                        raise ValueError("%s has shape %s instead of %s"%(name, fitResults[name].shape, array.shape))
+                    pass
+            finally:
+                entry.close()
+        except (IOError, ValueError, KeyError, zipfile.BadZipfile):
+            # Unreadable entry, e.g. partially written, it is refit and replaced
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass # e.g. already removed by another process
+            return False
+
+        fitter.setFitResults(fitResults)
+
+        # Mark as recently used
+        os.utime(entryPath, None)
+
+        return True
+
+    def makeKey(self, fitter, **settings):
+        """
+        Returns the cache key of the current input of fitter
+
+        fitter   - instance of ScanDataFitter, must already hold the scan data
+        settings - any option changing the fit result, e.g. the fit backend
+        """
+
+        keyHash = hashlib.sha1()
+        keyHash.update("version=%i;"%(CACHE_VERSION))
+        for name, array in sorted(fitter.getInputArrays().iteritems()):
+            array = np.ascontiguousarray(array)
+            keyHash.update("%s%s%s;"%(name, array.dtype.str, array.shape))
+            keyHash.update(array.tobytes())
+            pass
+        for name, value in sorted(settings.iteritems()):
+            keyHash.update("%s=%r;"%(name, value))
+            pass
+
+        return keyHash.hexdigest()
+
+    def store(self, fitter, key):
+        """
+        Stores the fit results of fitter under key then evicts old entries
+
+        fitter - instance of ScanDataFitter on which a fit was performed
+        key    - string returned by makeKey()
+        """
+
+        # Write to a temporary file first so readers never see a partial entry
+        entryPath = self.entryPath(key)
+        tmpPath = "%s.%i.tmp"%(entryPath, os.getpid())
+        with open(tmpPath, "wb") as tmpFile:
+            np.savez(tmpFile, **fitter.getFitResults())
+        os.rename(tmpPath, entryPath)
+
+        self.evict()
+
+        return
@@ -14,12 +14,81 @@ class DeadChannelFinder(object):
     def feed(self, event):
         self.isDead[event.vfatN][event.vfatCH] = False
 
+class LazyChannelContainer(object):
+    """
+    Container indexed as container[vfat][ch] which creates the stored
+    object only when it is first accessed, e.g. the TH1D and TF1 objects
+    of ScanDataFitter.  Objects that have been created are kept and
+    returned by later accesses.
+    """
+
+    def __init__(self, makeObject, fillObject):
+        """
+        makeObject - callable taking (vfat, ch) and returning a new object
+        fillObject - callable taking (vfat, ch, obj) which updates obj from
+                     the data it represents
+        """
+
+        self.makeObject = makeObject
+        self.fillObject = fillObject
+        self.objects = {}
+
+        return
+
+    def __getitem__(self, vfat):
+        return _LazyChannelRow(self, vfat)
+
+    def get(self, vfat, ch):
+        if (vfat,ch) not in self.objects:
+            obj = self.makeObject(vfat, ch)
+            self.fillObject(vfat, ch, obj)
+            self.objects[(vfat,ch)] = obj
+        return self.objects[(vfat,ch)]
+
+    def isCreated(self, vfat, ch):
+        return (vfat,ch) in self.objects
+
+    def refresh(self, vfat, ch):
+        """
+        Updates the object of (vfat, ch) if it has already been created
+        """
+
+        if (vfat,ch) in self.objects:
+            self.fillObject(vfat, ch, self.objects[(vfat,ch)])
+        return
+
+    def set(self, vfat, ch, obj):
+        self.objects[(vfat,ch)] = obj
+        return
+
+class _LazyChannelRow(object):
+    def __init__(self, container, vfat):
+        self.container = container
+        self.vfat = vfat
+
+    def __getitem__(self, ch):
+        return self.container.get(self.vfat, ch)
+
+    def __setitem__(self, ch, obj):
+        self.container.set(self.vfat, ch, obj)
+
 class ScanDataFitter(DeadChannelFinder):
     def __init__(self, calDAC2Q_m=None, calDAC2Q_b=None, isVFAT3=False):
         """
         calDAC2Q_m - list of slope values for "fC = m * cal_dac + b" equation, ordered by vfat position
         calDAC2Q_b - as calDAC2Q_m but for intercept b
         isVFAT3 - if using VFAT3
+
+        The scurves and fit results are stored in numpy arrays:
+
+            scanHits[vfat,ch,bin]      - scurve contents, bin 0 (nChargeBins+1) is the under (over) flow
+            scanHitErrors[vfat,ch,bin] - as scanHits but for the bin errors
+            fitParams[vfat,ch,ipar]    - parameters of the scurve fit
+            fitChi2[vfat,ch]           - chi2 of the scurve fit
+            fitNDF[vfat,ch]            - NDF of the scurve fit
+
+        The TH1D in scanHistos[vfat][ch] and the TF1 in scanFuncs[vfat][ch]
+        are created from these arrays when they are first accessed.
         """
 
         super(ScanDataFitter, self).__init__()
@@ -28,9 +97,6 @@ class ScanDataFitter(DeadChannelFinder):
         r.gStyle.SetOptStat(0)
 
         self.Nev = ndict()
-        self.scanFuncs  = ndict()
-        self.scanHistos = ndict()
-        self.scanHistosChargeBins = ndict()
         self.scanCount  = ndict()
         self.scanFitResults   = ndict()
 
@@ -54,23 +120,78 @@ class ScanDataFitter(DeadChannelFinder):
             self.scanFitResults[6][vfat] = np.zeros(128, dtype=bool)
             for ch in range(0,128):
                 self.scanCount[vfat][ch] = 0
-                if self.isVFAT3:
-                    self.scanFuncs[vfat][ch] = r.TF1('scurveFit_vfat%i_chan%i'%(vfat,ch),'[3]*TMath::Erf((TMath::Max([2],x)-[0])/(TMath::Sqrt(2)*[1]))+[3]',
-                            self.calDAC2Q_m[vfat]*253+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*1+self.calDAC2Q_b[vfat])
-                    self.scanHistos[vfat][ch] = r.TH1D('scurve_vfat%i_chan%i_h'%(vfat,ch),'scurve_vfat%i_chan%i_h'%(vfat,ch),
-                            254,self.calDAC2Q_m[vfat]*254.5+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*0.5+self.calDAC2Q_b[vfat])
-                else:
-                    self.scanFuncs[vfat][ch] = r.TF1('scurveFit_vfat%i_chan%i'%(vfat,ch),'[3]*TMath::Erf((TMath::Max([2],x)-[0])/(TMath::Sqrt(2)*[1]))+[3]',
-                            self.calDAC2Q_m[vfat]*1+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*253+self.calDAC2Q_b[vfat])
-                    self.scanHistos[vfat][ch] = r.TH1D('scurve_vfat%i_chan%i_h'%(vfat,ch),'scurve_vfat%i_chan%i_h'%(vfat,ch),
-                            254,self.calDAC2Q_m[vfat]*0.5+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*254.5+self.calDAC2Q_b[vfat])
-                    pass
-                self.scanHistosChargeBins[vfat][ch] = [self.scanHistos[vfat][ch].GetXaxis().GetBinLowEdge(binX) for binX in range(1,self.scanHistos[vfat][ch].GetNbinsX()+2) ] #Include overflow
                 pass
             pass
 
-        self.fitValid = [ np.zeros(128, dtype=bool) for vfat in range(24) ]
+        # Binning of the scurves, (nBins, xMin, xMax) for each vfat
+        self.nChargeBins = 254
+        self.chargeBinning = []
+        for vfat in range(0,24):
+            if self.isVFAT3:
+                self.chargeBinning.append((self.nChargeBins,
+                    self.calDAC2Q_m[vfat]*254.5+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*0.5+self.calDAC2Q_b[vfat]))
+            else:
+                self.chargeBinning.append((self.nChargeBins,
+                    self.calDAC2Q_m[vfat]*0.5+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*254.5+self.calDAC2Q_b[vfat]))
+                pass
+            pass
+
+        # Low edges of bins 1 to nChargeBins+1, computed as in TAxis::GetBinLowEdge()
+        self.chargeBinEdges = np.array([ xMin + np.arange(nBins+1) * ((xMax - xMin) / nBins) for nBins, xMin, xMax in self.chargeBinning ])
+
+        self.scanHits = np.zeros((24,128,self.nChargeBins+2))
+        self.scanHitErrors = np.zeros((24,128,self.nChargeBins+2))
+
+        self.fitParams = np.zeros((24,128,4))
+        self.fitChi2 = np.zeros((24,128))
+        self.fitNDF = np.zeros((24,128), dtype=int)
+        self.funcColor = r.kBlack * np.ones((24,128), dtype=int)
+
+        self.fitValid = np.zeros((24,128), dtype=bool)
+        self.fitIterations = np.zeros((24,128), dtype=int)
+        self.fitFirstTry = np.zeros((24,128), dtype=bool)
+
+        self.scanHistos = LazyChannelContainer(self._makeHisto, self._fillHisto)
+        self.scanFuncs = LazyChannelContainer(self._makeFunc, self._fillFunc)
+
+        return
+
+    def _makeHisto(self, vfat, ch):
+        nBins, xMin, xMax = self.chargeBinning[vfat]
+        histo = r.TH1D('scurve_vfat%i_chan%i_h'%(vfat,ch),'scurve_vfat%i_chan%i_h'%(vfat,ch), nBins, xMin, xMax)
+        histo.SetDirectory(0)
+        return histo
+
+    def _fillHisto(self, vfat, ch, histo):
+        import root_numpy as rp
+        rp.array2hist(self.scanHits[vfat,ch], histo, errors=self.scanHitErrors[vfat,ch])
+        return
+
+    def _makeFunc(self, vfat, ch):
+        return makeScurveFitFunc('scurveFit_vfat%i_chan%i'%(vfat,ch), self.calDAC2Q_m[vfat], self.calDAC2Q_b[vfat], self.isVFAT3)
+
+    def _fillFunc(self, vfat, ch, func):
+        for ipar in range(0,4):
+            func.SetParameter(ipar, self.fitParams[vfat,ch,ipar])
+        if self.fitValid[vfat,ch]:
+            func.SetChisquare(self.fitChi2[vfat,ch])
+            func.SetNDF(int(self.fitNDF[vfat,ch]))
+        func.SetLineColor(int(self.funcColor[vfat,ch]))
+        return
 
+    def _storeFitResult(self, vfat, ch, params, fitChi2, fitNDF):
+        self.fitParams[vfat,ch] = params
+        self.fitChi2[vfat,ch] = fitChi2
+        self.fitNDF[vfat,ch] = fitNDF
+        self.funcColor[vfat,ch] = r.kBlue-2
+        self.scanFitResults[0][vfat][ch] = params[0]
+        self.scanFitResults[1][vfat][ch] = params[1]
+        self.scanFitResults[2][vfat][ch] = params[2]
+        self.scanFitResults[3][vfat][ch] = fitChi2
+        self.scanFitResults[4][vfat][ch] = self.scanCount[vfat][ch]
+        self.scanFitResults[5][vfat][ch] = fitNDF
+        self.fitValid[vfat,ch] = True
+        self.scanFuncs.refresh(vfat, ch)
         return
 
     def feed(self, event):
@@ -95,15 +216,94 @@ class ScanDataFitter(DeadChannelFinder):
 
         from gempython.gemplotting.utils.anautilities import first_index_gt
         from math import sqrt
-        chargeBin = first_index_gt(self.scanHistosChargeBins[event.vfatN][event.vfatCH], charge)-1
-        self.scanHistos[event.vfatN][event.vfatCH].SetBinContent(chargeBin,event.Nhits)
-        self.scanHistos[event.vfatN][event.vfatCH].SetBinError(chargeBin,sqrt(event.Nhits))
+        chargeBin = first_index_gt(self.chargeBinEdges[event.vfatN], charge)-1
+        if chargeBin >= 0:
+            self.scanHits[event.vfatN,event.vfatCH,chargeBin] = event.Nhits
+            self.scanHitErrors[event.vfatN,event.vfatCH,chargeBin] = sqrt(event.Nhits)
+            self.scanHistos.refresh(event.vfatN,event.vfatCH)
         self.Nev[event.vfatN][event.vfatCH] = event.Nev
 
         return
 
+    def feedArray(self, vfatN, vfatCH, vcal, Nhits, Nev, isCurrentPulse=None, calSF=None):
+        """
+        Vectorized equivalent of calling feed() once per entry of the input
+        arrays, e.g. the branches of an scurveTree read with
+        root_numpy.tree2array().  Charges and bin indices are computed for
+        all entries at once and the hits are scattered into self.scanHits,
+        the histograms of the channels present in the input are then
+        updated from it if they have already been created.
+
+        vfatN          - array of vfat positions
+        vfatCH         - array of vfat channels
+        vcal           - array of CAL_DAC (VFAT3) or VCal (VFAT2) values
+        Nhits          - array of number of hits
+        Nev            - array of number of pulses
+        isCurrentPulse - array of isCurrentPulse values, only used for VFAT3
+        calSF          - array of calSF values, only used for VFAT3
+        """
+
+        vfatN = np.asarray(vfatN, dtype=int)
+        vfatCH = np.asarray(vfatCH, dtype=int)
+        vcal = np.asarray(vcal, dtype=float)
+        Nhits = np.asarray(Nhits, dtype=float)
+        Nev = np.asarray(Nev)
+
+        # Charge and entries counted in scanCount, see feed()
+        charge = self.calDAC2Q_m[vfatN]*vcal+self.calDAC2Q_b[vfatN]
+        if self.isVFAT3: #v3 electronics
+            if isCurrentPulse is None:
+                isCurrentPulse = np.zeros(len(vfatN), dtype=bool)
+            isCurrentPulse = np.asarray(isCurrentPulse, dtype=bool)
+            if np.any(isCurrentPulse):
+                #Q = CAL_DUR * CAL_DAC * 10nA * CAL_FS
+                calSFValues = np.array([ dict_calSF[key] for key in sorted(dict_calSF.keys()) ])
+                currentCharge = (1./ 40079000) * vcal * (10 * 1e-9) * calSFValues[np.asarray(calSF, dtype=int)] * 1e15
+                charge = np.where(isCurrentPulse, currentCharge, charge)
+            isCounted = np.where(isCurrentPulse, vcal > 254, (256-vcal) > 254)
+        else:
+            isCounted = vcal > 250
+            pass
+
+        # Same binning as feed(): first_index_gt(edges, charge)-1
+        chargeBin = np.zeros(len(vfatN), dtype=int)
+        for vfat in np.unique(vfatN):
+            isThisVFAT = (vfatN == vfat)
+            chargeBin[isThisVFAT] = np.searchsorted(self.chargeBinEdges[vfat], charge[isThisVFAT], side='right')-1
+            pass
+        isInRange = chargeBin >= 0
+
+        self.scanHits[vfatN[isInRange],vfatCH[isInRange],chargeBin[isInRange]] = Nhits[isInRange]
+        self.scanHitErrors[vfatN[isInRange],vfatCH[isInRange],chargeBin[isInRange]] = np.sqrt(Nhits[isInRange])
+
+        scanCount = np.zeros((24,128))
+        np.add.at(scanCount, (vfatN[isCounted],vfatCH[isCounted]), Nhits[isCounted])
+        lastNev = np.zeros((24,128), dtype=Nev.dtype)
+        lastNev[vfatN,vfatCH] = Nev
+
+        # Update the per channel containers
+        isPresent = np.zeros((24,128), dtype=bool)
+        isPresent[vfatN,vfatCH] = True
+        for vfat, ch in zip(*np.nonzero(isPresent)):
+            self.isDead[vfat][ch] = False
+            self.scanCount[vfat][ch] += int(scanCount[vfat,ch])
+            self.Nev[vfat][ch] = lastNev[vfat,ch]
+            self.scanHistos.refresh(vfat, ch)
+            pass
+
+        return
+
     def feedHisto(self, vfatN, vfatCH, histo, nEvts=None):
+        """
+        Uses histo as the scurve of (vfatN, vfatCH), histo must have the
+        same binning as the fitter, see self.chargeBinning
+        """
+
+        import root_numpy as rp
+
         self.scanHistos[vfatN][vfatCH] = histo
+        self.scanHits[vfatN,vfatCH] = rp.hist2array(histo, include_overflow=True)
+        self.scanHitErrors[vfatN,vfatCH] = [ histo.GetBinError(binX) for binX in range(0,histo.GetNbinsX()+2) ]
         self.isDead[vfatN][vfatCH] = False
         if nEvts is None:
             maxBin = self.scanHistos[vfatN][vfatCH].GetMaximumBin()
@@ -113,13 +313,22 @@ class ScanDataFitter(DeadChannelFinder):
 
         return
 
-    def fit(self, debug=False):
+    def fit(self, debug=False, nWorkers=1, maxRetries=4):
         """
         Iteratively fits all scurves
         Note:   if the user supplied calDAC2Q_m and calDAC2Q_b at
                 construction then output container will have relevant
                 parameters in charge units instead of DAC units
 
+        debug    - print the initial guess and result of each fit
+        nWorkers - number of processes used for fitting, if larger than 1
+                   the VFATs are distributed over a multiprocessing Pool.
+                   Each channel uses its own TRandom3 seed so the results
+                   do not depend on nWorkers.
+        maxRetries - number of fits attempted per channel after the
+                     fit starting from the data driven initial guess,
+                     see fitScurve()
+
         Returns self.scanFitResults
             
                  [0][vfat][ch] = scurve mean in either DAC units or charge (threshold of comparator)
@@ -139,163 +348,482 @@ class ScanDataFitter(DeadChannelFinder):
         r.gROOT.SetBatch(True)
         r.gStyle.SetOptStat(0)
 
-        random = r.TRandom3()
-        random.SetSeed(0)
+        listVFATInputs = []
         for vfat in range(0,24):
-            if self.isVFAT3:
-                fitTF1 = r.TF1('myERF','[3]*TMath::Erf((TMath::Max([2],x)-[0])/(TMath::Sqrt(2)*[1]))+[3]',
-                            self.calDAC2Q_m[vfat]*253+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*1+self.calDAC2Q_b[vfat])
-            else:
-                fitTF1 = r.TF1('myERF','[3]*TMath::Erf((TMath::Max([2],x)-[0])/(TMath::Sqrt(2)*[1]))+[3]',
-                            self.calDAC2Q_m[vfat]*1+self.calDAC2Q_b[vfat],self.calDAC2Q_m[vfat]*253+self.calDAC2Q_b[vfat])
-            fitTF1.SetLineColor(r.kBlack)
-            
-            if not debug:
-                print 'fitting vfat %i'%(vfat)
+            listVFATInputs.append({
+                "vfat":vfat,
+                "binning":self.chargeBinning[vfat],
+                "contents":self.scanHits[vfat],
+                "errors":self.scanHitErrors[vfat],
+                "Nev":[ self.Nev[vfat][ch] if ch in self.Nev[vfat].keys() else 0 for ch in range(0,128) ],
+                "isDead":self.isDead[vfat],
+                "calDAC2Q_m":self.calDAC2Q_m[vfat],
+                "calDAC2Q_b":self.calDAC2Q_b[vfat],
+                "isVFAT3":self.isVFAT3,
+                "debug":debug,
+                "maxRetries":maxRetries
+                })
+            pass
+
+        from multiprocessing import current_process
+        if current_process().daemon:
+            nWorkers = 1 # e.g. inside a pool worker of ana_scans.py, which cannot have children
+
+        if nWorkers > 1:
+            from multiprocessing import Pool
 
+            print 'fitting 24 vfats using %i workers'%(nWorkers)
+            pool = Pool(nWorkers)
+            try:
+                listVFATResults = pool.map(_fitVFATWorker, listVFATInputs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            listVFATResults = map(_fitVFATWorker, listVFATInputs)
+            pass
+
+        # Store the results
+        for vfat, dict_chanResults in listVFATResults:
+            for ch in range(0,128):
+                if ch not in dict_chanResults:
+                    self.funcColor[vfat,ch] = r.kGray
+                    self.scanFuncs.refresh(vfat, ch)
+                    continue
+                params, fitChi2, fitNDF, nFits = dict_chanResults[ch]
+                self.fitIterations[vfat,ch] = nFits
+                if params is None:
+                    continue
+                self.fitFirstTry[vfat,ch] = (nFits == 1)
+                self._storeFitResult(vfat, ch, params, fitChi2, fitNDF)
+                pass
+            pass
+
+        return self.scanFitResults
+
+    def fitBatch(self, debug=False, maxIter=100):
+        """
+        Alternative to fit() which fits all scurves at once using the
+        vectorized Levenberg-Marquardt minimizer of batchFit.py instead
+        of calling TH1::Fit for each channel.  The starting point of each
+        fit is estimated from the histogram contents, the parameter limits
+        are the same as those used in fit().
+
+        Returns self.scanFitResults with the same layout as fit(), the
+        TF1 objects in self.scanFuncs and self.fitValid are updated
+        following the same conventions.
+        """
+
+        from gempython.gemplotting.fitting.batchFit import estimateScurveParams, fitScurvesBatch
+
+        r.gROOT.SetBatch(True)
+        r.gStyle.SetOptStat(0)
+
+        # Stack all the channels that should be fit
+        listFitChan = []
+        listX = []
+        listNev = []
+        listLow = []
+        listHigh = []
+        for vfat in range(0,24):
+            nBins, xMin, xMax = self.chargeBinning[vfat]
+            binCenters = xMin + (np.arange(1,nBins+1) - 0.5) * ((xMax - xMin) / nBins)
             for ch in range(0,128):
-                if debug:
-                    print 'fitting vfat %i chan %i'%(vfat,ch)
-                
                 if self.isDead[vfat][ch]:
-                    fitTF1.SetLineColor(r.kGray)
+                    self.funcColor[vfat,ch] = r.kGray
+                    self.scanFuncs.refresh(vfat, ch)
                     continue # Don't try to fit dead channels
-                elif not (self.scanHistos[vfat][ch].Integral() > 0):
-                    fitTF1.SetLineColor(r.kGray)
+                elif not (np.sum(self.scanHits[vfat,ch,1:-1]) > 0):
+                    self.funcColor[vfat,ch] = r.kGray
+                    self.scanFuncs.refresh(vfat, ch)
                     continue # Don't try to fit with 0 entries
-                
-                fitChi2 = 0
-                MinChi2Temp = 99999999
-                stepN = 0
-                
-                if debug:
-                    print "| stepN | vfatN | vfatCH | isVFAT3 | p0_low | p0 | p0_high | p1_low | p1 | p1_high | p2_low | p2 | p2_high |"
-                    print "| ----- | ----- | ------ | ------- | ------ | -- | ------- | ------ | -- | ------- | ------ | -- | ------- |"
-                while(stepN < 30):
-                    #rand = max(0.0, random.Gaus(10, 5)) # do not accept negative numbers
-                    rand = abs(random.Gaus(10, 5)) # take positive definite numbers
-
-                    # Make sure the input parameters are positive
-                    if rand > 100: continue
-                    if (self.calDAC2Q_m[vfat]*(8+stepN*8)+self.calDAC2Q_b[vfat]) < 0:
-                        stepN +=1
-                        continue
-                    #if (self.calDAC2Q_m[vfat]*(rand)+self.calDAC2Q_b[vfat]) < 0: continue
-
-                    # Provide an initial guess
-                    init_guess_p0 = self.calDAC2Q_m[vfat]*(8+stepN*8)+self.calDAC2Q_b[vfat]
-                    init_guess_p1 = abs(self.calDAC2Q_m[vfat]*rand)  #self.calDAC2Q_m[vfat] might be negative (e.g. VFAT3 case)
-                    init_guess_p2 = 0.
-                    init_guess_p3 = self.Nev[vfat][ch]/2.
-
-                    fitTF1.SetParameter(0, init_guess_p0)
-                    fitTF1.SetParameter(1, init_guess_p1)
-                    fitTF1.SetParameter(2, init_guess_p2)
-                    fitTF1.SetParameter(3, init_guess_p3)
-
-                    # Set Parameter Limits
-                    if self.isVFAT3:
-                        fitTF1.SetParLimits(0, self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*(1)+self.calDAC2Q_b[vfat])
-                        fitTF1.SetParLimits(1, self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat])
-                        fitTF1.SetParLimits(2, -0.01, self.Nev[vfat][ch])
-                    else:
-                        fitTF1.SetParLimits(0, -0.01, self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat])
-                        fitTF1.SetParLimits(1, 0.0,  self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat])
-                        fitTF1.SetParLimits(2, -0.01, self.Nev[vfat][ch])
-                        pass
-
-                    fitTF1.SetParLimits(3, 0.75*init_guess_p3, 1.25*init_guess_p3)
-                    
-                    if debug:
-                        if self.isVFAT3:
-                            print "| %i | %i | %i | %i | %f | %f | %f | %f | %f | %f | %f | %f | %f |"%(
-                                        stepN,
-                                        vfat,
-                                        ch,
-                                        self.isVFAT3,
-                                        self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat],
-                                        init_guess_p0,
-                                        self.calDAC2Q_m[vfat]*(1)+self.calDAC2Q_b[vfat],
-                                        self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat],
-                                        init_guess_p1,
-                                        self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat],
-                                        -0.01,
-                                        init_guess_p2,
-                                        self.Nev[vfat][ch]
-                                    )
-                        else:
-                            print "| %i | %i | %i | %i | %f | %f | %f | %f | %f | %f | %f | %f | %f |"%(
-                                        stepN,
-                                        vfat,
-                                        ch,
-                                        self.isVFAT3,
-                                        -0.01,
-                                        init_guess_p0,
-                                        self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat],
-                                        0.0,
-                                        init_guess_p1,
-                                        self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat],
-                                        -0.01,
-                                        init_guess_p2,
-                                        self.Nev[vfat][ch]
-                                    )
-
-                    # Fit
-                    fitResult = self.scanHistos[vfat][ch].Fit('myERF','SQ')
-                    fitEmpty = fitResult.IsEmpty()
-                    if fitEmpty:
-                        fitTF1.SetLineColor(kOrange-2)
-                        # Don't try to fit empty data again
-                        break
-                    fitValid = fitResult.IsValid()
-                    if not fitValid:
-                        continue
-                    fitChi2 = fitTF1.GetChisquare()
-                    fitNDF = fitTF1.GetNDF()
-                    stepN +=1
-                    if (fitChi2 < MinChi2Temp and fitChi2 > 0.0):
-                        self.scanFuncs[vfat][ch] = fitTF1.Clone('scurveFit_vfat%i_chan%i_h'%(vfat,ch))
-                        self.scanFuncs[vfat][ch].SetLineColor(r.kBlue-2)
-                        self.scanFitResults[0][vfat][ch] = fitTF1.GetParameter(0)
-                        self.scanFitResults[1][vfat][ch] = fitTF1.GetParameter(1)
-                        self.scanFitResults[2][vfat][ch] = fitTF1.GetParameter(2)
-                        self.scanFitResults[3][vfat][ch] = fitChi2
-                        self.scanFitResults[4][vfat][ch] = self.scanCount[vfat][ch]
-                        self.scanFitResults[5][vfat][ch] = fitNDF
-                        self.fitValid[vfat][ch] = True
-                        MinChi2Temp = fitChi2
-                        pass
-                    if (MinChi2Temp < 50): break
-                    pass
-                if debug:
-                    print("Converged fit results:")
-                    print "| stepN | vfatN | vfatCH | isVFAT3 | p0 | p1 | p2 | Chi2 | NDF | NormChi2"
-                    print "| ----- | ----- | ------ | ------- | -- | -- | -- | Chi2 | NDF | NormChi2"
-                    print "| %i | %i | %i | %i | %f | %f | %f | %f | %i | %f |"%(
-                            stepN,
-                            vfat,
-                            ch,
-                            self.isVFAT3,
-                            self.scanFitResults[0][vfat][ch],
-                            self.scanFitResults[1][vfat][ch],
-                            self.scanFitResults[2][vfat][ch],
-                            self.scanFitResults[3][vfat][ch],
-                            self.scanFitResults[5][vfat][ch],
-                            self.scanFitResults[3][vfat][ch] / self.scanFitResults[5][vfat][ch])
+
+                nev = self.Nev[vfat][ch]
+                listFitChan.append((vfat,ch))
+                listX.append(binCenters)
+                listNev.append(nev)
+
+                # Same limits as in fit()
+                if self.isVFAT3:
+                    listLow.append([self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat], -0.01, 0.75*nev/2.])
+                    listHigh.append([self.calDAC2Q_m[vfat]*(1)+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat], nev, 1.25*nev/2.])
+                else:
+                    listLow.append([-0.01, 0.0, -0.01, 0.75*nev/2.])
+                    listHigh.append([self.calDAC2Q_m[vfat]*(256)+self.calDAC2Q_b[vfat], self.calDAC2Q_m[vfat]*(128)+self.calDAC2Q_b[vfat], nev, 1.25*nev/2.])
                     pass
                 pass
             pass
+
+        if len(listFitChan) == 0:
+            return self.scanFitResults
+
+        fitVFATs, fitChans = np.array(listFitChan).T
+        arrayX = np.array(listX)
+        arrayY = self.scanHits[fitVFATs,fitChans,1:-1]
+        arrayYErr = self.scanHitErrors[fitVFATs,fitChans,1:-1]
+        arrayLow = np.array(listLow)
+        arrayHigh = np.array(listHigh)
+
+        # The width must stay strictly positive
+        binWidth = np.abs(arrayX[:,1] - arrayX[:,0])
+        arrayLow[:,1] = np.maximum(arrayLow[:,1], 1e-3 * binWidth)
+
+        print 'fitting %i channels simultaneously'%(len(listFitChan))
+        init = estimateScurveParams(arrayX, arrayY, np.array(listNev, dtype=float))
+        params, chi2, ndf, valid = fitScurvesBatch(arrayX, arrayY, arrayYErr, init, arrayLow, arrayHigh, maxIter=maxIter)
+
+        for idx,(vfat,ch) in enumerate(listFitChan):
+            if debug:
+                print "| %i | %i | %i | %f | %f | %f | %f | %f | %i |"%(
+                        vfat, ch, valid[idx], params[idx][0], params[idx][1], params[idx][2], params[idx][3], chi2[idx], ndf[idx])
+            if not valid[idx]:
+                continue
+
+            self._storeFitResult(vfat, ch, params[idx], chi2[idx], ndf[idx])
+            pass
+
         return self.scanFitResults
-    
+
     def getFunc(self, vfat, ch):
         return self.scanFuncs[vfat][ch]
 
+    def getFitResults(self):
+        """
+        Returns a dict of the numpy arrays holding the results of fit() or
+        fitBatch(), see setFitResults()
+        """
+
+        return {
+                "fitParams":self.fitParams,
+                "fitChi2":self.fitChi2,
+                "fitNDF":self.fitNDF,
+                "fitValid":self.fitValid,
+                "funcColor":self.funcColor,
+                "fitIterations":self.fitIterations,
+                "fitFirstTry":self.fitFirstTry
+                }
+
+    def getInputArrays(self):
+        """
+        Returns a dict of the numpy arrays which fully define the input of
+        fit() and fitBatch(): the scurves, the number of pulses, the dead
+        channels and the charge calibration
+        """
+
+        return {
+                "scanHits":self.scanHits,
+                "scanHitErrors":self.scanHitErrors,
+                "Nev":np.array([ [ self.Nev[vfat][ch] if ch in self.Nev[vfat].keys() else 0 for ch in range(0,128) ] for vfat in range(0,24) ], dtype=float),
+                "isDead":np.array(self.isDead),
+                "calDAC2Q_m":np.asarray(self.calDAC2Q_m, dtype=float),
+                "calDAC2Q_b":np.asarray(self.calDAC2Q_b, dtype=float),
+                "isVFAT3":np.array(self.isVFAT3)
+                }
+
+    def getFitStatistics(self):
+        """
+        Summarizes the number of fits performed by fit(), returns a dict with:
+
+            "nChannels"   - number of channels for which a fit was attempted
+            "nConverged"  - number of channels with a converged fit
+            "nFirstTry"   - number of channels which converged on the first fit
+            "nFits"       - total number of fits performed
+            "maxFits"     - largest number of fits performed for one channel
+        """
+
+        return {
+                "nChannels":int(np.sum(self.fitIterations > 0)),
+                "nConverged":int(np.sum(self.fitValid)),
+                "nFirstTry":int(np.sum(self.fitFirstTry)),
+                "nFits":int(np.sum(self.fitIterations)),
+                "maxFits":int(np.max(self.fitIterations))
+                }
+
+    def setFitResults(self, fitResults):
+        """
+        Restores the results of a previous fit, e.g. loaded from a
+        FitResultCache, and updates self.scanFitResults and self.scanFuncs
+
+        fitResults - dict of arrays with the keys of getFitResults()
+        """
+
+        self.fitIterations[...] = fitResults["fitIterations"]
+        self.fitFirstTry[...] = fitResults["fitFirstTry"]
+        self.funcColor[...] = fitResults["funcColor"]
+        for vfat in range(0,24):
+            for ch in range(0,128):
+                if fitResults["fitValid"][vfat,ch]:
+                    self._storeFitResult(vfat, ch, fitResults["fitParams"][vfat,ch], fitResults["fitChi2"][vfat,ch], fitResults["fitNDF"][vfat,ch])
+                else:
+                    self.scanFuncs.refresh(vfat, ch)
+                pass
+            pass
+
+        return
+
     def readFile(self, treeFileName):
-        inF = r.TFile(treeFileName)
-        for event in inF.scurveTree :
-            self.feed(event)
+        """
+        Reads the scurveTree of treeFileName in one call and passes it
+        to feedArray()
+        """
+
+        import root_numpy as rp
+
+        listOfBranches = ['vfatN','vfatCH','vcal','Nhits','Nev']
+        if self.isVFAT3:
+            listOfBranches += ['isCurrentPulse','calSF']
+        scurveData = rp.root2array(treeFileName, treename='scurveTree', branches=listOfBranches)
+
+        if self.isVFAT3:
+            self.feedArray(scurveData['vfatN'], scurveData['vfatCH'], scurveData['vcal'], scurveData['Nhits'], scurveData['Nev'],
+                    scurveData['isCurrentPulse'], scurveData['calSF'])
+        else:
+            self.feedArray(scurveData['vfatN'], scurveData['vfatCH'], scurveData['vcal'], scurveData['Nhits'], scurveData['Nev'])
         return
 
+def getScurveFitRange(calDAC2Q_m=1., calDAC2Q_b=0., isVFAT3=False):
+    """
+    Returns the (xMin, xMax) range of the TF1 used for fitting scurves
+
+    calDAC2Q_m - slope of "fC = m * cal_dac + b" for this vfat
+    calDAC2Q_b - intercept of "fC = m * cal_dac + b" for this vfat
+    isVFAT3    - if using VFAT3
+    """
+
+    if isVFAT3:
+        return (calDAC2Q_m*253+calDAC2Q_b, calDAC2Q_m*1+calDAC2Q_b)
+    else:
+        return (calDAC2Q_m*1+calDAC2Q_b, calDAC2Q_m*253+calDAC2Q_b)
+
+def makeScurveFitFunc(name, calDAC2Q_m=1., calDAC2Q_b=0., isVFAT3=False):
+    """
+    Returns the TF1 used for fitting scurves, the range is set from the
+    CAL_DAC to charge conversion of the VFAT
+
+    name       - TName of the TF1
+    calDAC2Q_m - slope of "fC = m * cal_dac + b" for this vfat
+    calDAC2Q_b - intercept of "fC = m * cal_dac + b" for this vfat
+    isVFAT3    - if using VFAT3
+    """
+
+    xMin, xMax = getScurveFitRange(calDAC2Q_m, calDAC2Q_b, isVFAT3)
+    return r.TF1(name,'[3]*TMath::Erf((TMath::Max([2],x)-[0])/(TMath::Sqrt(2)*[1]))+[3]', xMin, xMax)
+
+def rebuildScurveObjects(vfat, ch, hits, xMin, xMax, params, fitXMin, fitXMax, chi2=0., ndf=0):
+    """
+    Rebuilds the scurve TH1D and its fit TF1 from the compact scurve_hits
+    and fit_params branches of the scurveFitTree, see anaUltraScurve.py.
+
+    vfat     - vfat position, only used for the TNames
+    ch       - vfat channel, only used for the TNames
+    hits     - array of hits in each bin, without under/overflow
+    xMin     - low edge of the first bin
+    xMax     - high edge of the last bin
+    params   - array of the 4 fit parameters
+    fitXMin  - lower end of the fit range
+    fitXMax  - upper end of the fit range
+    chi2     - chi2 of the fit
+    ndf      - number of degrees of freedom of the fit
+
+    Returns a tuple of (TH1D, TF1), the histogram is not attached to any
+    TDirectory and its bin errors are sqrt(hits) as for the fitter.
+    """
+
+    import root_numpy as rp
+
+    hits = np.asarray(hits, dtype=float)
+    histo = r.TH1D('scurve_vfat%i_chan%i_h'%(vfat,ch),'scurve_vfat%i_chan%i_h'%(vfat,ch), len(hits), xMin, xMax)
+    histo.SetDirectory(0)
+    rp.array2hist(hits, histo, errors=np.sqrt(hits))
+
+    func = makeScurveFitFunc('scurveFit_vfat%i_chan%i'%(vfat,ch))
+    func.SetRange(fitXMin, fitXMax)
+    for ipar in range(0,4):
+        func.SetParameter(ipar, params[ipar])
+    func.SetChisquare(chi2)
+    func.SetNDF(int(ndf))
+
+    return (histo, func)
+
+def fitScurve(histo, fitTF1, nev, vfat, ch, calDAC2Q_m=1., calDAC2Q_b=0., isVFAT3=False, debug=False, maxRetries=4):
+    """
+    Fits a single scurve with fitTF1, which must be registered under the
+    name 'myERF'.  The first fit starts from parameters estimated from the
+    histogram contents (50% crossing, 16-84% width and plateau, see
+    batchFit.estimateScurveParams).  If that fit does not converge, or
+    has chi2 >= 50, up to maxRetries further fits are attempted starting
+    from random perturbations of that estimate.  The perturbations use a
+    TRandom3 seeded from (vfat, ch) so the result is reproducible.
+
+    histo      - TH1 holding the scurve
+    fitTF1     - TF1 returned by makeScurveFitFunc('myERF',...)
+    nev        - number of pulses injected for this channel
+    vfat       - vfat position, only used for seeding and printing
+    ch         - vfat channel, only used for seeding and printing
+    calDAC2Q_m - slope of "fC = m * cal_dac + b" for this vfat
+    calDAC2Q_b - intercept of "fC = m * cal_dac + b" for this vfat
+    isVFAT3    - if using VFAT3
+    debug      - print the initial guess and result of each fit
+    maxRetries - maximum number of fits attempted after the first one
+
+    Returns a tuple:
+
+        [0] -> tuple of the four best fit parameters, None if no fit converged
+        [1] -> fitChi2 of the best fit
+        [2] -> fitNDF of the best fit
+        [3] -> number of fits performed
+    """
+
+    from gempython.gemplotting.fitting.batchFit import estimateScurveParams
+
+    # Set Parameter Limits
+    if isVFAT3:
+        parLimits = [
+                (calDAC2Q_m*(256)+calDAC2Q_b, calDAC2Q_m*(1)+calDAC2Q_b),
+                (calDAC2Q_m*(256)+calDAC2Q_b, calDAC2Q_m*(128)+calDAC2Q_b),
+                (-0.01, nev) ]
+    else:
+        parLimits = [
+                (-0.01, calDAC2Q_m*(256)+calDAC2Q_b),
+                (0.0,  calDAC2Q_m*(128)+calDAC2Q_b),
+                (-0.01, nev) ]
+        pass
+    parLimits.append((0.75*nev/2., 1.25*nev/2.))
+
+    # Estimate the initial guess from the data
+    nBins = histo.GetNbinsX()
+    binCenters = np.array([ histo.GetBinCenter(binX) for binX in range(1,nBins+1) ])
+    binContents = np.array([ histo.GetBinContent(binX) for binX in range(1,nBins+1) ])
+    seed = estimateScurveParams(binCenters, binContents[np.newaxis,:], [nev])[0]
+    for ipar in range(0,4):
+        seed[ipar] = min(max(seed[ipar], min(parLimits[ipar])), max(parLimits[ipar]))
+
+    random = r.TRandom3(1 + 128*vfat + ch)
+
+    bestResult = None
+    MinChi2Temp = 99999999
+    nFits = 0
+    
+    if debug:
+        print "| stepN | vfatN | vfatCH | isVFAT3 | p0_low | p0 | p0_high | p1_low | p1 | p1_high | p2_low | p2 | p2_high |"
+        print "| ----- | ----- | ------ | ------- | ------ | -- | ------- | ------ | -- | ------- | ------ | -- | ------- |"
+    for stepN in range(0,maxRetries+1):
+        # Provide an initial guess
+        init_guess = list(seed)
+        if stepN > 0:
+            init_guess[0] = seed[0] + random.Gaus(0, 2*seed[1])
+            init_guess[1] = seed[1] * max(0.1, random.Gaus(1, 0.5))
+            for ipar in range(0,2):
+                init_guess[ipar] = min(max(init_guess[ipar], min(parLimits[ipar])), max(parLimits[ipar]))
+            pass
+
+        for ipar in range(0,4):
+            fitTF1.SetParameter(ipar, init_guess[ipar])
+            fitTF1.SetParLimits(ipar, parLimits[ipar][0], parLimits[ipar][1])
+        
+        if debug:
+            print "| %i | %i | %i | %i | %f | %f | %f | %f | %f | %f | %f | %f | %f |"%(
+                        stepN,
+                        vfat,
+                        ch,
+                        isVFAT3,
+                        parLimits[0][0],
+                        init_guess[0],
+                        parLimits[0][1],
+                        parLimits[1][0],
+                        init_guess[1],
+                        parLimits[1][1],
+                        parLimits[2][0],
+                        init_guess[2],
+                        parLimits[2][1]
+                    )
+
+        # Fit
+        fitResult = histo.Fit('myERF','SQ')
+        nFits += 1
+        fitEmpty = fitResult.IsEmpty()
+        if fitEmpty:
+            fitTF1.SetLineColor(r.kOrange-2)
+            # Don't try to fit empty data again
+            break
+        fitValid = fitResult.IsValid()
+        if not fitValid:
+            continue
+        fitChi2 = fitTF1.GetChisquare()
+        fitNDF = fitTF1.GetNDF()
+        if (fitChi2 < MinChi2Temp and fitChi2 > 0.0):
+            bestResult = (
+                    tuple(fitTF1.GetParameter(ipar) for ipar in range(0,4)),
+                    fitChi2,
+                    fitNDF)
+            MinChi2Temp = fitChi2
+            pass
+        if (MinChi2Temp < 50): break
+        pass
+    if debug and bestResult is not None:
+        print("Converged fit results:")
+        print "| nFits | vfatN | vfatCH | isVFAT3 | p0 | p1 | p2 | Chi2 | NDF | NormChi2"
+        print "| ----- | ----- | ------ | ------- | -- | -- | -- | Chi2 | NDF | NormChi2"
+        print "| %i | %i | %i | %i | %f | %f | %f | %f | %i | %f |"%(
+                nFits,
+                vfat,
+                ch,
+                isVFAT3,
+                bestResult[0][0],
+                bestResult[0][1],
+                bestResult[0][2],
+                bestResult[1],
+                bestResult[2],
+                bestResult[1] / bestResult[2])
+        pass
+
+    if bestResult is None:
+        return (None, 0., 0, nFits)
+    return bestResult + (nFits,)
+
+def _fitVFATWorker(vfatInput):
+    """
+    Fits all the scurves of one VFAT, used by ScanDataFitter.fit().  The
+    histograms are built from the bin contents in vfatInput so that only
+    numbers are exchanged with the parent process when running in a
+    multiprocessing Pool.
+
+    Returns a tuple of (vfat, dict_chanResults) where dict_chanResults
+    is keyed by channel and holds the return value of fitScurve()
+    """
+
+    import root_numpy as rp
+
+    r.gROOT.SetBatch(True)
+
+    vfat = vfatInput["vfat"]
+    nBins, xMin, xMax = vfatInput["binning"]
+    fitTF1 = makeScurveFitFunc('myERF', vfatInput["calDAC2Q_m"], vfatInput["calDAC2Q_b"], vfatInput["isVFAT3"])
+    fitTF1.SetLineColor(r.kBlack)
+    histo = r.TH1D('scurve_vfat%i_fit_h'%(vfat),'',nBins,xMin,xMax)
+    histo.SetDirectory(0)
+
+    if not vfatInput["debug"]:
+        print 'fitting vfat %i'%(vfat)
+
+    dict_chanResults = {}
+    for ch in range(0,128):
+        if vfatInput["debug"]:
+            print 'fitting vfat %i chan %i'%(vfat,ch)
+
+        if vfatInput["isDead"][ch]:
+            continue # Don't try to fit dead channels
+        elif not (np.sum(vfatInput["contents"][ch][1:-1]) > 0):
+            continue # Don't try to fit with 0 entries
+
+        rp.array2hist(vfatInput["contents"][ch], histo, errors=vfatInput["errors"][ch])
+        dict_chanResults[ch] = fitScurve(histo, fitTF1, vfatInput["Nev"][ch], vfat, ch,
+                vfatInput["calDAC2Q_m"], vfatInput["calDAC2Q_b"], vfatInput["isVFAT3"], vfatInput["debug"],
+                vfatInput["maxRetries"])
+        pass
+
+    return (vfat, dict_chanResults)
+
 def fitScanData(treeFileName, isVFAT3=False, calFileName=None):
     from gempython.gemplotting.utils.anautilities import parseCalFile
     
@@ -5,11 +5,26 @@ clusterAnaScurve
 ================
 """
 
+def printTimeSeriesCommands(outputScanDatesName):
+    """
+    Prints the gemPlotter.py commands making time series of the analysis
+    results of the scandates in outputScanDatesName
+    """
+
+    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=threshold --make2D --alphaLabels -c -a --axisMax=10"%outputScanDatesName)
+    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=noise --make2D --alphaLabels -c -a --axisMin=0.05 --axisMax=0.3"%outputScanDatesName)
+    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=ped_eff --make2D --alphaLabels -c -a --axisMax=1"%outputScanDatesName)
+    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=mask --make2D --alphaLabels -c -a --axisMax=1"%outputScanDatesName)
+    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=maskReason --make2D --alphaLabels -c -a --axisMax=32"%outputScanDatesName)
+
+    return
+
 if __name__ == '__main__':
     """
     Takes a list of scandates file, see parseListOfScanDatesFile(...) documentation,
     and launches a job for each (chamberName, scandate) pair.  Each job will 
-    launch anaUltraScurve.py
+    launch anaUltraScurve.py.  Jobs are submitted to LSF or run on the local
+    machine, see jobexecutors
     """
     
     from optparse import OptionParser, OptionGroup
@@ -25,16 +40,28 @@ if __name__ == '__main__':
                       help="Make plots vs channels instead of strips", metavar="channels")
     parser.add_option("-d", "--debug", action="store_true", dest="debug",
                       help="print extra debugging information", metavar="debug")
+    parser.add_option("--executor", type="string", dest="executor", default="lsf",
+                      help="Where the jobs are run, from list {'lsf','local'}", metavar="executor")
     parser.add_option("--extChanMapping", type="string", dest="extChanMapping", default=None,
                       help="Physical filename of a custom, non-default, channel mapping (optional)", metavar="extChanMapping")
     parser.add_option("-f", "--fit", action="store_true", dest="performFit",
                       help="Fit scurves and save fit information to output TFile", metavar="performFit")
+    parser.add_option("--force", action="store_true", dest="force",
+                      help="Submit jobs even for scandates whose analysis outputs are up to date", metavar="force")
     parser.add_option("-i", "--infilename", type="string", dest="filename", default=None,
                       help="Tab delimited file specifying chamber name and scandates to analyze", metavar="filename")
+    parser.add_option("--nWorkers", type="int", dest="nWorkers", default=None,
+                      help="Number of jobs run at the same time by the local executor, default is the number of CPUs", metavar="nWorkers")
+    parser.add_option("--journal", type="string", dest="journal", default=None,
+                      help="Journal file recording the state of each job, default is the input file with the suffix _journal.jsonl", metavar="journal")
     parser.add_option("-p","--panasonic", action="store_true", dest="PanPin",
                       help="Make plots vs Panasonic pins instead of strips", metavar="PanPin")
     parser.add_option("-q","--queue", type="string", dest="queue", default="1nh",
                         help="queue to submit your jobs to", metavar="queue")
+    parser.add_option("--resume", action="store_true", dest="resume",
+                      help="Only submit the jobs which did not succeed according to the journal, jobs still pending or running on LSF are not submitted again", metavar="resume")
+    parser.add_option("--retryFailed", action="store_true", dest="retryFailed",
+                      help="Only submit the jobs which failed according to the journal", metavar="retryFailed")
     parser.add_option("-t", "--type", type="string", dest="GEBtype", default="long",
                       help="Specify GEB (long/short)", metavar="GEBtype")
     parser.add_option("--zscore", type="float", dest="zscore", default=3.5,
@@ -72,11 +99,24 @@ if __name__ == '__main__':
     (options, args) = parser.parse_args()
     listOfScanDatesFile = options.filename
 
+    # Check if the executor is supported
+    import os
+    from gempython.gemplotting.utils.jobexecutors import executorNames, getExecutor
+    if options.executor not in executorNames:
+        print("executor '%s' not understood"%options.executor)
+        print("list of supported executors is:", executorNames)
+        exit(os.EX_USAGE)
+        pass
+
+    if options.nWorkers is not None and options.nWorkers < 1:
+        print("Number of workers must be at least 1, not %i"%options.nWorkers)
+        exit(os.EX_USAGE)
+        pass
+
     # Check if the queue is supported
     # See: https://cern.service-now.com/service-portal/article.do?n=KB0000470
-    import os
     from gempython.gemplotting.utils.anaInfo import queueNames, tree_names
-    if options.queue not in queueNames:
+    if options.executor == "lsf" and options.queue not in queueNames:
         print("queue '%s' not understood"%options.queue)
         print("list of supported queues is:", queueNames)
         exit(os.EX_USAGE)
@@ -94,7 +134,8 @@ if __name__ == '__main__':
     from gempython.utils.wrappers import envCheck, runCommand
     envCheck('DATA_PATH')
     envCheck('ELOG_PATH')
-    envCheck('VIRTUAL_ENV')
+    if options.executor == "lsf":
+        envCheck('VIRTUAL_ENV')
 
     # Get info from input file
     from gempython.gemplotting.utils.anautilities import getDirByAnaType, filePathExists, makeListOfScanDatesFile, parseListOfScanDatesFile
@@ -105,11 +146,18 @@ if __name__ == '__main__':
     parsedTuple = parseListOfScanDatesFile(listOfScanDatesFile, alphaLabels=True)
     listChamberAndScanDate = parsedTuple[0]
 
-    # Setup output scandates list
+    # Setup output scandates list, written once the jobs are submitted
     outputScanDatesName = listOfScanDatesFile.strip('.txt')
     outputScanDatesName += "_Input4GemPlotter.txt"
-    outputScanDatesFile = open(outputScanDatesName, 'w+')
-    outputScanDatesFile.write('ChamberName\tscandate\n')
+    listOfOutputScanDates = []
+
+    # Journal of the jobs
+    from gempython.gemplotting.utils.jobjournal import getJobScriptLines, JobJournal, JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING
+    journalFileName = options.journal
+    if journalFileName is None:
+        journalFileName = "%s_journal.jsonl"%(listOfScanDatesFile.strip('.txt'))
+        pass
+    journal = JobJournal(os.path.abspath(journalFileName))
 
     # invert chamber_config
     from gempython.gemplotting.mapping.chamberInfo import chamber_config, GEBtype
@@ -119,7 +167,9 @@ if __name__ == '__main__':
     # linkByChamber = { value:key for key,value in chamber_config.iteritems() }
     
     # Make and launch a job for each file
-    import time
+    executor = getExecutor(options.executor, queue=options.queue, nWorkers=options.nWorkers)
+    from gempython.gemplotting.utils.anamanifest import isUpToDate, makeManifest, writeManifest, MANIFEST_NAME
+    nSkipped = 0
     for idx,chamberAndScanDatePair in enumerate(listChamberAndScanDate):
         # Setup the path
         dirPath = getDirByAnaType(options.anaType, chamberAndScanDatePair[0], options.ztrim)
@@ -127,13 +177,69 @@ if __name__ == '__main__':
 
         # Check if file exists, if it does not write to output as commented line but skip to next input
         if not filePathExists(dirPath, tree_names[options.anaType][0]):
-            outputScanDatesFile.write('#%s\t%s\n'%(chamberAndScanDatePair[0],chamberAndScanDatePair[1]))
+            listOfOutputScanDates.append((chamberAndScanDatePair, None))
+            continue
+        jobKey = "%s/%s"%(chamberAndScanDatePair[0],chamberAndScanDatePair[1])
+        listOfOutputScanDates.append((chamberAndScanDatePair, jobKey))
+
+        # Check the journal if only part of the jobs should be submitted
+        jobState = journal.getState(jobKey)
+        if options.retryFailed and jobState != JOB_FAILED:
+            continue
+        if options.resume and (jobState == JOB_DONE or (options.executor == "lsf" and jobState in [JOB_PENDING, JOB_RUNNING])):
             continue
-        outputScanDatesFile.write('%s\t%s\n'%(chamberAndScanDatePair[0],chamberAndScanDatePair[1]))
 
         # Input file
         jobInputFile = "%s/%s"%(dirPath, tree_names[options.anaType][0])
         
+        thisGEB = options.GEBtype
+        if chamberAndScanDatePair[0] in linkByChamber.keys():
+            thisGEB = GEBtype[linkByChamber[chamberAndScanDatePair[0]]]
+            pass
+
+        # make the analysis arguments
+        anaArgs = [
+                '-i', jobInputFile,
+                '-t', thisGEB,
+                '--zscore=%f'%(options.zscore),
+                '--ztrim=%f'%(options.ztrim),
+                '--maxEffPedPercent=%f'%(options.maxEffPedPercent),
+                '--highNoiseCut=%f'%(options.highNoiseCut),
+                '--deadChanCutLow=%f'%(options.deadChanCutLow),
+                '--deadChanCutHigh=%f'%(options.deadChanCutHigh) ]
+        inputFiles = [ jobInputFile ]
+        if options.calFile is not None:
+            anaArgs.append('--calFile=%s'%(options.calFile))
+            inputFiles.append(options.calFile)
+            pass
+        if options.channels:
+            anaArgs.append('--channels')
+            pass
+        if options.extChanMapping is not None:
+            anaArgs.append('--extChanMapping=%s'%(options.extChanMapping))
+            inputFiles.append(options.extChanMapping)
+            pass
+        if options.performFit:
+            anaArgs.append('--fit')
+            pass
+        if options.PanPin:
+            anaArgs.append('--panasonic')
+            pass
+
+        # Skip scandates whose analysis is up to date
+        outputDir = jobInputFile[:-5]
+        outputFiles = [ "%s/SCurveFitData.root"%(outputDir) ]
+        upToDate, reason = isUpToDate(outputDir, "anaUltraScurve.py", anaArgs, inputFiles, outputFiles)
+        if upToDate and not options.force:
+            if options.debug:
+                print("Skipping %s %s, outputs in %s are up to date"%(chamberAndScanDatePair[0], chamberAndScanDatePair[1], outputDir))
+                pass
+            nSkipped += 1
+            if jobState != JOB_DONE and not options.debug:
+                journal.record(jobKey, JOB_DONE, duration=0, upToDate=True)
+                pass
+            continue
+
         # stdout
         jobStdOut = "%s/stdout"%dirPath
         runCommand( ["mkdir","-p", jobStdOut ] )
@@ -154,70 +260,79 @@ if __name__ == '__main__':
         jobScript.write("""#! /usr/bin/env bash
 
 # LSF screws up the environment by prepending things to the PATH. Restore it.
-source $VIRTUAL_ENV/bin/activate
+if [ -n "$VIRTUAL_ENV" ]; then
+    source $VIRTUAL_ENV/bin/activate
+fi
 
 python --version
 gcc --version | grep gcc
 """)
 
-        thisGEB = options.GEBtype
-        if chamberAndScanDatePair[0] in linkByChamber.keys():
-            thisGEB = GEBtype[linkByChamber[chamberAndScanDatePair[0]]]
-            pass
+        # The manifest is prepared now and put in place by the job once the analysis succeeded
+        pendingManifestName = "%s.pending"%(MANIFEST_NAME)
+        writeManifest(outputDir, makeManifest("anaUltraScurve.py", anaArgs, inputFiles, outputFiles), pendingManifestName)
 
-        # make the python command
-        pythonCmd = 'anaUltraScurve.py -i %s -t %s --zscore=%f --ztrim=%f --maxEffPedPercent=%f --highNoiseCut=%f --deadChanCutLow=%f --deadChanCutHigh=%f'%(
-                jobInputFile,
-                thisGEB,
-                options.zscore,
-                options.ztrim,
-                options.maxEffPedPercent,
-                options.highNoiseCut,
-                options.deadChanCutLow,
-                options.deadChanCutHigh)
-        if options.calFile is not None:
-            pythonCmd += ' --calFile=%s'%(options.calFile)
-            pass
-        if options.channels:
-            pythonCmd += ' --channels'
-            pass
-        if options.extChanMapping is not None:
-            pythonCmd += ' --extChanMapping=%s'%(options.extChanMapping)
-            pass
-        if options.performFit:
-            pythonCmd += ' --fit'
-            pass
-        if options.PanPin:
-            pythonCmd += ' --panasonic'
-            pass
-        pythonCmd += '\n'
+        # make the python command, the job records its state in the journal
+        journalStart, journalEnd = getJobScriptLines(journal.journalFileName, jobKey)
+        pythonCmd = 'anaUltraScurve.py %s'%(' '.join(anaArgs))
+        pythonCmd += ' && mv %s/%s %s/%s\n'%(outputDir, pendingManifestName, outputDir, MANIFEST_NAME)
         
+        jobScript.write(journalStart)
         jobScript.write(pythonCmd)
+        jobScript.write(journalEnd)
         jobScript.close()
         runCommand( ['chmod', '+x', jobScriptName] )
 
-        jobCmd = [
-                'bsub',
-                '-env',
-                'all',
-                '-q',
-                options.queue,
-                '-o',
-                "%s/jobOut.txt"%jobStdOut,
-                '-e',
-                "%s/jobErr.txt"%jobStdErr,
-                jobScriptName ]
-
         if options.debug:
-            print(idx, jobCmd)
+            print(idx, options.executor, jobScriptName)
             pass
         else:
-            runCommand(jobCmd)
-            time.sleep(1)
+            journal.record(jobKey, JOB_PENDING, executor=options.executor)
+            executor.submit(jobScriptName, "%s/jobOut.txt"%jobStdOut, "%s/jobErr.txt"%jobStdErr)
             pass
         pass # end loop over listChamberAndScanDate
 
     print("Job submission completed")
+    if nSkipped > 0:
+        print("%i scandates were skipped as their analysis is up to date, use --force to analyze them again"%(nSkipped))
+
+    listOfResults = executor.wait()
+
+    # Only list the scandates whose job succeeded, LSF jobs can not be
+    # waited for so those still pending or running are listed as well
+    journal.reload()
+    listOfListedStates = [ JOB_DONE ]
+    if options.executor == "lsf":
+        listOfListedStates += [ JOB_PENDING, JOB_RUNNING ]
+    outputScanDatesFile = open(outputScanDatesName, 'w+')
+    outputScanDatesFile.write('ChamberName\tscandate\n')
+    for chamberAndScanDatePair, jobKey in listOfOutputScanDates:
+        if jobKey is None or journal.getState(jobKey) not in listOfListedStates:
+            outputScanDatesFile.write('#')
+        outputScanDatesFile.write('%s\t%s\n'%(chamberAndScanDatePair[0],chamberAndScanDatePair[1]))
+        pass
+    outputScanDatesFile.close()
+    print("Journal of the jobs written to %s"%(journal.journalFileName))
+    print("Scandates to analyze further written to %s"%(outputScanDatesName))
+    print("")
+
+    if options.executor == "lsf":
+        print("Once the jobs are finished, call again with --resume to submit the failed jobs and update %s"%(outputScanDatesName))
+        print("")
+    else:
+        # Jobs have finished, report them
+        listOfFailedJobs = [ (jobScriptName, returncode) for jobScriptName, returncode in listOfResults if returncode != 0 ]
+        print("%i of %i jobs completed successfully"%(len(listOfResults) - len(listOfFailedJobs), len(listOfResults)))
+        for jobScriptName, returncode in listOfFailedJobs:
+            print("\tjob %s failed with code %i, see %s/stderr/jobErr.txt"%(jobScriptName, returncode, os.path.dirname(jobScriptName)))
+            pass
+        print("")
+        print("Finally for a time series output of the data call:")
+        print("")
+        printTimeSeriesCommands(outputScanDatesName)
+        exit(min(len(listOfFailedJobs), 255))
+        pass
+
     print("To check the status of your jobs execute:")
     print("")
     print("\tbjos")
@@ -235,8 +350,4 @@ gcc --version | grep gcc
     print("")
     print("Finally for a time series output of the data call:")
     print("")
-    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=threshold --make2D --alphaLabels -c -a --axisMax=10"%outputScanDatesName)
-    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=noise --make2D --alphaLabels -c -a --axisMin=0.05 --axisMax=0.3"%outputScanDatesName)
-    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=ped_eff --make2D --alphaLabels -c -a --axisMax=1"%outputScanDatesName)
-    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=mask --make2D --alphaLabels -c -a --axisMax=1"%outputScanDatesName)
-    print("\tgemPlotter.py --infilename=%s --anaType=scurveAna --branchName=maskReason --make2D --alphaLabels -c -a --axisMax=32"%outputScanDatesName)
+    printTimeSeriesCommands(outputScanDatesName)
@@ -40,7 +40,9 @@ the script.
 
     Name of ``TBranch`` where dependent variable is found, note that this
     ``TBranch`` should be found in the ``TTree`` that corresponds to the value
-    given to the :option:`--anaType` argument.
+    given to the :option:`--anaType` argument.  A comma separated list of
+    names may be given, e.g. ``threshold,noise``: each input file is then read
+    once and one output ``TFile`` (and summary plot) is made per name.
 
 .. option:: -i, --infilename <FILE NAME>
 
@@ -74,11 +76,15 @@ Optional arguments
 
 .. option:: --axisMax <NUMBER>
 
-    Maximum value for the axis depicting :option:`--branchName`.
+    Maximum value for the axis depicting :option:`--branchName`.  Either a
+    single value used for all names of :option:`--branchName` or a comma
+    separated list with one value per name.
 
 .. option:: --axisMin <NUMBER>
 
-    Minimum value for the axis depicting :option:`--branchName`.
+    Minimum value for the axis depicting :option:`--branchName`.  Either a
+    single value used for all names of :option:`--branchName` or a comma
+    separated list with one value per name.
 
 .. option:: -c, --channels
 
@@ -97,6 +103,12 @@ Optional arguments
     When providing this flag a 2D plot of ROB strip/vfat channel vs. independent
     variable will be plotted whose z-axis value is :option:`--branchName`.
 
+.. option:: --nLoaders <NUMBER>
+
+    Number of input files read at the same time, default 8.  Reading several
+    files concurrently hides the latency of a network mounted ``DATA_PATH``,
+    the data points keep the order of :option:`--infilename`.
+
 .. option:: -p, --print
 
     Prints a comma separated table of the plot's data to the terminal. The
@@ -248,137 +260,160 @@ Internals
 ---------
 """
 
-def arbitraryPlotter(anaType, listDataPtTuples, rootFileName, treeName, branchName, vfat, vfatCH=None, strip=None, ztrim=4, skipBad=False):
+def arbitraryPlotter(scanDateData, vfat, chan=None):
     """
     Provides a list of tuples for 1D data where each element is of the form:
     ``(indepVarVal, depVarVal, depVarValErr)``
 
     Args:
-        anaType (string): type of analysis to perform, helps build the file path
-            to the input file(s), from the keys of
-            :any:`utils.anaInfo.ana_config`
+        scanDateData: tuple returned by :any:`loadScanDateData`
 
-        listDataPtTuples: list of tuples where each element is of the form
-            ``(cName, scandate, indepVar)``, note ``indepVar`` is expected to be
-            numeric
-
-        rootFileName (string): name of the ``TFile`` that will be found in the
-            data path corresponding to ``anaType``
+        vfat (int): vfat number that plots should be made for
 
-        treeName (string): name of the ``TTree`` inside ``rootFileName``
+        chan (int): channel of the vfat that should be used, either a
+            ``vfatCH`` or a ``ROBstr`` depending on the ``chanBranchName``
+            given to :any:`loadScanDateData`; if ``None`` an average is
+            performed w/stdev for error bar
+    """
 
-        branchName (string): name of a branch inside ``treeName`` that the
-            dependent variable will be extracted from
+    import numpy as np
 
-        vfat (int): vfat number that plots should be made for
+    listIndepVarVals, arrayCount, arraySum, arraySumSq = scanDateData
+    if chan is None:
+        count = np.sum(arrayCount[:,vfat,:], axis=1)
+        sumVals = np.sum(arraySum[:,vfat,:], axis=1)
+        sumSqVals = np.sum(arraySumSq[:,vfat,:], axis=1)
+    else:
+        count = arrayCount[:,vfat,chan]
+        sumVals = arraySum[:,vfat,chan]
+        sumSqVals = arraySumSq[:,vfat,chan]
+        pass
 
-        vfatCH (int): channel of the vfat that should be used, if ``None`` an
-            average is performed w/stdev for error bar, mutually exclusive
-            w/ ``strip``
+    # Mean and stdev, NaN if there is no entry
+    with np.errstate(divide='ignore', invalid='ignore'):
+        depVarVal = sumVals / count
+        depVarValErr = np.sqrt(np.maximum(sumSqVals / count - depVarVal**2, 0.))
 
-        strip (int): strip of the detector that should be used, if ``None`` an
-            average is performed w/stdev for error bar, mutually exclusive w/
-            ``vfatCH``
+    return [ (indepVarVal, float(depVarVal[idx]), float(depVarValErr[idx])) for idx, indepVarVal in enumerate(listIndepVarVals) ]
 
-        skipBad (bool): if a file fails to open or the ``TTree`` cannot be
-            found, the input is skipped and the processing continues rather than
-            exiting
+def arbitraryPlotter2D(scanDateData, vfat):
     """
+    Provides a list of tuples for 2D data where each element is of the
+    ``(x,y,z)`` form: ``(indepVarVal, vfatCHOrROBstr, depVarVal)``
 
-    from gempython.gemplotting.utils.anautilities import filePathExists, getDirByAnaType
+    Args:
+        scanDateData: tuple returned by :any:`loadScanDateData`, with
+            ``chanBranchName`` either ``vfatCH`` or ``ROBstr``
+
+        vfat (int): vfat number that plots should be made for
+
+    Channels without entries in a scandate give no tuple.
+    """
 
     import numpy as np
-    import os
-    import root_numpy as rp
 
-    # Make branches to load
-    listNames = ["vfatN"]
-    if vfatCH is not None and strip is None:
-        listNames.append("vfatCH")
-    elif strip is not None and vfatCH is None:
-        listNames.append("ROBstr")
-    listNames.append(branchName)
+    listIndepVarVals, arrayCount, arraySum, arraySumSq = scanDateData
+    with np.errstate(divide='ignore', invalid='ignore'):
+        depVarVal = arraySum[:,vfat,:] / arrayCount[:,vfat,:]
 
-    # Load data
+    # Get the data for each strip and store it as a tuple in the list to be returned
     listData = []
-    for dataPt in listDataPtTuples:
-        # Get human readable info
-        cName = dataPt[0]
-        scandate = dataPt[1]
-        indepVarVal = dataPt[2]
-
-        # Setup Paths
-        dirPath = getDirByAnaType(anaType.strip("Ana"), cName, ztrim)
-        if not filePathExists(dirPath, scandate):
-            print 'Filepath %s/%s does not exist!'%(dirPath, scandate)
-            if skipBad:
-                print 'Skipping'
-                continue
-            else:
-                print 'Please cross-check, exiting!'
-                exit(os.EX_DATAERR)
-                pass
-        filename = "%s/%s/%s"%(dirPath, scandate, rootFileName)
-
-        # Get TTree
-        try:
-            dataFile = r.TFile(filename, "READ")
-            dataTree = dataFile.Get(treeName)
-            knownBranches = dataTree.GetListOfBranches()
-        except Exception as e:
-            print '%s may not exist in %s'%(treeName,filename)
-            print e
-            if skipBad:
-                print 'Skipping'
+    for idx, indepVarVal in enumerate(listIndepVarVals):
+        for chan in range(0,depVarVal.shape[1]):
+            if arrayCount[idx,vfat,chan] == 0:
                 continue
-            else:
-                print 'Please cross-check, exiting!'
-                exit(os.EX_DATAERR)
-                pass
+            listData.append( (indepVarVal, chan, float(depVarVal[idx,chan])) )
             pass
+        pass
 
-        # Check to make sure listNames are present in dataTree
-        for testBranch in listNames:
-            if testBranch not in knownBranches:
-                print "Branch %s not in TTree %s of file %s"%(branchName, treeName, filename)
-                print "Existing Branches are:"
-                for realBranch in knownBranches:
-                    print realBranch
-                print "Please try again using one of the existing branches"
-                exit(os.EX_DATAERR)
+    # Return Data
+    return listData
 
-        # Get dependent variable value
-        arrayVFATData = rp.tree2array(dataTree,listNames)
-        dataThisVFAT = arrayVFATData[ arrayVFATData['vfatN'] == vfat] #VFAT Level
+def _readScanDateFile(args):
+    """
+    Reads one input file of :any:`loadScanDateData`, args being the tuple
+    ``(anaType, dataPt, rootFileName, treeName, listNames, listBranchNames,
+    chanBranchName, ztrim, createSidecar)``.
+
+    Returns a tuple ``(status, listMessages, result)``: status is ``None``
+    on success, ``"missing"`` if the file or ``TTree`` cannot be read and
+    ``"badBranch"`` if a requested branch is absent.  listMessages holds the
+    lines to print to the user and result, on success, a tuple
+    ``(arrayCount, dictSum, dictSumSq)`` of per (vfat, chan) sums.  Nothing
+    is printed and the process is never exited so that the caller can
+    report the files in order and apply ``skipBad``.
+    """
 
-        # Close the TFile
-        dataFile.Close()
-        
-        if vfatCH is not None and strip is None:
-            dataThisVFAT = dataThisVFAT[ dataThisVFAT['vfatCH'] == vfatCH ] #VFAT Channel Level
-        elif strip is not None and vfatCH is None:
-            dataThisVFAT = dataThisVFAT[ dataThisVFAT['ROBstr'] == strip ] #Readout Board Strip Level
-        
-        depVarVal = np.asscalar(np.mean(dataThisVFAT[branchName]))   #If a vfatCH/ROBstr obs & chan/strip not give will be avg over all, else a number
-        depVarValErr = np.asscalar(np.std(dataThisVFAT[branchName])) #If a vfatCH/ROBstr obs & chan/strip not given will be stdev over all, or zero
+    from gempython.gemplotting.utils.anautilities import filePathExists, getDirByAnaType
+    from gempython.gemplotting.utils.sidecar import listBranches, loadArray
 
-        #Record this dataPt
-        listData.append( (indepVarVal, depVarVal, depVarValErr) )
+    import numpy as np
 
-    # Return Data
-    return listData
+    (anaType, dataPt, rootFileName, treeName, listNames, listBranchNames, chanBranchName, ztrim, createSidecar) = args
+
+    # Get human readable info
+    cName = dataPt[0]
+    scandate = dataPt[1]
+
+    # Setup Paths
+    dirPath = getDirByAnaType(anaType.strip("Ana"), cName, ztrim)
+    if not filePathExists(dirPath, scandate):
+        return ("missing", [ 'Filepath %s/%s does not exist!'%(dirPath, scandate) ], None)
+    filename = "%s/%s/%s"%(dirPath, scandate, rootFileName)
+
+    # Get branches of the TTree, from its sidecar if it is valid
+    try:
+        knownBranches = listBranches(filename, treeName)
+    except Exception as e:
+        return ("missing", [ '%s may not exist in %s'%(treeName,filename), str(e) ], None)
+
+    # Check to make sure listNames are present in dataTree
+    for testBranch in listNames:
+        if testBranch not in knownBranches:
+            listMessages = [ "Branch %s not in TTree %s of file %s"%(testBranch, treeName, filename),
+                             "Existing Branches are:" ]
+            listMessages.extend(knownBranches)
+            listMessages.append("Please try again using one of the existing branches")
+            return ("badBranch", listMessages, None)
+
+    # Accumulate the dependent variables of all VFATs
+    nChannels = 1
+    if chanBranchName is not None:
+        nChannels = 128
+    arrayData = loadArray(filename, treeName, listNames, createSidecar)
+    vfatN = arrayData['vfatN'].astype(int)
+    chan = np.zeros(len(arrayData), dtype=int)
+    if chanBranchName is not None:
+        chan = arrayData[chanBranchName].astype(int)
+    isKnown = (vfatN >= 0) & (vfatN < 24) & (chan >= 0) & (chan < nChannels)
+    index = vfatN[isKnown] * nChannels + chan[isKnown]
+
+    arrayCount = np.bincount(index, minlength=24*nChannels).reshape(24,nChannels)
+    dictSum = {}
+    dictSumSq = {}
+    for branchName in listBranchNames:
+        depVar = arrayData[branchName].astype(float)[isKnown]
+        dictSum[branchName] = np.bincount(index, weights=depVar, minlength=24*nChannels).reshape(24,nChannels)
+        dictSumSq[branchName] = np.bincount(index, weights=depVar**2, minlength=24*nChannels).reshape(24,nChannels)
+        pass
+
+    return (None, [], (arrayCount, dictSum, dictSumSq))
 
-def arbitraryPlotter2D(anaType, listDataPtTuples, rootFileName, treeName, branchName, vfat, ROBstr=True, ztrim=4, skipBad=False):
+def loadScanDateData(anaType, listDataPtTuples, rootFileName, treeName, listBranchNames, chanBranchName=None, ztrim=4, skipBad=False, createSidecar=False, nLoaders=1):
     """
-    Provides a list of tuples for 2D data where each element is of the
-    ``(x,y,z)`` form: ``(indepVarVal, vfatCHOrROBstr, depVarVal)``
+    Reads the branches of ``listBranchNames`` from the input file of each
+    scandate once, for all VFATs, and accumulates them per (scandate, vfat,
+    channel).  Up to ``nLoaders`` files are read concurrently, which hides
+    most of the latency of a network mounted ``DATA_PATH``.  The plots of
+    each VFAT are then made from memory with :any:`arbitraryPlotter` and
+    :any:`arbitraryPlotter2D`.
 
     Args:
         anaType (string): type of analysis to perform, helps build the file path
             to the input file(s), from the keys of
             :any:`utils.anaInfo.ana_config`
 
-        listDataPtTuples: list of tuples where each element is of the form:
+        listDataPtTuples: list of tuples where each element is of the form
             ``(cName, scandate, indepVar)``, note ``indepVar`` is expected to be
             numeric
 
@@ -387,122 +422,130 @@ def arbitraryPlotter2D(anaType, listDataPtTuples, rootFileName, treeName, branch
 
         treeName (string): name of the ``TTree`` inside ``rootFileName``
 
-        branchName (string): name of a branch inside ``treeName`` that the
-            dependent variable will be extracted from
+        listBranchNames (list): names of the branches inside ``treeName``
+            that the dependent variables will be extracted from
 
-        vfat (int): vfat number that plots should be made for
+        chanBranchName (string): name of the channel branch, ``vfatCH`` or
+            ``ROBstr``, if ``None`` all entries of a VFAT are accumulated
+            together
 
         skipBad (bool): if a file fails to open or the ``TTree`` cannot be
             found, the input is skipped and the processing continues rather than
             exiting
+
+        createSidecar (bool): write a columnar sidecar of each input file
+            that does not have a valid one, see :any:`utils.sidecar`
+
+        nLoaders (int): number of input files read at the same time by a
+            pool of processes, the files are still accumulated in the order
+            of ``listDataPtTuples``; if 1 they are read one after another
+
+    Returns a dict whose keys are the elements of ``listBranchNames`` and
+    whose values are tuples ``(listIndepVarVals, arrayCount, arraySum,
+    arraySumSq)`` where ``listIndepVarVals`` holds the ``indepVar`` of each
+    scandate read and the arrays, indexed as ``[scandate][vfat][chan]``, the
+    number of entries, the sum and the sum of squares of the branch.  The channel
+    axis has a length of 128, or 1 if ``chanBranchName`` is ``None``.
     """
-  
-    from gempython.gemplotting.utils.anautilities import filePathExists, getDirByAnaType
+
+    from multiprocessing import current_process
 
     import numpy as np
     import os
-    import root_numpy as rp
 
     # Make branches to load
     listNames = ["vfatN"]
-    strChanName = "" #Name of channel TBranch, either 'ROBstr' or 'vfatCH'
-    if ROBstr:
-        listNames.append("ROBstr")
-        strChanName = "ROBstr"
+    nChannels = 1
+    if chanBranchName is not None:
+        listNames.append(chanBranchName)
+        nChannels = 128
+    listNames.extend(branchName for branchName in listBranchNames if branchName not in listNames)
+
+    listFileArgs = [ (anaType, dataPt, rootFileName, treeName, listNames, listBranchNames, chanBranchName, ztrim, createSidecar) for dataPt in listDataPtTuples ]
+
+    nLoaders = min(nLoaders, len(listFileArgs))
+    if current_process().daemon:
+        nLoaders = 1 # e.g. inside a pool worker, which cannot have children
+
+    # Read the files, imap() returns them in order while the following
+    # files are already being read
+    pool = None
+    if nLoaders > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(nLoaders)
+        fileResults = pool.imap(_readScanDateFile, listFileArgs)
     else:
-        listNames.append("vfatCH")
-        strChanName = "vfatCH"
-    listNames.append(branchName)
+        fileResults = (_readScanDateFile(fileArgs) for fileArgs in listFileArgs)
 
     # Load data
-    listData = []
-    for dataPt in listDataPtTuples:
-        # Get human readable info
-        cName = dataPt[0]
-        scandate = dataPt[1]
-        indepVarVal = dataPt[2]
-
-        # Setup Paths
-        dirPath = getDirByAnaType(anaType.strip("Ana"), cName, ztrim)
-        if not filePathExists(dirPath, scandate):
-            print 'Filepath %s/%s does not exist!'%(dirPath, scandate)
-            if skipBad:
-                print 'Skipping'
-                continue
-            else:
-                print 'Please cross-check, exiting!'
-                exit(os.EX_DATAERR)
+    listIndepVarVals = []
+    listCount = []
+    dictSum = dict((branchName, []) for branchName in listBranchNames)
+    dictSumSq = dict((branchName, []) for branchName in listBranchNames)
+    try:
+        for dataPt, (status, listMessages, result) in zip(listDataPtTuples, fileResults):
+            for message in listMessages:
+                print message
                 pass
-        filename = "%s/%s/%s"%(dirPath, scandate, rootFileName)
-
-        # Get TTree
-        try:
-            dataFile = r.TFile(filename, "READ")
-            dataTree = dataFile.Get(treeName)
-            knownBranches = dataTree.GetListOfBranches()
-        except Exception as e:
-            print '%s may not exist in %s'%(treeName,filename)
-            print e
-            if skipBad:
-                print 'Skipping'
-                continue
-            else:
-                print 'Please cross-check, exiting!'
-                exit(os.EX_DATAERR)
-                pass
-            pass
 
-        # Check to make sure listNames are present in dataTree
-        for testBranch in listNames:
-            if testBranch not in knownBranches:
-                print "Branch %s not in TTree %s of file %s"%(branchName, treeName, filename)
-                print "Existing Branches are:"
-                for realBranch in knownBranches:
-                    print realBranch
-                print "Please try again using one of the existing branches"
+            if status == "missing":
+                if skipBad:
+                    print 'Skipping'
+                    continue
+                else:
+                    print 'Please cross-check, exiting!'
+                    exit(os.EX_DATAERR)
+                    pass
+            elif status == "badBranch":
                 exit(os.EX_DATAERR)
 
-        # Get dependent variable value - VFAT Level
-        arrayVFATData = rp.tree2array(dataTree,listNames)
-        dataThisVFAT = arrayVFATData[ arrayVFATData['vfatN'] == vfat] #VFAT Level
-
-        # Close the TFile
-        dataFile.Close()
-
-        # Get the data for each strip and store it as a tuple in the list to be returned
-        for chan in range(0,128):
-            dataThisChan = dataThisVFAT[ dataThisVFAT[strChanName] == chan] #Channel Level
-            depVarVal = np.asscalar(np.mean(dataThisChan[branchName]))
-            listData.append( (indepVarVal, chan, depVarVal) )
+            listIndepVarVals.append(dataPt[2])
+            listCount.append(result[0])
+            for branchName in listBranchNames:
+                dictSum[branchName].append(result[1][branchName])
+                dictSumSq[branchName].append(result[2][branchName])
+                pass
+            pass
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
             pass
 
-    # Return Data
-    return listData
+    shape = (len(listIndepVarVals), 24, nChannels)
+    arrayCount = np.array(listCount, dtype=float).reshape(shape)
+    return dict((branchName, (listIndepVarVals,
+                              arrayCount,
+                              np.array(dictSum[branchName], dtype=float).reshape(shape),
+                              np.array(dictSumSq[branchName], dtype=float).reshape(shape))) for branchName in listBranchNames)
 
-if __name__ == '__main__':
-    from gempython.gemplotting.utils.anaInfo import tree_names
-    from gempython.gemplotting.utils.anautilities import parseListOfScanDatesFile
-    from gempython.utils.wrappers import envCheck
-    from plotoptions import parser
+def makeGemPlotterParser():
+    """
+    Returns the OptionParser of gemPlotter.py
+    """
 
-    import array
-    import numpy as np
-    import os
-    
+    from gempython.gemplotting.macros.plotoptions import makeParser
+
+    parser = makeParser()
     parser.add_option("-a","--all", action="store_true", dest="all_plots",
                     help="vfatList is automatically set to [0,1,...,22,23]", metavar="all_plots")
     parser.add_option("--alphaLabels", action="store_true", dest="alphaLabels",
                     help="Draw output plot using alphanumeric lables instead of pure floating point", metavar="alphaLabels")
-    parser.add_option("--axisMax", type="float", dest="axisMax", default=255,
-                    help="Maximum value for axis depicting branchName", metavar="axisMax")
-    parser.add_option("--axisMin", type="float", dest="axisMin", default=0,
-                    help="Minimum value for axis depicting branchName", metavar="axisMin")
+    parser.add_option("--axisMax", type="string", dest="axisMax", default="255",
+                    help="Maximum value for axis depicting branchName, or comma separated list with one value per branchName", metavar="axisMax")
+    parser.add_option("--axisMin", type="string", dest="axisMin", default="0",
+                    help="Minimum value for axis depicting branchName, or comma separated list with one value per branchName", metavar="axisMin")
     parser.add_option("--anaType", type="string", dest="anaType",
                     help="Analysis type to be executed, from list {'latency','scurve','scurveAna','threshold','trim','trimAna'}", metavar="anaType")
     parser.add_option("--branchName", type="string", dest="branchName",
-                    help="Name of TBranch where dependent variable is store", metavar="branchName")
+                    help="Name of TBranch where dependent variable is store, or comma separated list of names; each file is read once and one output TFile is made per branch", metavar="branchName")
     parser.add_option("--make2D", action="store_true", dest="make2D",
                     help="A 2D plot of (indepVar, chan, branchName) is made instead of a 1D plot", metavar="make2D")
+    parser.add_option("--makeSidecars", action="store_true", dest="makeSidecars",
+                    help="Write a columnar sidecar next to each input file that does not have a valid one, later calls read it instead of the TTree", metavar="makeSidecars")
+    parser.add_option("--nLoaders", type="int", dest="nLoaders", default=8,
+                    help="Number of input files read at the same time", metavar="nLoaders")
     parser.add_option("-p","--print", action="store_true", dest="printData",
                     help="Prints a comma separated table with the data to the terminal", metavar="printData")
     parser.add_option("--rootOpt", type="string", dest="rootOpt", default="RECREATE",
@@ -517,8 +560,27 @@ if __name__ == '__main__':
                     help="Specify the p value of the trim", metavar="ztrim")
 
     parser.set_defaults(filename="listOfScanDates.txt")
-    (options, args) = parser.parse_args()
-  
+
+    return parser
+
+def runGemPlotter(options):
+    """
+    Makes the plots of gemPlotter.py, options being the optparse.Values
+    from makeGemPlotterParser().parse_args().  All branches given in
+    options.branchName are read from each input file at once, then one
+    output TFile is made for each of them.
+
+    Returns os.EX_OK, exits with a non-zero status if the input is invalid
+    """
+
+    from gempython.gemplotting.utils.anaInfo import tree_names
+    from gempython.gemplotting.utils.anautilities import parseListOfScanDatesFile
+    from gempython.utils.wrappers import envCheck
+
+    import array
+    import numpy as np
+    import os
+
     import ROOT as r
 
     # Check Paths
@@ -529,7 +591,7 @@ if __name__ == '__main__':
     # Get VFAT List
     listVFATs = []
     if options.all_plots:
-        listVFATs = (x for x in range(0,24))
+        listVFATs = range(0,24)
     elif options.vfatList != None:
         listVFATs = map(int, options.vfatList.split(','))
     elif options.vfat != None:
@@ -538,6 +600,25 @@ if __name__ == '__main__':
         print "You must specify at least one VFAT to be considered"
         exit(os.EX_USAGE)
     
+    if options.nLoaders < 1:
+        print "Number of loaders must be at least 1, not %i"%(options.nLoaders)
+        exit(os.EX_USAGE)
+
+    # Get the branches and their axis ranges
+    if options.branchName is None:
+        print "You must specify at least one branch with --branchName"
+        exit(os.EX_USAGE)
+    listBranchNames = options.branchName.split(',')
+    listAxisMin = map(float, options.axisMin.split(','))
+    listAxisMax = map(float, options.axisMax.split(','))
+    if len(listAxisMin) == 1:
+        listAxisMin = listAxisMin * len(listBranchNames)
+    if len(listAxisMax) == 1:
+        listAxisMax = listAxisMax * len(listBranchNames)
+    if len(listAxisMin) != len(listBranchNames) or len(listAxisMax) != len(listBranchNames):
+        print "--axisMin and --axisMax must have a single value or one value per branch in --branchName"
+        exit(os.EX_USAGE)
+
     # Check anaType is understood
     if options.anaType not in tree_names.keys():
         print "Invalid analysis specificed, please select only from the list:"
@@ -600,187 +681,210 @@ if __name__ == '__main__':
 
     # Loop over the vfats in listVFATs and make the requested plot for each
     strIndepVarNoBraces = strIndepVar.replace('{','').replace('}','').replace('_','')
-    strRootName = "%s/gemPlotterOutput_%s_vs_%s.root"%(elogPath,options.branchName, strIndepVarNoBraces)
     r.gROOT.SetBatch(True)
-    outF = r.TFile(strRootName,options.rootOpt)
-    listPlots = []
-    for vfat in listVFATs:
-        # Make the output directory
-        dirVFAT = r.TDirectory()
-        if options.rootOpt.upper() == "UPDATE":
-            dirVFAT = outF.GetDirectory("VFAT%i"%vfat, False, "GetDirectory")
+
+    # Read each scandate once, the plots of all VFATs are made from memory
+    chanBranchName = None
+    if options.make2D:
+        if options.channels:
+            chanBranchName = "vfatCH"
         else:
-            dirVFAT = outF.mkdir("VFAT%i"%vfat)
-            pass
+            chanBranchName = "ROBstr"
+    elif vfatCH is not None:
+        chanBranchName = "vfatCH"
+    elif strip is not None:
+        chanBranchName = "ROBstr"
+    dictScanDateData = loadScanDateData(
+            options.anaType,
+            listDataPtTuples,
+            tree_names[options.anaType][0],
+            tree_names[options.anaType][1],
+            listBranchNames,
+            chanBranchName,
+            options.ztrim,
+            skipBad=options.skipBadFiles,
+            createSidecar=options.makeSidecars,
+            nLoaders=options.nLoaders)
+
+    # Make the plots of each branch, each in its own output TFile
+    for branchName, axisMin, axisMax in zip(listBranchNames, listAxisMin, listAxisMax):
+        scanDateData = dictScanDateData[branchName]
+        strRootName = "%s/gemPlotterOutput_%s_vs_%s.root"%(elogPath,branchName, strIndepVarNoBraces)
+        outF = r.TFile(strRootName,options.rootOpt)
+        listPlots = []
+        for vfat in listVFATs:
+            # Make the output directory
+            dirVFAT = r.TDirectory()
+            if options.rootOpt.upper() == "UPDATE":
+                dirVFAT = outF.GetDirectory("VFAT%i"%vfat, False, "GetDirectory")
+            else:
+                dirVFAT = outF.mkdir("VFAT%i"%vfat)
+                pass
 
-        # Make the output canvas, use a temp name and temp title for now
-        strCanvName = ""
-        canvPlot = r.TCanvas("canv_VFAT%i"%(vfat),"VFAT%i"%(vfat),2400,800)
-
-        # Make the plot, either 2D or 1D
-        if options.make2D:
-            listData = arbitraryPlotter2D(
-                    options.anaType, 
-                    listDataPtTuples, 
-                    tree_names[options.anaType][0], 
-                    tree_names[options.anaType][1], 
-                    options.branchName, 
-                    vfat,
-                    not options.channels,
-                    options.ztrim,
-                    skipBad=options.skipBadFiles)
-
-            # Print to the user
-            if options.printData:
-                print "===============Printing Data for VFAT%i==============="%(vfat)
-                print "[BEGIN_DATA]"
-                print "\tVAR_INDEP,VAR_DEP,VALUE"
-                for dataPt in listData:
-                    print "\t%f,%f,%f"%(dataPt[0],dataPt[1],dataPt[2])
-                print "[END_DATA]"
-                print ""
+            # Make the output canvas, use a temp name and temp title for now
+            strCanvName = ""
+            canvPlot = r.TCanvas("canv_VFAT%i"%(vfat),"VFAT%i"%(vfat),2400,800)
+
+            # Make the plot, either 2D or 1D
+            if options.make2D:
+                listData = arbitraryPlotter2D(scanDateData, vfat)
+
+                # Print to the user
+                if options.printData:
+                    print "===============Printing Data for VFAT%i==============="%(vfat)
+                    print "[BEGIN_DATA]"
+                    print "\tVAR_INDEP,VAR_DEP,VALUE"
+                    for dataPt in listData:
+                        print "\t%f,%f,%f"%(dataPt[0],dataPt[1],dataPt[2])
+                    print "[END_DATA]"
+                    print ""
             
 
-            # Make the plot
-            binsIndepVarLowEdge = array.array('d',listIndepVarLowEdge)
-            hPlot2D = r.TH2F("h_%s_vs_%s_Obs%s_VFAT%i"%(strStripOrChan, strIndepVarNoBraces, options.branchName, vfat),
-                            "VFAT%i"%(vfat),
-                            len(listIndepVarLowEdge)-1, binsIndepVarLowEdge,
-                            128, -0.5, 127.5)
-            hPlot2D.SetXTitle(strIndepVar)
-            hPlot2D.SetYTitle(strStripOrChan)
-            hPlot2D.SetZTitle(options.branchName)
+                # Make the plot
+                binsIndepVarLowEdge = array.array('d',listIndepVarLowEdge)
+                hPlot2D = r.TH2F("h_%s_vs_%s_Obs%s_VFAT%i"%(strStripOrChan, strIndepVarNoBraces, branchName, vfat),
+                                "VFAT%i"%(vfat),
+                                len(listIndepVarLowEdge)-1, binsIndepVarLowEdge,
+                                128, -0.5, 127.5)
+                hPlot2D.SetXTitle(strIndepVar)
+                hPlot2D.SetYTitle(strStripOrChan)
+                hPlot2D.SetZTitle(branchName)
            
-            # Do we have alphanumeric bin labels?
-            if options.alphaLabels:
-                for binX,item in enumerate(listDataPtTuples):
-                    hPlot2D.GetXaxis().SetBinLabel(binX+1,item[2])
-
-            # Fill the plot
-            for idx in range(len(listData)):
-                hPlot2D.Fill(listData[idx][0],listData[idx][1],listData[idx][2])
+                # Do we have alphanumeric bin labels?
+                if options.alphaLabels:
+                    for binX,item in enumerate(listDataPtTuples):
+                        hPlot2D.GetXaxis().SetBinLabel(binX+1,item[2])
+
+                # Fill the plot
+                for idx in range(len(listData)):
+                    hPlot2D.Fill(listData[idx][0],listData[idx][1],listData[idx][2])
             
-            # Set the Stat Box Options
-            if options.showStat:
-                r.gStyle.SetOptStat(1111111)
-            else:
-                r.gStyle.SetOptStat(0000000)
+                # Set the Stat Box Options
+                if options.showStat:
+                    r.gStyle.SetOptStat(1111111)
+                else:
+                    r.gStyle.SetOptStat(0000000)
                 
-            # Draw this plot on a canvas
-            strCanvName = "%s/canv_%s_vs_%s_Obs%s_VFAT%i.png"%(elogPath, strStripOrChan, strIndepVarNoBraces, options.branchName, vfat)
-            canvPlot.SetName("canv_%s_vs_%s_Obs%s_VFAT%i.png"%(strStripOrChan, strIndepVarNoBraces, options.branchName, vfat))
-            canvPlot.SetTitle("VFAT%i: %s vs. %s - Obs %s"%(vfat,strStripOrChan,strIndepVarNoBraces, options.branchName))
-            canvPlot.SetRightMargin(0.15)
-            canvPlot.cd()
-            hPlot2D.GetZaxis().SetRangeUser(options.axisMin, options.axisMax)
-            hPlot2D.Draw(strDrawOpt)
-            hPlot2D.GetYaxis().SetDecimals(True)
-            hPlot2D.GetYaxis().SetTitleOffset(1.2)
+                # Draw this plot on a canvas
+                strCanvName = "%s/canv_%s_vs_%s_Obs%s_VFAT%i.png"%(elogPath, strStripOrChan, strIndepVarNoBraces, branchName, vfat)
+                canvPlot.SetName("canv_%s_vs_%s_Obs%s_VFAT%i.png"%(strStripOrChan, strIndepVarNoBraces, branchName, vfat))
+                canvPlot.SetTitle("VFAT%i: %s vs. %s - Obs %s"%(vfat,strStripOrChan,strIndepVarNoBraces, branchName))
+                canvPlot.SetRightMargin(0.15)
+                canvPlot.cd()
+                hPlot2D.GetZaxis().SetRangeUser(axisMin, axisMax)
+                hPlot2D.Draw(strDrawOpt)
+                hPlot2D.GetYaxis().SetDecimals(True)
+                hPlot2D.GetYaxis().SetTitleOffset(1.2)
             
-            # Store the plot
-            dirVFAT.cd()
-            hPlot2D.Write()
-            listPlots.append(hPlot2D)
-        else:
-            listData = arbitraryPlotter(
-                    options.anaType, 
-                    listDataPtTuples, 
-                    tree_names[options.anaType][0], 
-                    tree_names[options.anaType][1], 
-                    options.branchName, 
-                    vfat, 
-                    vfatCH, 
-                    strip,
-                    options.ztrim,
-                    skipBad=options.skipBadFiles)
-
-            # Print to the user
-            # Using format compatible with: https://github.com/cms-gem-detqc-project/CMS_GEM_Analysis_Framework#4eiviii-header-parameters---data
-            if options.printData:
-                print "===============Printing Data for VFAT%i==============="%(vfat)
-                print "[BEGIN_DATA]"
-                print "\tVAR_INDEP,VAR_DEP,VAR_DEP_ERR"
-                for dataPt in listData:
-                    print "\t%f,%f,%f"%(dataPt[0],dataPt[1],dataPt[2])
-                print "[END_DATA]"
-                print ""
-
-            # Make the plot
-            thisPlot = r.TGraphErrors(len(listData))
-            if options.alphaLabels:
-                strDrawOpt = "PE1v"
+                # Store the plot
+                dirVFAT.cd()
+                hPlot2D.Write()
+                listPlots.append(hPlot2D)
+            else:
+                if vfatCH is not None:
+                    listData = arbitraryPlotter(scanDateData, vfat, vfatCH)
+                else:
+                    listData = arbitraryPlotter(scanDateData, vfat, strip)
+
+                # Print to the user
+                # Using format compatible with: https://github.com/cms-gem-detqc-project/CMS_GEM_Analysis_Framework#4eiviii-header-parameters---data
+                if options.printData:
+                    print "===============Printing Data for VFAT%i==============="%(vfat)
+                    print "[BEGIN_DATA]"
+                    print "\tVAR_INDEP,VAR_DEP,VAR_DEP_ERR"
+                    for dataPt in listData:
+                        print "\t%f,%f,%f"%(dataPt[0],dataPt[1],dataPt[2])
+                    print "[END_DATA]"
+                    print ""
+
+                # Make the plot
+                thisPlot = r.TGraphErrors(len(listData))
+                if options.alphaLabels:
+                    strDrawOpt = "PE1v"
                 
-                binsIndepVarLowEdge = array.array('d',listIndepVarLowEdge)
-                thisPlot = r.TH1F("h_%s_vs_%s_VFAT%i_%s"%(options.branchName, strIndepVarNoBraces, vfat, strStripOrChan),
-                                  "VFAT%i_%s"%(vfat,strStripOrChan),
-                                  len(listIndepVarLowEdge)-1, binsIndepVarLowEdge)
+                    binsIndepVarLowEdge = array.array('d',listIndepVarLowEdge)
+                    thisPlot = r.TH1F("h_%s_vs_%s_VFAT%i_%s"%(branchName, strIndepVarNoBraces, vfat, strStripOrChan),
+                                      "VFAT%i_%s"%(vfat,strStripOrChan),
+                                      len(listIndepVarLowEdge)-1, binsIndepVarLowEdge)
            
-                for binX,item in enumerate(listDataPtTuples):
-                    thisPlot.GetXaxis().SetBinLabel(binX+1,item[2])
-                for idx in range(len(listData)):
-                    thisPlot.Fill(listData[idx][0], listData[idx][1])
+                    for binX,item in enumerate(listDataPtTuples):
+                        thisPlot.GetXaxis().SetBinLabel(binX+1,item[2])
+                    for idx in range(len(listData)):
+                        thisPlot.Fill(listData[idx][0], listData[idx][1])
                     
-                    if thisPlot.GetXaxis().GetBinLabel(idx+1) == listDataPtTuples[idx][2]:
-                        thisPlot.SetBinError(idx+1, listData[idx][2])
-            else:
-                thisPlot.SetTitle("VFAT%i_%s"%(vfat,strStripOrChan))
-                thisPlot.SetName("g_%s_vs_%s_VFAT%i_%s"%(options.branchName, strIndepVarNoBraces, vfat, strStripOrChan))
-                for idx in range(len(listData)):
-                    thisPlot.SetPoint(idx, listData[idx][0], listData[idx][1])
-                    thisPlot.SetPointError(idx, 0., listData[idx][2])
-
-            # Draw this plot on a canvas
-            thisPlot.SetMarkerStyle(20)
-            thisPlot.SetLineWidth(2)
-            strCanvName = "%s/canv_%s_vs_%s_VFAT%i_%s.png"%(elogPath, options.branchName,strIndepVarNoBraces, vfat,strStripOrChan)
-            canvPlot.SetName("canv_%s_vs_%s_VFAT%i_%s"%(options.branchName,strIndepVarNoBraces, vfat, strStripOrChan))
-            canvPlot.SetTitle("VFAT%i_%s: %s vs. %s"%(vfat,strStripOrChan,options.branchName,strIndepVarNoBraces))
-            canvPlot.cd()
-            thisPlot.Draw(strDrawOpt)
-            thisPlot.GetXaxis().SetTitle(strIndepVar)
-            thisPlot.GetXaxis().SetLabelSize(0.04)
-            thisPlot.GetYaxis().SetDecimals(True)
-            thisPlot.GetYaxis().SetRangeUser(options.axisMin, options.axisMax)
-            thisPlot.GetYaxis().SetTitle(options.branchName)
-            thisPlot.GetYaxis().SetTitleOffset(1.2)
+                        if thisPlot.GetXaxis().GetBinLabel(idx+1) == listDataPtTuples[idx][2]:
+                            thisPlot.SetBinError(idx+1, listData[idx][2])
+                else:
+                    thisPlot.SetTitle("VFAT%i_%s"%(vfat,strStripOrChan))
+                    thisPlot.SetName("g_%s_vs_%s_VFAT%i_%s"%(branchName, strIndepVarNoBraces, vfat, strStripOrChan))
+                    for idx in range(len(listData)):
+                        thisPlot.SetPoint(idx, listData[idx][0], listData[idx][1])
+                        thisPlot.SetPointError(idx, 0., listData[idx][2])
+
+                # Draw this plot on a canvas
+                thisPlot.SetMarkerStyle(20)
+                thisPlot.SetLineWidth(2)
+                strCanvName = "%s/canv_%s_vs_%s_VFAT%i_%s.png"%(elogPath, branchName,strIndepVarNoBraces, vfat,strStripOrChan)
+                canvPlot.SetName("canv_%s_vs_%s_VFAT%i_%s"%(branchName,strIndepVarNoBraces, vfat, strStripOrChan))
+                canvPlot.SetTitle("VFAT%i_%s: %s vs. %s"%(vfat,strStripOrChan,branchName,strIndepVarNoBraces))
+                canvPlot.cd()
+                thisPlot.Draw(strDrawOpt)
+                thisPlot.GetXaxis().SetTitle(strIndepVar)
+                thisPlot.GetXaxis().SetLabelSize(0.04)
+                thisPlot.GetYaxis().SetDecimals(True)
+                thisPlot.GetYaxis().SetRangeUser(axisMin, axisMax)
+                thisPlot.GetYaxis().SetTitle(branchName)
+                thisPlot.GetYaxis().SetTitleOffset(1.2)
+        
+                # Store the plot
+                dirVFAT.cd()
+                thisPlot.Write()
+                listPlots.append(thisPlot)
+                pass
         
-            # Store the plot
+            if not options.all_plots:
+                print ""
+                print "To view your plot, execute:"
+                print ("eog " + strCanvName)
+                print ""
+
+            # Store the Canvas
+            canvPlot.Update()
+            canvPlot.SaveAs(strCanvName)
             dirVFAT.cd()
-            thisPlot.Write()
-            listPlots.append(thisPlot)
+            canvPlot.Write()
             pass
+
+        # Make Summary Plot
+        if options.all_plots:
+            from gempython.gemplotting.utils.anautilities import make3x8Canvas
+            strSummaryName = "summary_%s_vs_%s_%s"%(branchName, strIndepVarNoBraces,strStripOrChan)
+            canv_summary = make3x8Canvas( strSummaryName, listPlots, strDrawOpt)
         
-        if not options.all_plots:
+            strCanvName = "%s/%s.png"%(elogPath,strSummaryName)
+            canv_summary.SaveAs(strCanvName)
+        
+            outF.cd()
+            canv_summary.Write()
+
             print ""
             print "To view your plot, execute:"
             print ("eog " + strCanvName)
             print ""
 
-        # Store the Canvas
-        canvPlot.Update()
-        canvPlot.SaveAs(strCanvName)
-        dirVFAT.cd()
-        canvPlot.Write()
+        print ""
+        print "Your plot is stored in a TFile, to open it execute:"
+        print ("root " + strRootName)
+        print ""
+
+        outF.Close()
         pass
 
-    # Make Summary Plot
-    if options.all_plots:
-        from gempython.gemplotting.utils.anautilities import make3x8Canvas
-        strSummaryName = "summary_%s_vs_%s_%s"%(options.branchName, strIndepVarNoBraces,strStripOrChan)
-        canv_summary = make3x8Canvas( strSummaryName, listPlots, strDrawOpt)
-        
-        strCanvName = "%s/%s.png"%(elogPath,strSummaryName)
-        canv_summary.SaveAs(strCanvName)
-        
-        outF.cd()
-        canv_summary.Write()
+    return os.EX_OK
 
-        print ""
-        print "To view your plot, execute:"
-        print ("eog " + strCanvName)
-        print ""
+if __name__ == '__main__':
+    import os
 
-    print ""
-    print "Your plot is stored in a TFile, to open it execute:"
-    print ("root " + strRootName)
-    print ""
+    parser = makeGemPlotterParser()
+    (options, args) = parser.parse_args()
+    exit(runGemPlotter(options))
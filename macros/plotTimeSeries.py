@@ -6,18 +6,28 @@ plotTimeSeries
 """
 
 def makePlots(chamberName, anaType, vt1bump, elog_path):
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=threshold --make2D --alphaLabels -a --axisMax=10'
-    os.system(call_command)
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=noise --make2D --alphaLabels -a --axisMin=0.05 --axisMax=0.3'
-    os.system(call_command)
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=ped_eff --make2D --alphaLabels -a --axisMax=1'
-    os.system(call_command)
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=mask --make2D --alphaLabels -a --axisMax=1'
-    os.system(call_command)
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=maskReason --make2D --alphaLabels -a --axisMax=32'
-    os.system(call_command)
-    call_command = 'gemPlotter.py --skipBadFiles --infilename='+getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt --anaType=scurveAna --branchName=vthr --alphaLabels -a'
-    os.system(call_command)
+    from gempython.gemplotting.macros.gemPlotter import makeGemPlotterParser, runGemPlotter
+
+    # Each call reads every scandate once for all of its observables
+    listOfScanDatesFile = getDirByAnaType(anaType,chamberName)+'listOfScanDates.txt'
+    listOfPlotterArgs = [
+            [ '--branchName=threshold,noise,ped_eff,mask,maskReason', '--make2D',
+              '--axisMin=0,0.05,0,0,0', '--axisMax=10,0.3,1,1,32' ],
+            [ '--branchName=vthr' ] ]
+    for plotterArgs in listOfPlotterArgs:
+        (plotterOptions, args) = makeGemPlotterParser().parse_args([
+            '--skipBadFiles',
+            '--infilename='+listOfScanDatesFile,
+            '--anaType=scurveAna',
+            '--alphaLabels',
+            '-a' ] + plotterArgs)
+        try:
+            runGemPlotter(plotterOptions)
+        except SystemExit as e:
+            print "gemPlotter.py failed for %s with exit code %s"%(chamberName, e.code)
+            pass
+        pass
+
     call_command = 'mkdir -p '+elog_path+'/timeSeriesPlots/'+chamberName+'/'+vt1bump+'/'
     os.system(call_command)
     call_command = 'mv '+elog_path+'/summary*.png '+elog_path+'/timeSeriesPlots/'+chamberName+'/'+vt1bump+'/'
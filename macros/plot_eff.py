@@ -38,11 +38,11 @@ def calcEff(cName, scandate, vfatList, latBin, bkgSub=False):
     filename_ANA = dirPath + "/LatencyScanData/latencyAna.root"
 
     # Load data - RAW
-    import root_numpy as rp
     import numpy as np
+    from gempython.gemplotting.utils.sidecar import loadArray
     list_bNames = ["vfatN","lat","Nhits","Nev"]
     try:
-        array_VFATData = rp.root2array(filename_RAW,"latTree",list_bNames)
+        array_VFATData = loadArray(filename_RAW,"latTree",list_bNames)
         pass
     except Exception as e:
         print '%s does not seem to exist'%filename_RAW
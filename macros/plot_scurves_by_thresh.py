@@ -4,7 +4,9 @@ plot\_scurves\_by\_thresh
 """
 
 if __name__ == '__main__':
+    import os
     from gempython.gemplotting.macros.plotoptions import parser
+    from gempython.gemplotting.macros.scurvePlottingUtitilities import getScurveObjects, hasFitObjects
 
     (options, args) = parser.parse_args()
 
@@ -12,15 +14,20 @@ if __name__ == '__main__':
     vfat = options.vfat
     strip = options.strip
 
+    import root_numpy as rp
     import ROOT as r
     r.gStyle.SetOptStat(0)
 
     thr     = []
     Scurves = []
     fitF = r.TFile(filename)
-    for event in fitF.scurveFitTree:
-        if (event.vthr) not in thr:
-            thr.append(event.vthr)
+    if not hasFitObjects(fitF.scurveFitTree):
+        print("%s does not contain the scurve histograms"%filename)
+        exit(os.EX_DATAERR)
+    fitF.Close()
+    for vthr in rp.root2array(filename, treename="scurveFitTree", branches=["vthr"])["vthr"]:
+        if vthr not in thr:
+            thr.append(vthr)
             pass
         pass
     print thr
@@ -28,10 +35,11 @@ if __name__ == '__main__':
     canvas = r.TCanvas('canvas', 'canvas', 500, 500)
     canvas.cd()
     i = 0
+    list_scurveObjects = getScurveObjects(filename, "vfatN == %i && ROBstr == %i"%(vfat, strip), ["vthr"])
     for thresh in thr:
-        for event in fitF.scurveFitTree:
-            if (event.vthr == thresh) and (event.vfatN == vfat) and (event.ROBstr == strip):
-                Scurves.append((event.scurve_h).Clone())
+        for entry, scurve, fit in list_scurveObjects:
+            if entry["vthr"] == thresh:
+                Scurves.append(scurve)
                 pass
             pass
         pass
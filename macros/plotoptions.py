@@ -5,12 +5,22 @@ plotoptions
 ===========
 """
 
-parser = OptionParser()
-parser.add_option("-c","--channels", action="store_true", dest="channels",
-                  help="Make plots vs channels instead of strips", metavar="channels")
-parser.add_option("-i", "--infilename", type="string", dest="filename", default="SCurveFitData.root",
-                  help="Specify Input Filename", metavar="filename")
-parser.add_option("-s", "--strip", type="int", dest="strip",
-                  help="Specify strip or channel to plot", metavar="strip")
-parser.add_option("-v", "--vfat", type="int", dest="vfat",
-                  help="Specify VFAT to plot", metavar="vfat")
+def makeParser():
+    """
+    Returns a new OptionParser holding the options common to the plotting
+    macros, e.g. for callers which build the options of several macros
+    """
+
+    parser = OptionParser()
+    parser.add_option("-c","--channels", action="store_true", dest="channels",
+                      help="Make plots vs channels instead of strips", metavar="channels")
+    parser.add_option("-i", "--infilename", type="string", dest="filename", default="SCurveFitData.root",
+                      help="Specify Input Filename", metavar="filename")
+    parser.add_option("-s", "--strip", type="int", dest="strip",
+                      help="Specify strip or channel to plot", metavar="strip")
+    parser.add_option("-v", "--vfat", type="int", dest="vfat",
+                      help="Specify VFAT to plot", metavar="vfat")
+
+    return parser
+
+parser = makeParser()
@@ -3,6 +3,69 @@ scurvePlottingUtitilities
 =========================
 """
 
+def getScurveObjects(fit_filename, selection="", branches=None):
+    """
+    Returns a list of tuples (entry, histo, fit), one for each entry of the
+    scurveFitTree in fit_filename passing selection.  Files written with the
+    compact scurve_hits/fit_params branches are read with root_numpy and the
+    TObjects are rebuilt with rebuildScurveObjects(), for older files the
+    streamed scurve_h and scurve_fit objects are used.
+
+    fit_filename - TFile that holds the scurve fit data
+    selection - TTree::Draw style selection, e.g. "vfatN == 3"
+    branches - list of scalar branches stored in entry, vfatN and vfatCH are always added
+    """
+
+    import numpy as np
+    import root_numpy as rp
+    import ROOT as r
+    from gempython.gemplotting.fitting.fitScanData import rebuildScurveObjects
+
+    if branches is None:
+        branches = []
+    branches = [ "vfatN", "vfatCH" ] + [ bName for bName in branches if bName not in ["vfatN", "vfatCH"] ]
+
+    list_scurveObjects = []
+    if "scurve_hits" in rp.list_branches(fit_filename, treename="scurveFitTree"):
+        compactBranches = [ "scurve_hits", "scurve_xMin", "scurve_xMax", "fit_params", "fit_xMin", "fit_xMax", "chi2", "ndf" ]
+        scurveData = rp.root2array(fit_filename, treename="scurveFitTree", branches=branches + compactBranches, selection=selection)
+        for entry in scurveData:
+            histo, fit = rebuildScurveObjects(
+                    entry["vfatN"], entry["vfatCH"],
+                    entry["scurve_hits"], entry["scurve_xMin"], entry["scurve_xMax"],
+                    entry["fit_params"], entry["fit_xMin"], entry["fit_xMax"],
+                    entry["chi2"], entry["ndf"])
+            list_scurveObjects.append((entry[branches], histo, fit))
+            pass
+    else:
+        scurveData = rp.root2array(fit_filename, treename="scurveFitTree", branches=branches, selection=selection)
+        fitFile = r.TFile(fit_filename)
+        fitTree = fitFile.Get("scurveFitTree")
+        fitTree.Draw(">>scurveEntryList", selection, "goff")
+        entryList = r.gDirectory.Get("scurveEntryList")
+        for idx in range(0,entryList.GetN()):
+            fitTree.GetEntry(entryList.GetEntry(idx))
+            histo = fitTree.scurve_h.Clone()
+            histo.SetDirectory(0)
+            list_scurveObjects.append((scurveData[idx], histo, fitTree.scurve_fit.Clone()))
+            pass
+        fitFile.Close()
+        pass
+
+    return list_scurveObjects
+
+def hasFitObjects(fitTree):
+    """
+    Returns True if the scurve histogram and fit of each channel can be read
+    from fitTree, either from the compact scurve_hits/fit_params branches or
+    from the scurve_h/scurve_fit objects stored in the scurveFitTree or in
+    its scurveFitObjTree friend
+
+    fitTree - scurveFitTree produced by anaUltraScurve.py
+    """
+
+    return bool(fitTree.GetBranch("scurve_hits")) or bool(fitTree.GetBranch("scurve_h"))
+
 def overlay_scurve(vfat, vfatCH, fit_filename=None, tupleTObjects=None, vfatChNotROBstr=True, debug=False):
     """
     Draws an scurve histogram and the fit to the scurve on a common canvas
@@ -32,11 +95,19 @@ def overlay_scurve(vfat, vfatCH, fit_filename=None, tupleTObjects=None, vfatChNo
     if fit_filename is not None:
         r.TH1.AddDirectory(False)
         fitFile   = r.TFile(fit_filename)
-        for event in fitFile.scurveFitTree:
-            if (event.vfatN == vfat) and ((event.vfatCH == vfatCH and vfatChNotROBstr) or (event.ROBstr == vfatCH and not vfatChNotROBstr)):
-                scurveHisto = event.scurve_h.Clone()
-                scurveFit = event.scurve_fit.Clone()
-                pass
+        if not hasFitObjects(fitFile.scurveFitTree):
+            print("overlay_scurve(): %s does not contain the scurve histograms and fits"%fit_filename)
+            print("\tExiting")
+            exit(os.EX_DATAERR)
+        fitFile.Close()
+        if vfatChNotROBstr:
+            selection = "vfatN == %i && vfatCH == %i"%(vfat, vfatCH)
+        else:
+            selection = "vfatN == %i && ROBstr == %i"%(vfat, vfatCH)
+        list_scurveObjects = getScurveObjects(fit_filename, selection)
+        if len(list_scurveObjects) > 0:
+            scurveHisto = list_scurveObjects[-1][1]
+            scurveFit = list_scurveObjects[-1][2]
             pass
     elif tupleTObjects is not None:
         scurveHisto = tupleTObjects[0]
@@ -109,9 +180,14 @@ def plot_vfat_summary(vfat, fit_filename, vfatChNotROBstr=True):
     fit_filename - TFile that holds the scurve fit data (histo & fit)
     vfatChNotROBstr - true if plotted for vfatCh; false if plotted for readout strip
     """
+    import os
     import ROOT as r
     fitF = r.TFile(fit_filename)
-    Scurve = r.TH1D()
+    if not hasFitObjects(fitF.scurveFitTree):
+        print("plot_vfat_summary(): %s does not contain the scurve histograms"%fit_filename)
+        print("\tExiting")
+        exit(os.EX_DATAERR)
+    fitF.Close()
     if vfatChNotROBstr:
         vSum = r.TH2D('vSum', 'vSum for VFAT %i; Channels; VCal [DAC units]'%vfat, 128, -0.5, 127.5, 256, -0.5, 255.5)
         pass
@@ -119,17 +195,14 @@ def plot_vfat_summary(vfat, fit_filename, vfatChNotROBstr=True):
         vSum = Tr.H2D('vSum', 'vSum for VFAT %i; Strips; VCal [DAC units]'%vfat, 128, -0.5, 127.5, 256, -0.5, 255.5)
         pass
     vSum.GetYaxis().SetTitleOffset(1.5)
-    for event in fitF.scurveFitTree:
-        if (event.vfatN == vfat):
-            Scurve = ((event.scurve_h).Clone())
-            for valX in range(0, 256):
-                valY = Scurve.FindBin(valX)
-                if vfatChNotROBstr:
-                    vSum.Fill(event.vfatCH, valX, Scurve.GetBinContent(valY))
-                    pass
-                else:
-                    vSum.Fill(event.ROBstr, valX, Scurve.GetBinContent(valY))
-                    pass
+    for entry, Scurve, fit in getScurveObjects(fit_filename, "vfatN == %i"%vfat, ["ROBstr"]):
+        for valX in range(0, 256):
+            valY = Scurve.FindBin(valX)
+            if vfatChNotROBstr:
+                vSum.Fill(entry["vfatCH"], valX, Scurve.GetBinContent(valY))
+                pass
+            else:
+                vSum.Fill(entry["ROBstr"], valX, Scurve.GetBinContent(valY))
                 pass
             pass
         pass
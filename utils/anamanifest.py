@@ -0,0 +1,160 @@
+"""
+``anamanifest`` --- Records of how analysis outputs were produced
+-----------------------------------------------------------------
+
+An analysis output directory, e.g. ``SCurveData/`` next to
+``SCurveData.root``, gets an ``anaManifest.json`` once the analysis
+succeeded.  It records the analysis tool and its version, the arguments
+it was run with, the size, modification time and sha1 of each input file
+and the output files produced.
+
+Launchers such as ``ana_scans.py`` and ``clusterAnaScurve.py`` use
+isUpToDate() to skip analyses whose inputs, arguments and tool version
+are unchanged since the manifest was written.  Inputs whose size and
+modification time are unchanged are not hashed again.
+"""
+
+import hashlib
+import json
+import os
+
+#: Increment when the manifest layout changes so old manifests are not used
+MANIFEST_VERSION = 1
+
+#: Name of the manifest file inside the output directory
+MANIFEST_NAME = "anaManifest.json"
+
+def describeFile(fileName, previous=None):
+    """
+    Returns a dict with the size, modification time and sha1 of fileName
+
+    fileName - path of the file
+    previous - optional dict returned by an earlier call for the same
+               file, its sha1 is reused if the size and modification time
+               are unchanged
+    """
+
+    fileStat = os.stat(fileName)
+    description = {
+            "size":fileStat.st_size,
+            "mtime":fileStat.st_mtime
+            }
+
+    if previous is not None and previous.get("size") == description["size"] and previous.get("mtime") == description["mtime"]:
+        description["sha1"] = previous.get("sha1")
+        return description
+
+    fileHash = hashlib.sha1()
+    with open(fileName, "rb") as inputFile:
+        for chunk in iter(lambda: inputFile.read(1024 * 1024), b""):
+            fileHash.update(chunk)
+            pass
+    description["sha1"] = fileHash.hexdigest()
+
+    return description
+
+def getToolVersion():
+    """
+    Returns the version of the installed gempython_gemplotting package, or
+    "unknown" if it is not installed
+    """
+
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution("gempython_gemplotting").version
+    except Exception:
+        return "unknown"
+
+def isUpToDate(outputDir, tool, args, inputFiles, outputFiles=()):
+    """
+    Checks the manifest of outputDir against the analysis about to be run.
+    Returns a tuple (upToDate, reason), reason being a string explaining
+    why the analysis must be run again.
+
+    outputDir   - analysis output directory holding the manifest
+    tool        - name of the analysis tool, e.g. anaUltraScurve.py
+    args        - list of the command line arguments given to tool
+    inputFiles  - list of the input files of the analysis
+    outputFiles - list of the output files the analysis must have produced
+    """
+
+    manifest = readManifest(outputDir)
+    if manifest is None:
+        return (False, "no manifest")
+    if manifest.get("version") != MANIFEST_VERSION:
+        return (False, "manifest version changed")
+    if manifest.get("tool") != tool or manifest.get("toolVersion") != getToolVersion():
+        return (False, "tool version changed")
+    if manifest.get("args") != list(args):
+        return (False, "arguments changed")
+
+    previousInputs = manifest.get("inputs", {})
+    if sorted(previousInputs.keys()) != sorted(inputFiles):
+        return (False, "input files changed")
+    for fileName in inputFiles:
+        try:
+            description = describeFile(fileName, previousInputs[fileName])
+        except (IOError, OSError):
+            return (False, "input file %s not readable"%(fileName))
+        if description["sha1"] != previousInputs[fileName].get("sha1"):
+            return (False, "input file %s changed"%(fileName))
+        pass
+
+    for fileName in list(outputFiles) + manifest.get("outputs", []):
+        if not os.path.isfile(fileName):
+            return (False, "output file %s missing"%(fileName))
+        pass
+
+    return (True, "up to date")
+
+def makeManifest(tool, args, inputFiles, outputFiles=()):
+    """
+    Returns the manifest, as a dict, of an analysis
+
+    tool        - name of the analysis tool, e.g. anaUltraScurve.py
+    args        - list of the command line arguments given to tool
+    inputFiles  - list of the input files of the analysis
+    outputFiles - list of the output files the analysis produces
+    """
+
+    return {
+            "version":MANIFEST_VERSION,
+            "tool":tool,
+            "toolVersion":getToolVersion(),
+            "args":list(args),
+            "inputs":dict((fileName, describeFile(fileName)) for fileName in inputFiles),
+            "outputs":list(outputFiles)
+            }
+
+def readManifest(outputDir, manifestName=MANIFEST_NAME):
+    """
+    Returns the manifest of outputDir as a dict, None if there is none
+    """
+
+    try:
+        with open(os.path.join(outputDir, manifestName), "r") as manifestFile:
+            return json.load(manifestFile)
+    except (IOError, OSError, ValueError):
+        return None
+
+def writeManifest(outputDir, manifest, manifestName=MANIFEST_NAME):
+    """
+    Writes manifest, see makeManifest(), to outputDir
+
+    outputDir    - analysis output directory, created if needed
+    manifest     - dict returned by makeManifest()
+    manifestName - name of the manifest file, e.g. to prepare a manifest
+                   which is moved to MANIFEST_NAME once a batch job succeeded
+    """
+
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+
+    # Write to a temporary file first so readers never see a partial manifest
+    manifestPath = os.path.join(outputDir, manifestName)
+    tmpPath = "%s.%i.tmp"%(manifestPath, os.getpid())
+    with open(tmpPath, "w") as manifestFile:
+        json.dump(manifest, manifestFile, indent=1, sort_keys=True)
+    os.rename(tmpPath, manifestPath)
+
+    return
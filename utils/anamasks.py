@@ -0,0 +1,110 @@
+"""
+``anamasks`` --- Channel mask decisions
+---------------------------------------
+
+Determines which channels of a detector should be masked, and why, from
+per-channel arrays of shape ``(24,128)`` indexed as ``[vfat][chan]``.  All
+24 VFATs are treated at once, the outlier searches are performed
+independently for each VFAT along axis 1.
+
+Used by both ``anaUltraScurve.py`` and ``anaUltraThreshold.py``.
+"""
+
+import numpy as np
+
+from gempython.gemplotting.fitting.batchFit import erf
+from gempython.gemplotting.utils.anaInfo import MaskReason
+from gempython.gemplotting.utils.anautilities import isOutlierMADOneSided
+
+def computeChannelMasks(threshold, noise, effPed, fitValid, nev, ztrim=4.0, zscore=3.5, highNoiseCut=1.0,
+        deadChanCutLow=4.14E-02, deadChanCutHigh=1.09E-01, maxEffPedPercent=0.05, printTable=True):
+    """
+    Determines the channel masks and mask reasons from the scurve fit results.
+
+    threshold        - array of shape (24,128) of scurve means
+    noise            - array of shape (24,128) of scurve sigmas
+    effPed           - array of shape (24,128) of effective pedestals, see effectivePedestals()
+    fitValid         - array of shape (24,128), True if the scurve fit converged
+    nev              - array of shape (24,128) of the number of pulses, NaN if unknown
+    ztrim            - p value of the trim, the hot channel search is performed on (threshold - ztrim * noise)
+    zscore           - Z-Score for outlier identification in MAD algo
+    highNoiseCut     - if (noise > highNoiseCut) HighNoise is set
+    deadChanCutLow   - if (deadChanCutLow < noise < deadChanCutHigh) DeadChannel is set
+    deadChanCutHigh  - see deadChanCutLow
+    maxEffPedPercent - if (effPed > maxEffPedPercent * nev) HighEffPed is set
+    printTable       - print a table summarizing the number of channels with each mask reason
+
+    Returns a tuple of numpy arrays of shape (24,128):
+
+        [0] -> mask, True if the channel should be masked
+        [1] -> maskReason, see MaskReason
+    """
+
+    noise = np.asarray(noise, dtype=float)
+    fitFailed = np.logical_not(np.asarray(fitValid, dtype=bool))
+
+    # Determine outliers on the value trimmed to
+    trimValue = np.asarray(threshold, dtype=float) - ztrim * noise
+    isHotChan = findHotChannels(trimValue, zscore=zscore, rejectHighTail=False)
+
+    isDeadChan = np.logical_and(deadChanCutLow < noise, noise < deadChanCutHigh)
+    isHighNoise = noise > highNoiseCut
+    with np.errstate(invalid='ignore'):
+        isHighEffPed = np.asarray(effPed, dtype=float) > (maxEffPedPercent * np.asarray(nev, dtype=float))
+
+    # Create reason array
+    maskReason = np.zeros(noise.shape, dtype=int) # Not masked
+    maskReason[isHotChan] |= MaskReason.HotChannel
+    maskReason[fitFailed] |= MaskReason.FitFailed
+    maskReason[isDeadChan] |= MaskReason.DeadChannel
+    maskReason[isHighNoise] |= MaskReason.HighNoise
+    maskReason[isHighEffPed] |= MaskReason.HighEffPed
+    mask = (maskReason != MaskReason.NotMasked) * (maskReason != MaskReason.DeadChannel)
+
+    if printTable:
+        print "| vfatN | Dead Chan | Hot Chan | Failed Fits | High Noise | High Eff Ped |"
+        print "| :---: | :-------: | :------: | :---------: | :--------: | :----------: |"
+        nPerReason = [ np.sum(isReason, axis=1) for isReason in (isDeadChan, isHotChan, fitFailed, isHighNoise, isHighEffPed) ]
+        for vfat in range(0,len(maskReason)):
+            print '| %i | %i | %i | %i | %i | %i |'%((vfat,) + tuple(nChan[vfat] for nChan in nPerReason))
+            pass
+        pass
+
+    return (mask, maskReason)
+
+def effectivePedestals(fitParams, x=0.0):
+    """
+    Evaluates the scurve fit function of every channel at x, by default at
+    0 where it gives the effective pedestal.  Equivalent to calling Eval(x)
+    on each TF1 of ScanDataFitter.scanFuncs.
+
+    fitParams - array of shape (24,128,4) of fit parameters, e.g. ScanDataFitter.fitParams
+    x         - point at which the function is evaluated
+
+    Returns an array of shape (24,128), channels that were not fit (width
+    of 0) return 0
+    """
+
+    fitParams = np.asarray(fitParams, dtype=float)
+    p0 = fitParams[...,0]
+    p1 = fitParams[...,1]
+    p2 = fitParams[...,2]
+    p3 = fitParams[...,3]
+
+    hasWidth = p1 > 0
+    z = (np.maximum(p2, x) - p0) / (np.sqrt(2.) * np.where(hasWidth, p1, 1.))
+    return np.where(hasWidth, p3 * erf(z) + p3, 0.)
+
+def findHotChannels(values, zscore=3.5, rejectHighTail=True):
+    """
+    Flags the outliers of values, the MAD test is performed independently
+    for each VFAT
+
+    values         - array of shape (24,nChannels), e.g. (threshold - ztrim * noise)
+    zscore         - Z-Score for outlier identification in MAD algo
+    rejectHighTail - flag outliers in the high tail if True, in the low tail otherwise
+
+    Returns a boolean array with the shape of values
+    """
+
+    return isOutlierMADOneSided(values, thresh=zscore, rejectHighTail=rejectHighTail, axis=1)
@@ -0,0 +1,138 @@
+"""
+``anatelemetry`` --- Timing and memory usage of analyses
+--------------------------------------------------------
+
+Records the wall clock and CPU time spent in the stages of an analysis,
+e.g. read, fill, fit, mask, render and write, along with the peak
+resident memory of the process.  The ``run*Analysis()`` functions of the
+analysis scripts mark their stages on an :any:`AnaTelemetry` and
+``ana_scans.py`` collects the reports of all chambers of a run.
+"""
+
+import resource
+import time
+
+def getCPUTime():
+    """
+    Returns the user plus system CPU time in seconds used by this process
+    and its terminated children, e.g. the fit workers
+    """
+
+    cpuTime = 0.
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpuTime += usage.ru_utime + usage.ru_stime
+        pass
+
+    return cpuTime
+
+def getPeakRSS():
+    """
+    Returns the peak resident memory of this process in MB, since the last
+    call to resetPeakRSS() where supported
+    """
+
+    try:
+        with open("/proc/self/status", "r") as statusFile:
+            for line in statusFile:
+                if line.startswith("VmHWM:"):
+                    return float(line.split()[1]) / 1024.
+                pass
+    except IOError:
+        pass
+
+    # ru_maxrss is the peak over the life of the process, in kB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+def resetPeakRSS():
+    """
+    Resets the peak resident memory reported by getPeakRSS() to the
+    current one, e.g. when a process runs several analyses.  Returns True
+    on success; only supported by linux 4.0 or later, on other systems
+    getPeakRSS() keeps reporting the peak of the whole process.
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as clearRefsFile:
+            clearRefsFile.write("5")
+    except IOError:
+        return False
+
+    return True
+
+class AnaTelemetry(object):
+    """
+    Accumulates the time spent in each stage of an analysis.  A stage is
+    started with startStage() and ends when the next one starts or with
+    stopStage(); the times of stages started several times are summed.
+    """
+
+    def __init__(self):
+        # Scope of the reported peak memory, see resetPeakRSS()
+        if resetPeakRSS():
+            self.peakRSSScope = "analysis"
+        else:
+            self.peakRSSScope = "process"
+
+        self.listOfStages = []
+        self.stageCPUTime = {}
+        self.stageWallTime = {}
+
+        self.currentStage = None
+        self.stageStartCPU = 0.
+        self.stageStartWall = 0.
+
+        self.startCPU = getCPUTime()
+        self.startWall = time.time()
+
+        return
+
+    def report(self):
+        """
+        Stops the current stage and returns a dict with the total and per
+        stage wall clock and CPU times in seconds and the peak resident
+        memory in MB.  peakRSSScope is "analysis" if the peak is the one
+        since this object was made, "process" if it is the peak of the
+        whole process as it could not be reset.
+        """
+
+        self.stopStage()
+
+        return {
+                "wallTime":time.time() - self.startWall,
+                "cpuTime":getCPUTime() - self.startCPU,
+                "peakRSS":getPeakRSS(),
+                "peakRSSScope":self.peakRSSScope,
+                "stages":[ {"name":name,
+                            "wallTime":self.stageWallTime[name],
+                            "cpuTime":self.stageCPUTime[name]} for name in self.listOfStages ]
+                }
+
+    def startStage(self, name):
+        """
+        Stops the current stage, if any, and starts the stage name
+        """
+
+        self.stopStage()
+
+        if name not in self.listOfStages:
+            self.listOfStages.append(name)
+            self.stageCPUTime[name] = 0.
+            self.stageWallTime[name] = 0.
+            pass
+
+        self.currentStage = name
+        self.stageStartCPU = getCPUTime()
+        self.stageStartWall = time.time()
+
+        return
+
+    def stopStage(self):
+        if self.currentStage is None:
+            return
+
+        self.stageCPUTime[self.currentStage] += getCPUTime() - self.stageStartCPU
+        self.stageWallTime[self.currentStage] += time.time() - self.stageStartWall
+        self.currentStage = None
+
+        return
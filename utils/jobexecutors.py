@@ -0,0 +1,125 @@
+"""
+``jobexecutors`` --- Backends running batch job scripts
+-------------------------------------------------------
+
+Launchers such as ``clusterAnaScurve.py`` write one shell script per job
+and hand it to an executor, which either submits it to a batch system or
+runs it on the local machine:
+
+* ``lsf``:   submits each job with ``bsub`` to an LSF queue, see
+  ``anaInfo.queueNames``,
+* ``local``: runs the jobs on the local machine with at most ``nWorkers``
+  of them at the same time.
+
+Each executor has two methods:
+
+* ``submit(jobScriptName, stdoutFileName, stderrFileName)`` hands over
+  the executable shell script jobScriptName, its standard output and
+  error go to stdoutFileName and stderrFileName,
+* ``wait()`` returns, once the executor is done with all submitted jobs,
+  a list of ``(jobScriptName, returncode)``; returncode is None for jobs
+  which were submitted but are not tracked (e.g. batch jobs).
+
+Use getExecutor() to build an executor by name.
+"""
+
+#: Names of the supported executors, see getExecutor()
+executorNames = [ "local", "lsf" ]
+
+class LocalExecutor(object):
+    def __init__(self, nWorkers=None):
+        """
+        nWorkers - maximum number of jobs running at the same time, if
+                   None the number of CPUs is used
+        """
+
+        from multiprocessing import cpu_count
+        from multiprocessing.pool import ThreadPool
+
+        if nWorkers is None:
+            nWorkers = cpu_count()
+
+        # The jobs are subprocesses, threads are enough to wait on them
+        self.pool = ThreadPool(nWorkers)
+        self.listOfJobs = []
+
+        return
+
+    def submit(self, jobScriptName, stdoutFileName, stderrFileName):
+        self.listOfJobs.append((jobScriptName, self.pool.apply_async(runJobScript, (jobScriptName, stdoutFileName, stderrFileName))))
+        return
+
+    def wait(self):
+        listOfResults = []
+        for jobScriptName, result in self.listOfJobs:
+            # timeout must be set, otherwise KeyboardInterrupt is not caught
+            listOfResults.append((jobScriptName, result.get(999999999)))
+            pass
+        self.pool.close()
+        self.pool.join()
+        self.listOfJobs = []
+
+        return listOfResults
+
+class LSFExecutor(object):
+    def __init__(self, queue="1nh"):
+        """
+        queue - LSF queue the jobs are submitted to, see anaInfo.queueNames
+        """
+
+        self.queue = queue
+        self.listOfJobs = []
+
+        return
+
+    def submit(self, jobScriptName, stdoutFileName, stderrFileName):
+        from gempython.utils.wrappers import runCommand
+
+        jobCmd = [
+                'bsub',
+                '-env',
+                'all',
+                '-q',
+                self.queue,
+                '-o',
+                stdoutFileName,
+                '-e',
+                stderrFileName,
+                jobScriptName ]
+        runCommand(jobCmd)
+        self.listOfJobs.append(jobScriptName)
+
+        return
+
+    def wait(self):
+        listOfResults = [ (jobScriptName, None) for jobScriptName in self.listOfJobs ]
+        self.listOfJobs = []
+        return listOfResults
+
+def getExecutor(name, queue="1nh", nWorkers=None):
+    """
+    Returns the executor called name, see executorNames
+
+    name     - name of the executor
+    queue    - LSF queue, only used by the lsf executor
+    nWorkers - maximum number of concurrent jobs, only used by the local executor
+    """
+
+    if name == "local":
+        return LocalExecutor(nWorkers)
+    elif name == "lsf":
+        return LSFExecutor(queue)
+    else:
+        raise KeyError("Executor '%s' not understood, please select from %s"%(name, executorNames))
+
+def runJobScript(jobScriptName, stdoutFileName, stderrFileName):
+    """
+    Runs jobScriptName and returns its exit code, its standard output and
+    error are written to stdoutFileName and stderrFileName
+    """
+
+    import subprocess
+
+    with open(stdoutFileName, "w") as stdoutFile:
+        with open(stderrFileName, "w") as stderrFile:
+            return subprocess.call([jobScriptName], stdout=stdoutFile, stderr=stderrFile, close_fds=True)
@@ -0,0 +1,106 @@
+"""
+``jobjournal`` --- Record of the state of batch jobs
+----------------------------------------------------
+
+A journal is an append-only file with one JSON object per line, each
+recording a state change of a job::
+
+    {"job": "GEMINIm01L1/2018.01.01.12.00", "state": "pending", "time": 1514808000.0}
+
+The states are ``pending`` (submitted), ``running``, ``done`` and
+``failed``; ``done`` and ``failed`` lines also hold the ``duration`` in
+seconds and the ``returncode`` of the job.  The launcher records the
+submission, the job script itself records the other states (see
+getJobScriptLines()) so the journal is complete whatever the executor.
+The last line of a job gives its current state.
+
+Lines are short and appended in a single write, so jobs running at the
+same time can share a journal.
+"""
+
+import json
+import os
+import time
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+class JobJournal(object):
+    def __init__(self, journalFileName):
+        """
+        journalFileName - journal file, created at the first record if needed
+        """
+
+        self.journalFileName = journalFileName
+        self.dictOfJobs = {}
+        self.reload()
+
+        return
+
+    def getState(self, jobKey):
+        """
+        Returns the current state of jobKey, None if it was never recorded
+        """
+
+        if jobKey not in self.dictOfJobs:
+            return None
+        return self.dictOfJobs[jobKey]["state"]
+
+    def record(self, jobKey, state, **info):
+        """
+        Appends a state change of jobKey to the journal
+
+        jobKey - string identifying the job
+        state  - one of JOB_PENDING, JOB_RUNNING, JOB_DONE or JOB_FAILED
+        info   - additional fields of the record, e.g. duration
+        """
+
+        entry = dict(info, job=jobKey, state=state, time=time.time())
+        with open(self.journalFileName, "a") as journalFile:
+            journalFile.write("%s\n"%(json.dumps(entry, sort_keys=True)))
+        self.dictOfJobs[jobKey] = entry
+
+        return
+
+    def reload(self):
+        """
+        Reads the journal again, e.g. after the jobs recorded their state
+        """
+
+        self.dictOfJobs = {}
+        if not os.path.isfile(self.journalFileName):
+            return
+
+        with open(self.journalFileName, "r") as journalFile:
+            for line in journalFile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # e.g. line cut short by a crash
+                self.dictOfJobs[entry["job"]] = entry
+                pass
+
+        return
+
+def getJobScriptLines(journalFileName, jobKey):
+    """
+    Returns a tuple of bash snippets (start, end) recording the state of
+    jobKey in journalFileName from the job script.  start goes before the
+    command of the job, end right after it: it records done or failed
+    from the exit code of the command and exits with it.
+    """
+
+    start = """JOB_START=$(date +%%s)
+echo "{\\"job\\": \\"%(job)s\\", \\"state\\": \\"%(running)s\\", \\"time\\": $JOB_START}" >> %(journal)s
+"""%{"job":jobKey, "running":JOB_RUNNING, "journal":journalFileName}
+
+    end = """JOB_RC=$?
+JOB_END=$(date +%%s)
+if [ $JOB_RC -eq 0 ]; then JOB_STATE=%(done)s; else JOB_STATE=%(failed)s; fi
+echo "{\\"duration\\": $((JOB_END - JOB_START)), \\"job\\": \\"%(job)s\\", \\"returncode\\": $JOB_RC, \\"state\\": \\"$JOB_STATE\\", \\"time\\": $JOB_END}" >> %(journal)s
+exit $JOB_RC
+"""%{"job":jobKey, "done":JOB_DONE, "failed":JOB_FAILED, "journal":journalFileName}
+
+    return (start, end)
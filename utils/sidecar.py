@@ -0,0 +1,196 @@
+"""
+``sidecar`` --- Columnar copies of analysis TTrees
+--------------------------------------------------
+
+Stores the scalar branches of a ``TTree`` as one ``.npy`` file per branch
+in a directory next to the ``TFile``, e.g. ``SCurveFitData.root`` gets
+``SCurveFitData.root.sidecar/scurveFitTree/``.  A ``manifest.json`` in
+that directory records the tree, all of its branch names, the number of
+entries and the size and modification time of the ``TFile`` it was made
+from; a sidecar whose
+``TFile`` has since changed is ignored.
+
+Sidecars can be written by the analysis scripts (``--sidecar`` option of
+``anaUltraScurve.py``, ``anaUltraThreshold.py`` and ``anaUltraLatency.py``)
+or made lazily by the loaders the first time a file is read.  Loaders
+memory map the ``.npy`` files so only the pages actually used are read,
+and fall back to ``root_numpy`` when no valid sidecar is present.
+"""
+
+import json
+import numpy as np
+import os
+import shutil
+
+#: Increment when the sidecar layout changes so old sidecars are not used
+SIDECAR_VERSION = 2
+
+def _scalarBranches(tree):
+    """
+    Returns the names of the branches of tree holding a single number per
+    entry, i.e. no TObjects, arrays or friend tree branches
+    """
+
+    listBranches = []
+    for branch in tree.GetListOfBranches():
+        if branch.ClassName() != "TBranch":
+            continue # e.g. TBranchElement holding a TObject
+        leaves = branch.GetListOfLeaves()
+        if leaves.GetEntries() != 1:
+            continue
+        leaf = leaves.At(0)
+        if leaf.GetLenStatic() != 1 or leaf.GetLeafCount():
+            continue
+        listBranches.append(branch.GetName())
+        pass
+
+    return listBranches
+
+def getManifest(rootFileName, treeName):
+    """
+    Returns the manifest of the sidecar of treeName in rootFileName as a
+    dict, or None if there is no sidecar or it does not match the current
+    rootFileName
+
+    rootFileName - TFile the sidecar was made from
+    treeName     - name of the TTree
+    """
+
+    manifestPath = os.path.join(getSidecarDir(rootFileName, treeName), "manifest.json")
+    try:
+        with open(manifestPath, "r") as manifestFile:
+            manifest = json.load(manifestFile)
+        rootFileStat = os.stat(rootFileName)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if manifest.get("version") != SIDECAR_VERSION:
+        return None
+    if manifest.get("sourceSize") != rootFileStat.st_size or manifest.get("sourceMTime") != rootFileStat.st_mtime:
+        return None
+
+    return manifest
+
+def getSidecarDir(rootFileName, treeName):
+    return os.path.join("%s.sidecar"%(rootFileName), treeName)
+
+def listBranches(rootFileName, treeName):
+    """
+    Returns the list of branches of treeName in rootFileName, taken from
+    the sidecar if it is valid and from the TFile otherwise.  Branches not
+    stored in the sidecar, e.g. arrays, are listed too since loadColumns()
+    reads them from the TFile.
+    """
+
+    manifest = getManifest(rootFileName, treeName)
+    if manifest is not None:
+        return [ str(bName) for bName in manifest["treeBranches"] ]
+
+    import root_numpy as rp
+    return rp.list_branches(rootFileName, treename=treeName)
+
+def loadArray(rootFileName, treeName, branches, createSidecar=False):
+    """
+    As loadColumns() but returns a numpy structured array, as
+    root_numpy.root2array() would.  The requested columns are copied.
+    """
+
+    columns = loadColumns(rootFileName, treeName, branches, createSidecar)
+    array = np.empty(len(columns[branches[0]]), dtype=[ (bName, columns[bName].dtype) for bName in branches ])
+    for bName in branches:
+        array[bName] = columns[bName]
+        pass
+
+    return array
+
+def loadColumns(rootFileName, treeName, branches, createSidecar=False):
+    """
+    Returns a dict of numpy arrays, one per branch in branches, with the
+    content of treeName in rootFileName.  If a valid sidecar holds all
+    requested branches they are memory mapped from it, otherwise they are
+    read with root_numpy.
+
+    rootFileName  - TFile holding the TTree
+    treeName      - name of the TTree
+    branches      - list of branch names
+    createSidecar - if no valid sidecar exists, make one from the TFile
+    """
+
+    manifest = getManifest(rootFileName, treeName)
+    if manifest is None and createSidecar:
+        try:
+            manifest = writeSidecar(rootFileName, treeName)
+        except (IOError, OSError) as e:
+            print "Unable to write the sidecar of %s in %s: %s"%(treeName, rootFileName, e)
+            pass
+        pass
+
+    if manifest is not None and all(bName in manifest["branches"] for bName in branches):
+        sidecarDir = getSidecarDir(rootFileName, treeName)
+        return dict((bName, np.load(os.path.join(sidecarDir, "%s.npy"%(bName)), mmap_mode="r")) for bName in branches)
+
+    import root_numpy as rp
+    array = rp.root2array(rootFileName, treename=treeName, branches=branches)
+    return dict((bName, array[bName]) for bName in branches)
+
+def writeSidecar(rootFileName, treeName, array=None):
+    """
+    Writes the sidecar of treeName in rootFileName and returns its manifest.
+    Must be called once rootFileName has been closed, otherwise the
+    sidecar will not match the final file.
+
+    rootFileName - TFile holding the TTree
+    treeName     - name of the TTree
+    array        - optional numpy structured array with the content of the
+                   TTree, e.g. the array it was written from, holding all
+                   of its branches; read from rootFileName if None.
+                   Non-scalar fields are listed but not stored.
+    """
+
+    if array is None:
+        import root_numpy as rp
+        import ROOT as r
+
+        rootFile = r.TFile(rootFileName, "READ")
+        tree = rootFile.Get(treeName)
+        if not tree:
+            rootFile.Close()
+            raise IOError("TTree %s not found in %s"%(treeName, rootFileName))
+        array = rp.tree2array(tree, branches=_scalarBranches(tree))
+        treeBranches = [ branch.GetName() for branch in tree.GetListOfBranches() ]
+        rootFile.Close()
+        pass
+    else:
+        treeBranches = list(array.dtype.names)
+
+    rootFileStat = os.stat(rootFileName)
+    manifest = {
+            "version":SIDECAR_VERSION,
+            "treeName":treeName,
+            "nEntries":len(array),
+            "sourceSize":rootFileStat.st_size,
+            "sourceMTime":rootFileStat.st_mtime,
+            "treeBranches":treeBranches,
+            "branches":{}
+            }
+
+    # Write to a temporary directory first so readers never see a partial sidecar
+    sidecarDir = getSidecarDir(rootFileName, treeName)
+    tmpDir = "%s.%i.tmp"%(sidecarDir, os.getpid())
+    if os.path.isdir(tmpDir):
+        shutil.rmtree(tmpDir)
+    os.makedirs(tmpDir)
+    for bName in array.dtype.names:
+        if array.dtype[bName].shape != ():
+            continue
+        np.save(os.path.join(tmpDir, "%s.npy"%(bName)), np.ascontiguousarray(array[bName]))
+        manifest["branches"][bName] = array.dtype[bName].str
+        pass
+    with open(os.path.join(tmpDir, "manifest.json"), "w") as manifestFile:
+        json.dump(manifest, manifestFile, indent=1, sort_keys=True)
+
+    if os.path.isdir(sidecarDir):
+        shutil.rmtree(sidecarDir)
+    os.rename(tmpDir, sidecarDir)
+
+    return manifest